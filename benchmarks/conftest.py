@@ -0,0 +1,56 @@
+# Shared workloads for the pyvscp benchmarks
+#
+# All workloads are generated from fixed seeds so runs are comparable.
+
+import sys
+import random
+sys.path.append('..')    # Should be executed from project root folder
+import pytest
+import vscp
+
+# Events per workload
+N_EVENTS = 10000
+
+# Distinct GUID's in the workloads
+N_GUIDS = 1000
+
+CLASSES = (10, 15, 20, 30, 40, 60, 65, 85, 512, 522, 1024, 1026)
+
+
+def make_guids(n=N_GUIDS, seed=2):
+    rnd = random.Random(seed)
+    return [bytes([0xFF] * 7 + [0xFE] + [rnd.randrange(256) for _ in range(8)]) for _ in range(n)]
+
+def make_events(n, maxdata, seed=1):
+    rnd = random.Random(seed)
+    guids = make_guids()
+    dt = (2020, 6, 1, 12, 0, 0)
+    out = []
+    for i in range(n):
+        size = rnd.randrange(maxdata + 1)
+        out.append(vscp.vscpEventEx.new(rnd.choice(CLASSES), rnd.randrange(64),
+                                        rnd.choice(guids),
+                                        bytes(rnd.randrange(256) for _ in range(size)),
+                                        timestamp=i * 10, head=rnd.randrange(8) << 5,
+                                        dt=dt))
+    return out
+
+@pytest.fixture(scope="session")
+def level1_events():
+    return make_events(N_EVENTS, vscp.VSCP_LEVEL1_MAXDATA)
+
+@pytest.fixture(scope="session")
+def level2_events():
+    return make_events(N_EVENTS, vscp.VSCP_LEVEL2_MAXDATA, seed=3)
+
+@pytest.fixture(scope="session")
+def guid_strings():
+    return [vscp.guid(bytearray(g)).getAsString() for g in make_guids()]
+
+# Record throughput figures with the benchmark result
+def report(benchmark, count, nbytes=None):
+    stats = getattr(benchmark, "stats", None)
+    if stats is not None and stats.stats.mean:
+        benchmark.extra_info["events_per_sec"] = round(count / stats.stats.mean)
+    if nbytes is not None:
+        benchmark.extra_info["bytes_per_event"] = round(nbytes / count, 1)
@@ -0,0 +1,324 @@
+# pyvscp benchmarks
+#
+# Run with
+#
+#   python -m pytest benchmarks --benchmark-autosave
+#
+# and compare a later run against the saved one, failing on regressions
+#
+#   python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:15%
+#
+# events/sec and bytes/event are stored in the extra_info of each result.
+
+import io
+import os
+import sys
+import subprocess
+import json
+from ctypes import sizeof
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import vscp
+import vscp_aes
+import vscp_batch
+import vscp_bus
+import vscp_crc
+import vscp_filter
+import vscp_log
+import vscp_measurement
+import vscp_packet
+import vscp_pipeline
+import vscp_rollup
+import vscp_serialize
+import vscp_state
+import vscp_stats
+import vscp_traffic
+from conftest import N_EVENTS, report
+
+
+################################################################################
+# Event creation
+#
+
+def test_eventex_init(benchmark):
+    benchmark(lambda: [vscp.vscpEventEx() for _ in range(1000)])
+    report(benchmark, 1000, sizeof(vscp.vscpEventEx))
+
+def test_eventex_new(benchmark):
+    g = vscp.vscpGuid("FF:FF:FF:FF:FF:FF:FF:FE:00:00:00:00:00:00:00:01")
+    benchmark(lambda: [vscp.vscpEventEx.new(10, 6, g, b'\x88\x01\x02') for _ in range(1000)])
+    report(benchmark, 1000, sizeof(vscp.vscpEventEx))
+
+@pytest.mark.parametrize("level", ["level1_events", "level2_events"])
+def test_batch_from_events(benchmark, request, level):
+    events = request.getfixturevalue(level)
+    batch = benchmark(vscp_batch.VscpEventBatch.fromEvents, events)
+    report(benchmark, len(events), batch.nbytes())
+
+
+################################################################################
+# Serialization
+#
+
+def test_tojson(benchmark, level1_events):
+    benchmark(lambda: [json.dumps(ex.toJSON()) for ex in level1_events])
+    report(benchmark, len(level1_events))
+
+@pytest.mark.parametrize("fmt", ["ndjson", "xml", "html"])
+def test_write_batch(benchmark, level1_events, fmt):
+    batch = vscp_batch.VscpEventBatch.fromEvents(level1_events)
+    def run():
+        buf = io.BytesIO()
+        vscp_serialize.write_events(buf, batch, fmt)
+        return buf
+    buf = benchmark(run)
+    report(benchmark, len(batch), len(buf.getvalue()))
+
+def test_read_ndjson(benchmark, level1_events):
+    buf = io.BytesIO()
+    vscp_serialize.write_events(buf, level1_events)
+    def run():
+        buf.seek(0)
+        return vscp_serialize.read_batch(buf)
+    benchmark(run)
+    report(benchmark, len(level1_events), len(buf.getvalue()))
+
+@pytest.mark.parametrize("level", ["level1_events", "level2_events"])
+def test_packet0_encode(benchmark, request, level):
+    events = request.getfixturevalue(level)
+    buf = bytearray(vscp_packet.packet0_size(vscp.VSCP_LEVEL2_MAXDATA))
+    encode = vscp_packet.encode_packet0
+    benchmark(lambda: [encode(ex, buf) for ex in events])
+    report(benchmark, len(events),
+           sum(vscp_packet.packet0_size(ex.sizedata) for ex in events))
+
+@pytest.mark.parametrize("level", ["level1_events", "level2_events"])
+def test_packet0_decode(benchmark, request, level):
+    events = request.getfixturevalue(level)
+    frames = [memoryview(vscp_packet.make_packet0(ex)) for ex in events]
+    decode = vscp_packet.decode_packet0
+    benchmark(lambda: [decode(f) for f in frames])
+    report(benchmark, len(frames), sum(len(f) for f in frames))
+
+def test_crc16_frames(benchmark, level2_events):
+    frames = [vscp_packet.make_packet0(ex) for ex in level2_events]
+    benchmark(vscp_crc.check_packet0_many, frames)
+    report(benchmark, len(frames), sum(len(f) for f in frames))
+
+
+@pytest.mark.parametrize("many", [False, True])
+def test_aes_decode(benchmark, level1_events, many):
+    frames = [vscp_aes.encode_packet0_encrypted(ex, vscp.VSCP_DEFAULT_KEY16)
+                for ex in level1_events]
+    if many:
+        benchmark(vscp_aes.decode_packet0_many, frames, vscp.VSCP_DEFAULT_KEY16)
+    else:
+        decode = vscp_aes.decode_packet0_encrypted
+        benchmark(lambda: [decode(f, vscp.VSCP_DEFAULT_KEY16) for f in frames])
+    report(benchmark, len(frames), sum(len(f) for f in frames))
+
+
+def test_log_query(benchmark, level1_events, tmp_path):
+    batch = vscp_batch.VscpEventBatch.fromEvents(level1_events)
+    with vscp_log.EventLogWriter(str(tmp_path), segment_size=256 * 1024) as log:
+        log.appendBatch(batch, [i * 0.01 for i in range(len(batch))])
+    log = vscp_log.EventLogReader(str(tmp_path))
+    n = log.count(vscpclass=10, start=10, end=90)
+    benchmark(lambda: list(log.query(vscpclass=10, start=10, end=90)))
+    report(benchmark, n)
+
+
+################################################################################
+# GUID handling
+#
+
+def test_getguidstr(benchmark, level1_events):
+    benchmark(lambda: [ex.getGuidStr() for ex in level1_events])
+    report(benchmark, len(level1_events))
+
+def test_guid_setfromstring(benchmark, guid_strings):
+    g = vscp.guid()
+    benchmark(lambda: [g.setFromString(s) for s in guid_strings])
+    report(benchmark, len(guid_strings))
+
+def test_guid_getasstring(benchmark, guid_strings):
+    guids = [vscp.guid(s) for s in guid_strings]
+    benchmark(lambda: [g.getAsString() for g in guids])
+    report(benchmark, len(guids))
+
+def test_vscpguid_from_event(benchmark, level1_events):
+    benchmark(lambda: [vscp.vscpGuid(bytes(ex.guid)) for ex in level1_events])
+    report(benchmark, len(level1_events))
+
+
+################################################################################
+# Measurements
+#
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_measurement_decode_batch(benchmark, level1_events, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    events = [vscp.vscpEventEx.new(10, ex.vscptype & 0x1F, bytes(ex.guid),
+                                    bytes([0x60 | (ex.head >> 5)]) + bytes(ex.data[:2]))
+                for ex in level1_events]
+    batch = vscp_batch.VscpEventBatch.fromEvents(events)
+    benchmark(vscp_measurement.decode_batch, batch, use_numpy)
+    report(benchmark, len(batch))
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_rollup_batch(benchmark, level1_events, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    events = [vscp.vscpEventEx.new(10, ex.vscptype & 0x1F, bytes(ex.guid),
+                                    bytes([0x60 | (ex.head >> 5)]) + bytes(ex.data[:2]), i * 1000)
+                for i, ex in enumerate(level1_events)]
+    batch = vscp_batch.VscpEventBatch.fromEvents(events)
+    benchmark(lambda: vscp_rollup.RollupEngine(window=1.0, slide=0.1).updateBatch(batch,
+                                                                            use_numpy=use_numpy))
+    report(benchmark, len(batch))
+
+
+################################################################################
+# Filtering
+#
+
+def make_filterset(n):
+    fs = vscp_filter.FilterSet()
+    for i in range(n):
+        flt = vscp.vscpEventFilter()
+        flt.filter_class = (10, 15, 20, 30, 512, 1026)[i % 6]
+        flt.mask_class = 0xFFFF
+        if i % 3:
+            flt.filter_type = i % 64
+            flt.mask_type = 0xFFFF
+        if 0 == i % 5:
+            flt.filter_guid[15] = i & 0xFF
+            flt.mask_guid[15] = 0xFF
+        fs.add(i, flt)
+    return fs
+
+@pytest.mark.parametrize("nfilters", [10, 300])
+def test_filterset_match(benchmark, level1_events, nfilters):
+    fs = make_filterset(nfilters)
+    benchmark(lambda: [fs.match(ex) for ex in level1_events])
+    report(benchmark, len(level1_events))
+
+def test_filterset_match_batch(benchmark, level1_events):
+    fs = make_filterset(300)
+    batch = vscp_batch.VscpEventBatch.fromEvents(level1_events)
+    benchmark(fs.matchBatch, batch)
+    report(benchmark, len(batch))
+
+
+################################################################################
+# Event bus, with and without instrumentation
+#
+
+@pytest.mark.parametrize("instrumented", [False, True])
+def test_bus_publish(benchmark, level1_events, instrumented):
+    instr = vscp_stats.Instrumentation() if instrumented else None
+
+    def run():
+        bus = vscp_bus.EventBus(instrumentation=instr)
+        for i in range(10):
+            flt = vscp.vscpEventFilter()
+            flt.filter_class = (10, 15, 20, 30, 512)[i % 5]
+            flt.mask_class = 0xFFFF
+            bus.subscribe(flt, maxqueue=len(level1_events))
+        for ex in level1_events:
+            bus.publish(ex)
+
+    benchmark(run)
+    report(benchmark, len(level1_events))
+
+
+################################################################################
+# Multiprocess pipeline, decode, filter and CRC check of frames including
+# starting the workers
+#
+
+@pytest.mark.parametrize("workers", [1, 2, 4])
+def test_pipeline(benchmark, level1_events, workers):
+    frames = [vscp_packet.make_packet0(ex) for ex in level1_events]
+    flt = vscp.vscpEventFilter()
+    flt.filter_class = 10
+    flt.mask_class = 0xFFFF
+
+    def run():
+        with vscp_pipeline.VscpPipeline(workers=workers, filters=flt) as pipe:
+            pipe.putMany(frames)
+            pipe.close()
+            return sum(1 for _ in pipe)
+
+    benchmark.pedantic(run, rounds=5, warmup_rounds=1)
+    report(benchmark, len(frames), sum(len(f) for f in frames))
+
+
+################################################################################
+# Last value state store, updates and a change query after a few updates
+#
+
+def test_state_update(benchmark, level1_events):
+
+    def run():
+        store = vscp_state.StateStore()
+        for ex in level1_events:
+            store.update(ex, 0.0)
+
+    benchmark(run)
+    report(benchmark, len(level1_events))
+
+
+def test_state_changes(benchmark, level1_events):
+    store = vscp_state.StateStore()
+    for ex in level1_events:
+        store.update(ex, 0.0)
+    recent = level1_events[:100]
+
+    def run():
+        since = store.getVersion()
+        for ex in recent:
+            store.update(ex, 0.0)
+        return store.changes(since)
+
+    benchmark(run)
+    report(benchmark, len(recent))
+
+
+################################################################################
+# Traffic generation and replay at full speed, the most a replay can send
+#
+
+def test_traffic_generate(benchmark):
+    gen = vscp_traffic.TrafficGenerator(nodes=N_EVENTS // 10, sizes=(0, 8),
+                                        arrival=vscp_traffic.ARRIVAL_POISSON, seed=1)
+    benchmark(lambda: sum(1 for _ in gen.events(N_EVENTS)))
+    report(benchmark, N_EVENTS)
+
+
+def test_traffic_replay(benchmark, level1_events):
+    schedule = [(0.0, ex) for ex in level1_events]
+
+    def run():
+        sink = vscp_traffic.MemorySink()
+        vscp_traffic.Replayer(sink, speed=vscp_traffic.MAX_SPEED).run(schedule)
+
+    benchmark(run)
+    report(benchmark, len(schedule))
+
+
+################################################################################
+# Start up of a new interpreter importing the library. "pass" is the cost
+# of the interpreter itself.
+#
+
+@pytest.mark.parametrize("code", ["pass", "import vscp", "import vscp; vscp.VSCP_ERROR_TIMEOUT",
+                                    "from vscp import *", "import vscp_udp"])
+def test_import_time(benchmark, code):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cmd = [sys.executable, "-c", code]
+    benchmark.pedantic(subprocess.run, args=(cmd,), kwargs={"cwd": root, "check": True},
+                        rounds=20, warmup_rounds=2)
@@ -71,7 +71,8 @@ setup(
     # You can just specify the packages manually here if your project is
     # simple. Or you can use find_packages().
     #packages=find_packages(exclude=['contrib', 'docs', 'tests']),
-    py_modules=["vscp"],
+    packages=["vscp"],
+    py_modules=["vscp_batch", "vscp_packet", "vscp_crc", "vscp_filter", "vscp_udp", "vscp_tcp", "vscp_serialize", "vscp_aes", "vscp_can", "vscp_log", "vscp_register", "vscp_dm", "vscp_measurement", "vscp_bootloader", "vscp_rollup", "vscp_nodes", "vscp_bus", "vscp_stats", "vscp_pipeline", "vscp_state", "vscp_traffic"],
 
     python_requires='>=3.0',
 
@@ -85,7 +86,7 @@ setup(
     # https://packaging.python.org/en/latest/requirements.html
     install_requires=[
         'pythoncrc',
-        'crypto',
+        'pycryptodome',
         'get-mac'
     ],
 
@@ -96,6 +97,8 @@ setup(
     extras_require={
         'dev': ['check-manifest'],
         'test': ['coverage'],
+        'bench': ['pytest-benchmark'],
+        'numpy': ['numpy'],
     },
 
     # If there are data files included in your packages that need to be
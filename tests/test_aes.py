@@ -0,0 +1,65 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import pytest
+from Crypto.Cipher import AES
+import vscp
+import vscp_aes
+import vscp_packet
+
+
+def make_event(vscptype=6, size=3):
+    return vscp.vscpEventEx.new(10, vscptype, bytes(range(16)), bytes(range(size)))
+
+def test_tokens_and_keys():
+    assert vscp_aes.encryption_from_token("aes192") == vscp.VSCP_ENCRYPTION_AES192
+    assert vscp_aes.encryption_token(vscp.VSCP_ENCRYPTION_AES256) == "AES256"
+    assert vscp_aes.key_encryption(vscp.VSCP_DEFAULT_KEY16) == vscp.VSCP_ENCRYPTION_AES128
+    assert vscp_aes.key_encryption(vscp.VSCP_DEFAULT_KEY24) == vscp.VSCP_ENCRYPTION_AES192
+    assert vscp_aes.key_encryption(vscp.VSCP_DEFAULT_KEY32) == vscp.VSCP_ENCRYPTION_AES256
+    with pytest.raises(ValueError):
+        vscp_aes.make_key(b'short')
+
+def test_frame_layout_is_cbc():
+    # Short (chained) and long (one-shot CBC) frames must give plain AES-CBC
+    key = bytes.fromhex(vscp.VSCP_DEFAULT_KEY16)
+    iv = bytes(range(16, 32))
+    for size in (0, 8, 100):
+        frame = vscp_packet.make_packet0(make_event(size=size))
+        enc = vscp_aes.encrypt_frame(frame, key, iv)
+        assert enc[0] == vscp.VSCP_ENCRYPTION_AES128
+        assert (len(enc) - 17) % 16 == 0
+        assert bytes(enc[-16:]) == iv
+        plain = AES.new(key, AES.MODE_CBC, iv).decrypt(bytes(enc[1:-16]))
+        assert plain[:len(frame) - 1] == bytes(frame[1:])
+
+def test_roundtrip():
+    for key in (vscp.VSCP_DEFAULT_KEY16, vscp.VSCP_DEFAULT_KEY24, vscp.VSCP_DEFAULT_KEY32):
+        enc = vscp_aes.encode_packet0_encrypted(make_event(), key)
+        ev = vscp_aes.decode_packet0_encrypted(enc, key)
+        assert (ev.vscpclass, ev.vscptype, bytes(ev.data)) == (10, 6, b'\x00\x01\x02')
+    # Plain frames pass through
+    ev = vscp_aes.decode_packet0_encrypted(vscp_packet.make_packet0(make_event()), key)
+    assert ev.vscptype == 6
+
+def test_wrong_key():
+    enc = vscp_aes.encode_packet0_encrypted(make_event(), vscp.VSCP_DEFAULT_KEY16)
+    with pytest.raises(ValueError):
+        vscp_aes.decode_packet0_encrypted(enc, vscp.VSCP_DEFAULT_KEY32)
+    with pytest.raises(ValueError):
+        vscp_aes.decode_packet0_encrypted(enc, "00" * 16)        # CRC error
+    with pytest.raises(ValueError):
+        vscp_aes.decode_packet0_encrypted(enc, {vscp.VSCP_ENCRYPTION_AES256: vscp.VSCP_DEFAULT_KEY32})
+
+def test_decode_many():
+    keys = {vscp.VSCP_ENCRYPTION_AES128: vscp.VSCP_DEFAULT_KEY16,
+            vscp.VSCP_ENCRYPTION_AES256: vscp.VSCP_DEFAULT_KEY32}
+    frames = []
+    for i in range(20):
+        key = keys[vscp.VSCP_ENCRYPTION_AES128 if i % 2 else vscp.VSCP_ENCRYPTION_AES256]
+        frames.append(vscp_aes.encode_packet0_encrypted(make_event(i, i), key))
+    frames.append(vscp_packet.make_packet0(make_event(99)))
+    frames.append(b'\x01' + bytes(40))
+    evs = vscp_aes.decode_packet0_many(frames, keys)
+    assert [ev.vscptype for ev in evs[:21]] == list(range(20)) + [99]
+    assert [bytes(ev.data) for ev in evs[:20]] == [bytes(range(i)) for i in range(20)]
+    assert evs[21] is None
@@ -0,0 +1,56 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import vscp
+import vscp_batch
+
+
+def make_event(vscpclass, vscptype, data, nickname=1):
+    ex = vscp.vscpEventEx()
+    ex.head = vscp.VSCP_PRIORITY_NORMAL
+    ex.vscpclass = vscpclass
+    ex.vscptype = vscptype
+    ex.guid[15] = nickname
+    ex.sizedata = len(data)
+    for i, b in enumerate(data):
+        ex.data[i] = b
+    return ex
+
+def test_roundtrip():
+    events = [make_event(10, 6, [1, 2, 3]), make_event(20, 3, []), make_event(10, 5, list(range(40)), 7)]
+    batch = vscp_batch.VscpEventBatch.fromEvents(events)
+    assert len(batch) == 3
+    assert bytes(batch.getData(0)) == b'\x01\x02\x03'
+    assert batch.getSizeData(1) == 0
+    assert batch.getGuid(2)[15] == 7
+    for src, ex in zip(events, batch):
+        assert ex.vscpclass == src.vscpclass
+        assert ex.vscptype == src.vscptype
+        assert ex.head == src.head
+        assert ex.timestamp == src.timestamp
+        assert ex.getGuidStr() == src.getGuidStr()
+        assert list(ex.data[:ex.sizedata]) == list(src.data[:src.sizedata])
+
+def test_slice_and_select():
+    batch = vscp_batch.VscpEventBatch()
+    for i in range(10):
+        batch.appendRow(10 if i % 2 else 20, i, data=bytes([i] * i))
+    part = batch[3:6]
+    assert len(part) == 3
+    assert list(part.vscptype) == [3, 4, 5]
+    assert bytes(part.getData(1)) == bytes([4] * 4)
+    assert part.offsets[0] == 0
+    odd = batch.select(vscpclass=10)
+    assert list(odd.vscptype) == [1, 3, 5, 7, 9]
+    assert bytes(odd.getData(2)) == bytes([5] * 5)
+    assert list(batch[::5].vscptype) == [0, 5]
+    assert batch[-1].vscptype == 9
+
+def test_extend_batch():
+    a = vscp_batch.VscpEventBatch()
+    a.appendRow(1, 1, data=b'ab')
+    b = vscp_batch.VscpEventBatch()
+    b.appendRow(2, 2, data=b'cde')
+    a.extend(b)
+    assert len(a) == 2
+    assert bytes(a.getData(1)) == b'cde'
+    assert a.nbytes() < 200
@@ -0,0 +1,96 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import asyncio
+import pytest
+import vscp
+import vscp_bootloader
+from vscp_bootloader import BlockMap, SimulatedBootNode, VscpBootloader
+
+
+def guid(nickname):
+    return bytes(range(15)) + bytes((nickname,))
+
+def image(block_size=64):
+    bm = BlockMap(block_size)
+    bm.write(0, bytes(range(100)))
+    bm.write(5 * block_size + 3, b'\x01\x02\x03')
+    return bm
+
+def connect(nodes, **kwargs):
+    loader = VscpBootloader(lambda ev: [n.feed(ev) for n in nodes], **kwargs)
+    for n in nodes:
+        n._send = loader.feed
+    return loader
+
+def test_intel_hex_roundtrip():
+    segs = [(0x0000, bytes(range(40))), (0x1FFF8, bytes(range(20)))]
+    text = vscp_bootloader.make_intel_hex(segs)
+    assert vscp_bootloader.parse_intel_hex(text) == segs
+    with pytest.raises(ValueError):
+        vscp_bootloader.parse_intel_hex(text.replace(":10", ":11", 1))
+
+def test_blockmap_skips_erased():
+    bm = BlockMap.fromHex(vscp_bootloader.make_intel_hex([(0, bytes(70)), (256, b'\xff' * 64)]), 64)
+    assert bm.dirtyBlocks() == [0, 1]
+    assert bm.blockCount() == 5
+    assert bm.getBlock(1)[:6] == bytes(6) and bm.getBlock(1)[6:] == b'\xff' * 58
+    with pytest.raises(ValueError):
+        BlockMap(60)
+
+def test_flash_windowed():
+    async def run():
+        bm = image()
+        node = SimulatedBootNode(guid(7), None, 64, 16, buffer_size=256, latency=0.001)
+        loader = connect([node])
+        n = await loader.flash(guid(7), bm, buffer_size=256)
+        return bm, node, n
+    bm, node, n = asyncio.run(run())
+    assert n == 3
+    assert node.activated and node.cntOverruns == 0
+    assert bytes(node.flash) == b''.join(bm.getBlock(i) for i in range(16))
+
+def test_flash_resends_bad_block():
+    async def run():
+        node = SimulatedBootNode(guid(7), None, 64, 16, buffer_size=128, corrupt=[5])
+        loader = connect([node])
+        await loader.flash(guid(7), image(), window=2)
+        return node, loader
+    node, loader = asyncio.run(run())
+    assert node.activated
+    assert loader.cntResent == 1
+
+def test_flash_resends_bad_block_window1():
+    async def run():
+        node = SimulatedBootNode(guid(7), None, 64, 16, buffer_size=64, corrupt=[5])
+        loader = connect([node])
+        await loader.flash(guid(7), image())
+        return node, loader
+    node, loader = asyncio.run(run())
+    assert node.activated
+    assert loader.cntResent == 1
+    assert node.cntOverruns == 0
+
+def test_flash_errors():
+    async def run(node, **kwargs):
+        loader = connect([node], timeout=0.05, retries=1)
+        await loader.flash(guid(7), image(), **kwargs)
+    with pytest.raises(vscp.VscpError):
+        asyncio.run(run(SimulatedBootNode(guid(7), None, 32, 16)))
+    with pytest.raises(vscp.VscpError):
+        asyncio.run(run(SimulatedBootNode(guid(7), None, 64, 4)))
+    with pytest.raises(vscp.VscpError) as e:
+        asyncio.run(run(SimulatedBootNode(guid(8), None, 64, 16)))
+    assert e.value.code == vscp.VSCP_ERROR_TIMEOUT
+
+def test_flash_many_level2():
+    async def run():
+        nodes = [SimulatedBootNode(guid(i), None, 64, 16, buffer_size=512, level2=True)
+                    for i in range(1, 6)]
+        progress = []
+        loader = connect(nodes, level2=True, progress=lambda g, d, t: progress.append((g, d, t)))
+        res = await loader.flashMany([guid(i) for i in range(1, 6)], image(), buffer_size=512)
+        return nodes, res, progress
+    nodes, res, progress = asyncio.run(run())
+    assert list(res.values()) == [3] * 5
+    assert all(n.activated for n in nodes)
+    assert len(progress) == 15
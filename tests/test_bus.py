@@ -0,0 +1,109 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import asyncio
+import pytest
+import vscp
+import vscp_batch
+import vscp_bus
+from vscp_bus import EventBus
+
+def ev(vscpclass, prio=vscp.VSCP_PRIORITY_NORMAL, n=0):
+    return vscp.vscpEventEx.new(vscpclass, 1, None, bytes((n,)), head=prio)
+
+def class_filter(vscpclass):
+    flt = vscp.vscpEventFilter()
+    flt.mask_class = 0xFFFF
+    flt.filter_class = vscpclass
+    return flt
+
+def drain(sub):
+    out = []
+    while True:
+        e = sub.get_nowait()
+        if e is None:
+            return out
+        out.append((e.head >> 5, e.data[0]))
+
+def test_filter_and_priority():
+    bus = EventBus()
+    everything = bus.subscribe()
+    alarms = bus.subscribe(class_filter(1))
+    assert bus.publish(ev(10, vscp.VSCP_PRIORITY_7, 1)) == 1
+    assert bus.publish(ev(1, vscp.VSCP_PRIORITY_0, 2)) == 2
+    bus.publish(ev(10, vscp.VSCP_PRIORITY_3, 3))
+    bus.publish(ev(10, vscp.VSCP_PRIORITY_0, 4))
+    assert everything.pending() == 4 and alarms.pending() == 1
+    assert drain(everything) == [(0, 2), (0, 4), (3, 3), (7, 1)]
+    assert drain(alarms) == [(0, 2)]
+    alarms.setFilter(class_filter(10))
+    bus.publish(ev(10))
+    assert alarms.pending() == 1
+
+def test_set_filter_after_close():
+    bus = EventBus()
+    sub = bus.subscribe()
+    other = bus.subscribe()
+    sub.close()
+    with pytest.raises(vscp.VscpError):
+        sub.setFilter(vscp.vscpEventFilter())
+    bus.publish(ev(10))
+    assert other.pending() == 1
+
+@pytest.mark.parametrize("policy,expected", [(vscp_bus.DROP_OLDEST, [(0, 3), (7, 2), (7, 4)]),
+                                             (vscp_bus.DROP_NEWEST, [(0, 3), (7, 1), (7, 2)]),
+                                             (vscp_bus.BLOCK, [(0, 3), (7, 1), (7, 2)])])
+def test_overflow(policy, expected):
+    bus = EventBus()
+    sub = bus.subscribe(maxqueue=3, policy=policy)
+    for n, prio in ((1, vscp.VSCP_PRIORITY_7), (2, vscp.VSCP_PRIORITY_7), (3, vscp.VSCP_PRIORITY_0),
+                    (4, vscp.VSCP_PRIORITY_7)):
+        bus.publish(ev(10, prio, n))
+    assert drain(sub) == expected
+    assert sub.stats.cntOverruns == 1 and bus.stats.cntOverruns == 1
+
+def test_alarm_kept_when_full():
+    bus = EventBus()
+    sub = bus.subscribe(maxqueue=2, policy=vscp_bus.DROP_NEWEST)
+    bus.publish(ev(10, vscp.VSCP_PRIORITY_7, 1))
+    bus.publish(ev(10, vscp.VSCP_PRIORITY_7, 2))
+    bus.publish(ev(1, vscp.VSCP_PRIORITY_0, 3))
+    assert drain(sub) == [(0, 3), (7, 1)]
+
+def test_async_and_block():
+    async def run():
+        bus = EventBus()
+        slow = bus.subscribe(maxqueue=2, policy=vscp_bus.BLOCK)
+        fast = bus.subscribe(maxqueue=100)
+        got = []
+
+        async def consumer():
+            async for e in slow:
+                got.append(e.data[0])
+                await asyncio.sleep(0.001)
+
+        task = asyncio.ensure_future(consumer())
+        for n in range(10):
+            await bus.publishWait(ev(10, n=n))
+        assert fast.pending() == 10
+        while slow.pending():
+            await asyncio.sleep(0.001)
+        slow.close()
+        await task
+        assert len(bus) == 1
+        assert [e.data[0] for e in await fast.getMany(4)] == [0, 1, 2, 3]
+        assert len(await fast.getMany()) == 6
+        return got, slow
+    got, slow = asyncio.run(run())
+    assert got == list(range(10))
+    assert slow.stats.cntOverruns == 0
+
+def test_publish_batch():
+    bus = EventBus()
+    a = bus.subscribe(class_filter(10))
+    b = bus.subscribe(class_filter(20), maxqueue=2)
+    batch = vscp_batch.VscpEventBatch.fromEvents([ev(10, n=i) for i in range(3)] +
+                                                 [ev(20, n=i) for i in range(3)])
+    assert bus.publishMany(batch) == 6
+    assert a.pending() == 3 and b.pending() == 2
+    assert b.stats.cntOverruns == 1
+    assert bus.stats.cntTransmitFrames == 6
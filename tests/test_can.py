@@ -0,0 +1,60 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import pytest
+import vscp
+import vscp_can
+import vscp_batch
+
+
+def test_can_id():
+    head = vscp.VSCP_PRIORITY_1 | vscp.VSCP_HEADER_HARD_CODED
+    canid = vscp_can.make_can_id(head, 20, 3, 0x42)
+    assert canid == (1 << 26) | vscp.VSCP_CAN_ID_HARD_CODED | (20 << 16) | (3 << 8) | 0x42
+    assert vscp_can.split_can_id(canid) == (head, 20, 3, 0x42)
+
+def test_event_roundtrip():
+    ifguid = bytes(range(16))
+    ex = vscp_can.event_from_can((7 << 26) | (10 << 16) | (6 << 8) | 0x11, b'\x88\x01\x02', ifguid)
+    assert (ex.vscpclass, ex.vscptype, ex.head, ex.sizedata) == (10, 6, 0xE0, 3)
+    assert bytes(ex.guid) == ifguid[:15] + b'\x11'
+    canid, data = vscp_can.can_from_event(ex)
+    assert canid == (7 << 26) | (10 << 16) | (6 << 8) | 0x11
+    assert data == b'\x88\x01\x02'
+
+def test_level1_over_level2():
+    dest = bytes(15) + b'\x22'
+    ex = vscp.vscpEventEx.new(512 + 20, 3, None, dest + b'\x01\x02')
+    canid, data = vscp_can.can_from_event(ex)
+    assert vscp_can.split_can_id(canid)[1:] == (20, 3, 0x22)
+    assert data == b'\x01\x02'
+    with pytest.raises(ValueError):
+        vscp_can.can_from_event(vscp.vscpEventEx.new(1026, 3))
+    with pytest.raises(ValueError):
+        vscp_can.can_from_event(vscp.vscpEventEx.new(10, 6, None, bytes(9)))
+
+def test_batch_socketcan():
+    ids = [vscp_can.make_can_id(i << 5, 10 + i, i, i) for i in range(8)]
+    dlcs = bytes(range(8))
+    data = b"".join(bytes(range(k * 8, k * 8 + k)) + bytes(8 - k) for k in range(8))
+    frames = vscp_can.join_can_frames(ids, dlcs, data)
+    assert len(frames) == 8 * vscp_can.CAN_FRAME_SIZE
+    canid, dlc, slot = vscp_can.CAN_FRAME.unpack_from(frames, 3 * vscp_can.CAN_FRAME_SIZE)
+    assert (canid, dlc, slot[:3]) == (ids[3] | vscp_can.CAN_EFF_FLAG, 3, data[24:27])
+    # Remote request and standard frames are skipped
+    frames += vscp_can.CAN_FRAME.pack(ids[0] | vscp_can.CAN_EFF_FLAG | vscp_can.CAN_RTR_FLAG, 0, bytes(8))
+    frames += vscp_can.CAN_FRAME.pack(0x123, 0, bytes(8))
+    batch = vscp_can.batch_from_can_frames(frames, timestamp=list(range(10)))
+    assert len(batch) == 8
+    assert list(batch.vscpclass) == list(range(10, 18))
+    assert list(batch.timestamp) == list(range(8))
+    assert bytes(batch.getData(3)) == data[24:27]
+    assert batch[5].guid[15] == 5
+    assert vscp_can.can_frames_from_batch(batch) == frames[:8 * vscp_can.CAN_FRAME_SIZE]
+
+def test_batch_from_events():
+    events = [vscp.vscpEventEx.new(20, 3, bytes(15) + b'\x05', b'\x01'),
+              vscp.vscpEventEx.new(512 + 20, 4, None, bytes(15) + b'\x22' + b'\x02')]
+    ids, dlcs, data = vscp_can.can_from_batch(vscp_batch.VscpEventBatch.fromEvents(events))
+    assert [vscp_can.split_can_id(i)[1:] for i in ids] == [(20, 3, 5), (20, 4, 0x22)]
+    assert dlcs == b'\x01\x01'
+    assert data == b'\x01' + bytes(7) + b'\x02' + bytes(7)
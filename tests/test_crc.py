@@ -0,0 +1,58 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import os
+import vscp
+import vscp_crc
+import vscp_packet
+
+CHECK = b"123456789"
+
+
+def test_check_values():
+    assert vscp_crc.crc8(CHECK) == 0xA1
+    assert vscp_crc.crc16(CHECK) == 0x29B1
+    assert vscp_crc.crc32(CHECK) == 0xCBF43926
+    assert vscp_crc.crc32_slice8(CHECK) == 0xCBF43926
+
+def test_slice8_matches_zlib():
+    data = os.urandom(1031)
+    assert vscp_crc.crc32_slice8(data) == vscp_crc.crc32(data)
+    assert vscp_crc.crc32_slice8(data[100:], vscp_crc.crc32_slice8(data[:100])) == vscp_crc.crc32(data)
+
+def test_incremental():
+    data = bytearray(os.urandom(300))
+    for cls, func in ((vscp_crc.Crc8, vscp_crc.crc8),
+                      (vscp_crc.Crc16, vscp_crc.crc16),
+                      (vscp_crc.Crc32, vscp_crc.crc32)):
+        c = cls()
+        c.update(data[:7]).update(memoryview(data)[7:])
+        assert c.value == func(data)
+    assert list(vscp_crc.crc16_many([CHECK, CHECK])) == [0x29B1, 0x29B1]
+
+def test_packet0_crc():
+    ex = vscp.vscpEventEx()
+    ex.vscpclass = 10
+    ex.sizedata = 2
+    frame = vscp_packet.make_packet0(ex)
+    assert vscp_crc.check_packet0(frame)
+    assert vscp_crc.packet0_crc(frame) == (frame[-2] << 8) + frame[-1]
+    frame[vscp.VSCP_MULTICAST_PACKET0_POS_VSCP_DATA] ^= 1
+    assert vscp_crc.check_packet0_many([frame]) == [False]
+    try:
+        vscp_packet.decode_packet0(frame)
+        assert False
+    except ValueError:
+        pass
+    assert vscp_packet.decode_packet0(frame, verify=False).vscpclass == 10
+    assert not vscp_crc.check_packet0(b'')
+    assert not vscp_crc.check_packet0(frame[:5])
+    assert not vscp_crc.check_packet0(frame, len(frame) - 3)
+
+def test_packet0_no_crc():
+    ex = vscp.vscpEventEx()
+    ex.head = vscp.VSCP_HEADER_NO_CRC
+    frame = vscp_packet.make_packet0(ex)
+    assert (frame[-2] << 8) + frame[-1] == vscp.VSCP_NOCRC_CALC_DUMMY_CRC
+    frame[vscp.VSCP_MULTICAST_PACKET0_POS_VSCP_CLASS_LSB] = 20
+    assert vscp_crc.check_packet0(frame)
+    assert vscp_packet.decode_packet0(frame).vscpclass == 20
@@ -0,0 +1,53 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import pytest
+import vscp
+import vscp_dm
+import vscp_batch
+
+
+def event(vscpclass, vscptype, data=b'', nickname=1, head=0):
+    return vscp.vscpEventEx.new(vscpclass, vscptype, bytes(15) + bytes([nickname]), data, head=head)
+
+def make_rows():
+    E = vscp_dm.VSCP_LEVEL1_DM_FLAG_ENABLED
+    return [vscp_dm.make_row(20, 3, action=1, param=10, index=0),
+            vscp_dm.make_row(20, 0, action=2, type_mask=0, index=1),
+            vscp_dm.make_row(20, 3, action=3, index=2, flags=E | vscp_dm.VSCP_LEVEL1_DM_FLAG_CHECK_ZONE),
+            vscp_dm.make_row(20, 3, action=4, index=3, oaddr=7,
+                                flags=E | vscp_dm.VSCP_LEVEL1_DM_FLAG_CHECK_OADDR),
+            vscp_dm.make_row(300, 1, action=5, index=4),
+            vscp_dm.make_row(20, 3, action=6, index=5, flags=0),
+            vscp_dm.make_row(20, 4, action=7, index=6, flags=E | vscp_dm.VSCP_LEVEL1_DM_FLAG_HARDCODED)]
+
+def test_parse_roundtrip():
+    rows = make_rows()
+    raw = vscp_dm.make_dm(rows)
+    assert len(raw) == 7 * vscp.VSCP_LEVEL1_DM_ROW_SIZE
+    assert raw[4 * 8 + vscp.VSCP_LEVEL1_DM_OFFSET_FLAGS] & 3 == 3      # Class 300 needs bit 8
+    assert vscp_dm.parse_dm(raw) == rows
+    with pytest.raises(ValueError):
+        vscp_dm.parse_dm(raw[:-1], count=7)
+
+def test_evaluate():
+    dm = vscp_dm.DecisionMatrix(vscp_dm.parse_dm(vscp_dm.make_dm(make_rows())), zone=5)
+    assert len(dm) == 6
+    acts = lambda ev: [a.action for a in dm.evaluate(ev)]
+    assert acts(event(20, 3, b'\x00\x05')) == [1, 2, 3]
+    assert acts(event(20, 3, b'\x00\x06')) == [1, 2]
+    assert acts(event(20, 3, b'\x00\xff', nickname=7)) == [1, 2, 3, 4]
+    assert acts(event(20, 3)) == [1, 2]
+    assert acts(event(20, 9)) == [2]
+    assert acts(event(300, 1)) == [5]
+    assert acts(event(44, 1)) == []
+    assert acts(event(20, 4)) == [2]
+    assert acts(event(20, 4, head=vscp.VSCP_HEADER_HARD_CODED)) == [2, 7]
+    assert dm.evaluate(event(20, 3))[0] == vscp_dm.DMAction(0, 1, 10)
+
+def test_evaluate_batch():
+    dm = vscp_dm.DecisionMatrix(make_rows(), zone=5)
+    events = [event(20, 3, b'\x00\x05'), event(20, 3, b'\x00\xff', nickname=7), event(1026, 3),
+              event(300, 1), event(20, 4, head=vscp.VSCP_HEADER_HARD_CODED)]
+    batch = vscp_batch.VscpEventBatch.fromEvents(events)
+    assert dm.evaluateBatch(batch) == [dm.evaluate(ev) for ev in events]
+    assert dm.countBatch(batch) == {0: 2, 1: 3, 2: 2, 3: 1, 4: 1, 6: 1}
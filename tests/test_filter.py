@@ -0,0 +1,84 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import random
+import vscp
+import vscp_batch
+import vscp_filter
+
+
+def make_filter(vscpclass=None, vscptype=None, priority=None, nickname=None, class_mask=0xFFFF):
+    flt = vscp.vscpEventFilter()
+    if vscpclass is not None:
+        flt.filter_class = vscpclass
+        flt.mask_class = class_mask
+    if vscptype is not None:
+        flt.filter_type = vscptype
+        flt.mask_type = 0xFFFF
+    if priority is not None:
+        flt.filter_priority = priority
+        flt.mask_priority = 0x07
+    if nickname is not None:
+        flt.filter_guid[15] = nickname
+        flt.mask_guid[15] = 0xFF
+    return flt
+
+def make_batch(n, seed=1):
+    rnd = random.Random(seed)
+    batch = vscp_batch.VscpEventBatch()
+    for _ in range(n):
+        g = bytearray(16)
+        g[15] = rnd.randrange(4)
+        batch.appendRow(rnd.choice((10, 20, 30, 522)), rnd.randrange(8), guid=g,
+                        head=rnd.randrange(8) << 5)
+    return batch
+
+def test_filter_match():
+    ex = vscp.vscpEventEx()
+    ex.vscpclass = 10
+    ex.vscptype = 6
+    ex.head = vscp.VSCP_PRIORITY_3
+    ex.guid[15] = 2
+    assert vscp.vscpEventFilter().match(ex)
+    assert make_filter(10, 6).match(ex)
+    assert not make_filter(10, 5).match(ex)
+    assert make_filter(priority=3).match(ex)
+    assert not make_filter(priority=4).match(ex)
+    assert make_filter(nickname=2).match(ex)
+    assert not make_filter(nickname=3).match(ex)
+
+def test_filterset_same_as_linear():
+    filters = {
+        "all": make_filter(),
+        "temp": make_filter(10, 6),
+        "class10": make_filter(10),
+        "class20_prio": make_filter(20, priority=2),
+        "node3": make_filter(nickname=3),
+        "level2": make_filter(512, class_mask=0xFE00),
+        "t1_node1": make_filter(30, 1, nickname=1),
+    }
+    fs = vscp_filter.FilterSet()
+    for sid, flt in filters.items():
+        fs.add(sid, flt)
+    assert len(fs) == len(filters)
+    batch = make_batch(500)
+    rows = fs.matchBatch(batch)
+    for i in range(len(batch)):
+        ex = batch[i]
+        expect = sorted(sid for sid, flt in filters.items() if flt.match(ex))
+        assert sorted(fs.match(ex)) == expect
+        assert sorted(rows[i]) == expect
+    bysub = fs.matchBatchBySubscriber(batch)
+    assert len(bysub["all"]) == len(batch)
+
+def test_filterset_remove():
+    fs = vscp_filter.FilterSet()
+    fs.add(1, make_filter(10, 6))
+    fs.add(2, make_filter(10))
+    ex = vscp.vscpEventEx()
+    ex.vscpclass = 10
+    ex.vscptype = 6
+    assert sorted(fs.match(ex)) == [1, 2]
+    fs.remove(1)
+    assert fs.match(ex) == [2]
+    fs.add(2, make_filter(20))
+    assert fs.match(ex) == []
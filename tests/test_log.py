@@ -0,0 +1,60 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import os
+import vscp
+import vscp_batch
+import vscp_log
+
+
+T0 = 1600000000.0
+
+def make_batch(n):
+    batch = vscp_batch.VscpEventBatch()
+    for i in range(n):
+        batch.appendRow(10 + i % 3, i % 5, bytes(15) + bytes([i & 0xFF]), bytes([i & 0xFF] * (i % 9)),
+                        obid=i)
+    return batch
+
+def test_write_query(tmp_path):
+    path = str(tmp_path)
+    with vscp_log.EventLogWriter(path, segment_size=4096) as log:
+        log.appendBatch(make_batch(300), [T0 + i for i in range(300)])
+        log.append(vscp.vscpEventEx.new(20, 1, None, b'\x01\x02'), T0 + 300, obid=7)
+    names = os.listdir(path)
+    assert len([n for n in names if n.endswith(".vlog")]) > 1
+    assert len([n for n in names if n.endswith(".vidx")]) > 0
+    with vscp_log.EventLogReader(path) as log:
+        assert len(log) == 301
+        assert log.getTimeRange() == (T0, T0 + 300)
+        recs = list(log.query(vscpclass=10, start=T0 + 30, end=T0 + 60))
+        assert [r.time - T0 for r in recs] == list(range(30, 60, 3))
+        assert [r.obid for r in recs] == list(range(30, 60, 3))
+        assert all(r.event.vscpclass == 10 for r in recs)
+        assert bytes(recs[1].event.data) == bytes([33] * 6)
+        assert log.count(vscpclass=11, vscptype=1) == len(list(log.query(11, 1)))
+        assert log.count(vscptype=4) == 60
+        last = list(log.query(start=T0 + 300))
+        assert last[0].obid == 7 and bytes(last[0].event.data) == b'\x01\x02'
+        batch = log.queryBatch(vscpclass=12)
+        assert len(batch) == 100 and batch.obid[1] == 5
+        del recs, last
+
+def test_reopen_after_crash(tmp_path):
+    path = str(tmp_path)
+    log = vscp_log.EventLogWriter(path)
+    log.appendBatch(make_batch(10), T0)
+    log.close()
+    # Partial record at the end of the open segment
+    with open(os.path.join(path, "00000000.vlog"), "ab") as f:
+        f.write(b'\x00' * 20)
+    log = vscp_log.EventLogWriter(path)
+    log.append(vscp.vscpEventEx.new(30, 2), T0 + 1)
+    log.flush()
+    reader = vscp_log.EventLogReader(path, verify=True)
+    assert len(reader) == 11
+    assert [r.event.vscpclass for r in reader.query(start=T0 + 1)] == [30]
+    log.append(vscp.vscpEventEx.new(30, 3), T0 + 2)
+    log.close()
+    reader.refresh()
+    assert len(reader) == 12
+    reader.close()
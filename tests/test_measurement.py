@@ -0,0 +1,74 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import struct
+import pytest
+import vscp
+import vscp_batch
+import vscp_measurement as vm
+
+
+def m(vscpclass, data):
+    return vm.decode_measurement(vscp.vscpEventEx.new(vscpclass, 6, None, data))
+
+def test_codings():
+    assert m(10, b'\x0b\x01\x02') == vm.Measurement(0x0102, 1, 3, None, None, 0x0b)       # Bits
+    assert m(10, b'\x20\xff').value == 255
+    assert m(10, b'\x60\xff\xfe').value == -2
+    assert m(10, b'\x68\x00\x80').value == 128
+    assert m(10, b'\x80\x82\x04\xd2').value == pytest.approx(12.34)                   # Normalized
+    assert m(10, b'\x80\x02\xff\xfb').value == -500.0
+    assert m(10, b'\xa0' + struct.pack(">f", 1.5)).value == 1.5
+    assert m(10, b'\x40' + b'21.5').value == 21.5
+    assert m(10, b'\x40' + b'on').value == "on"
+    with pytest.raises(ValueError):
+        m(10, b'\x60')
+    with pytest.raises(ValueError):
+        m(10, b'\xe0\x01')
+    assert m(20, b'\x60\x01') is None
+
+def test_layouts():
+    assert m(65, b'\x02\x01\x03\x68\x00\x10') == vm.Measurement(16, 1, 2, 1, 3, 0x68)
+    assert m(60, struct.pack(">d", -3.25)).value == -3.25
+    assert m(70, struct.pack(">f", 0.5)).value == 0.5
+    assert m(1060, b'\x02\x01\x03\x04' + struct.pack(">d", 7.5)) == \
+            vm.Measurement(7.5, 4, 2, 1, 3, vscp.VSCP_DATACODING_DOUBLE)
+    assert m(1040, b'\x02\x01\x03\x04' + b'-1.25').value == -1.25
+    assert m(512 + 10, bytes(16) + b'\x60\x05').value == 5
+    assert vm.is_measurement(522) and not vm.is_measurement(1550)
+
+def make_batch():
+    guids = [bytes(15) + bytes([i]) for i in range(4)]
+    rows = [(10, b'\x60\x01\x02'), (10, b'\x61\xff'), (10, b'\x80\x81\x00\x0f'),
+            (10, b'\xa0' + struct.pack(">f", 2.5)), (10, b'\x40' + b'3.5'), (10, b'\x40x'),
+            (65, b'\x04\x01\x02\x20\x07'), (60, struct.pack(">d", 1.25)), (70, struct.pack(">f", -1)),
+            (1060, b'\x01\x00\x00\x02' + struct.pack(">d", 9.0)), (1040, b'\x01\x00\x00\x02' + b'8'),
+            (522, bytes(16) + b'\x68\x01\x00'), (20, b'\x60\x01'), (10, b''), (10, b'\x60')]
+    batch = vscp_batch.VscpEventBatch()
+    for i in range(60):
+        c, d = rows[i % len(rows)]
+        batch.appendRow(c, 6, guids[i % 4], d, timestamp=i)
+    return batch
+
+def test_batch():
+    series = vm.decode_batch(make_batch(), use_numpy=False)
+    s = series[(10, 6, vscp.vscpGuid(bytes(16)), 0)]
+    assert list(s.value) == [258.0, 3.5, 1.5, 2.5]
+    assert list(s.timestamp) == [0, 4, 32, 48]
+    assert series[(10, 6, vscp.vscpGuid(bytes(15) + b'\x02'), 0)].value[0] == 1.5
+    assert series[(65, 6, vscp.vscpGuid(bytes(15) + b'\x02'), 4)].zone[0] == 1
+    assert series[(522, 6, vscp.vscpGuid(bytes(15) + b'\x03'), 0)].value[0] == 256
+    assert sum(len(s.rows) for s in series.values()) == 44
+
+def test_batch_numpy():
+    np = pytest.importorskip("numpy")
+    batch = make_batch()
+    expected = vm.decode_batch(batch, use_numpy=False)
+    series = vm.decode_batch(batch)
+    assert set(series) == set(expected)
+    for key, s in series.items():
+        e = expected[key]
+        assert list(s.rows) == list(e.rows)
+        assert list(s.timestamp) == list(e.timestamp)
+        assert np.allclose(s.value, list(e.value))
+        assert list(s.unit) == list(e.unit)
+        assert list(s.zone) == list(e.zone) and list(s.subzone) == list(e.subzone)
@@ -0,0 +1,92 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import pytest
+import vscp
+import vscp_batch
+import vscp_nodes
+from vscp_nodes import NodeRegistry, TimerWheel
+
+IFGUID = bytes(range(16))
+
+def guid(i):
+    return bytes(14) + i.to_bytes(2, "big")
+
+def proxy(i, name="node", ifname="can0", level=0):
+    return vscp.vscpEventEx.new(vscp_nodes.VSCP_CLASS2_INFORMATION,
+                                vscp_nodes.VSCP2_TYPE_INFORMATION_PROXY_HEART_BEAT, IFGUID,
+                                vscp_nodes.make_proxy_heartbeat(guid(i), IFGUID, level, name, ifname))
+
+def test_decode():
+    data = vscp_nodes.make_proxy_heartbeat(guid(1), IFGUID, 1, "kitchen", "eth0")
+    assert len(data) == vscp.VSCP_MULTICAST_PROXY_HEARTBEAT_DATA_SIZE
+    assert data[vscp.VSCP_MULTICAST_PROXY_HEARTBEAT_POS_IFLEVEL] == 1
+    assert data[vscp.VSCP_MULTICAST_PROXY_HEARTBEAT_POS_NODENAME:][:7] == b'kitchen'
+    assert vscp_nodes.decode_proxy_heartbeat(data) == \
+            (vscp.vscpGuid(guid(1)), vscp.vscpGuid(IFGUID), 1, "kitchen", "eth0")
+    caps = vscp.VSCP_SERVER_CAPABILITY_TCPIP | vscp.VSCP_SERVER_CAPABILITY_AES128
+    data = vscp_nodes.make_server_caps(caps, guid(2), "192.168.1.2", "srv", (9599, 0, 8884))
+    assert data[vscp.VSCP_CAPABILITY_OFFSET_SRV_NAME:][:3] == b'srv'
+    assert vscp_nodes.decode_server_caps(data) == \
+            (caps, vscp.vscpGuid(guid(2)), "192.168.1.2", "srv", (9599, 8884))
+    assert vscp_nodes.decode_server_caps(vscp_nodes.make_server_caps(0, guid(2), "fe80::1", ""))[2] == "fe80::1"
+    with pytest.raises(ValueError):
+        vscp_nodes.decode_proxy_heartbeat(bytes(100))
+
+def test_timer_wheel():
+    w = TimerWheel(1.0, 8)
+    w.schedule("a", 3.5)
+    w.schedule("b", 20.0)           # More than one turn away
+    w.schedule("c", 5.0)
+    assert w.advance(0) == []
+    w.schedule("c", 30.0)
+    assert w.advance(4.0) == ["a"]
+    assert w.advance(12.0) == []
+    assert sorted(w.advance(100.0)) == ["b", "c"]
+    assert len(w) == 0
+    w.schedule("d", 50.0)           # In the past
+    assert w.advance(101.0) == ["d"]
+
+def test_registry():
+    changes = []
+    reg = NodeRegistry(ttl=10, clock=lambda: 0.0)
+    reg.addListener(lambda change, node, fields: changes.append((change, node.guid[15], fields)))
+    for i in range(5):
+        reg.feed(proxy(i), now=0.0)
+    assert len(reg) == 5 and guid(3) in reg
+    assert reg.get(guid(3)).name == "node" and reg.get(guid(3)).ifguid == vscp.vscpGuid(IFGUID)
+    assert len(reg.getInterfaceNodes(IFGUID)) == 5
+    assert [c[0] for c in changes] == [vscp_nodes.NODE_ADDED] * 5
+    del changes[:]
+    reg.feed(proxy(1), now=5.0)                 # Nothing changed
+    reg.feed(proxy(2, name="hall"), now=5.0)
+    assert changes == [(vscp_nodes.NODE_CHANGED, 2, ("name",))]
+    assert reg.getExpiry(guid(1)) == 15.0
+    del changes[:]
+    expired = reg.expire(now=11.0)
+    assert sorted(n.guid[15] for n in expired) == [0, 3, 4]
+    assert [c[0] for c in changes] == [vscp_nodes.NODE_REMOVED] * 3
+    assert len(reg.getInterfaceNodes(IFGUID)) == 2
+    assert reg.expire(now=12.0) == []
+    assert reg.remove(guid(1)).guid == vscp.vscpGuid(guid(1))
+    assert [n.guid[15] for n in reg.expire(now=16.0)] == [2]
+    assert len(reg) == 0
+
+def test_other_events():
+    reg = NodeRegistry(clock=lambda: 1.0)
+    hb = vscp.vscpEventEx.new(vscp_nodes.VSCP_CLASS1_INFORMATION,
+                                vscp_nodes.VSCP_TYPE_INFORMATION_NODE_HEARTBEAT, guid(7), b'\x00\x01\x02')
+    caps = vscp.vscpEventEx.new(vscp_nodes.VSCP_CLASS2_PROTOCOL,
+                                vscp_nodes.VSCP2_TYPE_PROTOCOL_HIGH_END_SERVER_CAPS, guid(8),
+                                vscp_nodes.make_server_caps(vscp.VSCP_SERVER_CAPABILITY_UDP, guid(8),
+                                                            "10.0.0.1", "server"))
+    bad = vscp.vscpEventEx.new(vscp_nodes.VSCP_CLASS2_INFORMATION,
+                                vscp_nodes.VSCP2_TYPE_INFORMATION_PROXY_HEART_BEAT, guid(9), b'\x00')
+    other = vscp.vscpEventEx.new(10, 6, guid(9), b'\x60\x01')
+    batch = vscp_batch.VscpEventBatch.fromEvents([hb, caps, bad, other, proxy(3)])
+    assert reg.feedMany(batch) == 3
+    assert reg.cntBadEvents == 1
+    assert reg.get(guid(7)).level == 0
+    srv = reg.get(guid(8))
+    assert srv.hasCapability(vscp.VSCP_SERVER_CAPABILITY_UDP)
+    assert not srv.hasCapability(vscp.VSCP_SERVER_CAPABILITY_TCPIP)
+    assert (srv.ipaddr, srv.srvname, srv.level) == ("10.0.0.1", "server", 1)
@@ -0,0 +1,61 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import vscp
+import vscp_packet
+import vscp_batch
+
+
+def make_event():
+    ex = vscp.vscpEventEx()
+    ex.head = vscp.VSCP_PRIORITY_NORMAL
+    ex.vscpclass = 10
+    ex.vscptype = 6
+    for i in range(16):
+        ex.guid[i] = i
+    ex.sizedata = 3
+    ex.data[0] = 0x88
+    ex.data[1] = 0x01
+    ex.data[2] = 0x02
+    return ex
+
+def test_layout():
+    ex = make_event()
+    frame = vscp_packet.make_packet0(ex)
+    assert len(frame) == 1 + vscp.VSCP_MULTICAST_PACKET0_HEADER_LENGTH + 3 + 2
+    assert frame[vscp.VSCP_MULTICAST_PACKET0_POS_PKTTYPE] == 0
+    assert frame[vscp.VSCP_MULTICAST_PACKET0_POS_HEAD_LSB] == vscp.VSCP_PRIORITY_NORMAL
+    assert frame[vscp.VSCP_MULTICAST_PACKET0_POS_VSCP_CLASS_LSB] == 10
+    assert frame[vscp.VSCP_MULTICAST_PACKET0_POS_VSCP_TYPE_LSB] == 6
+    assert frame[vscp.VSCP_MULTICAST_PACKET0_POS_VSCP_GUID + 15] == 15
+    assert frame[vscp.VSCP_MULTICAST_PACKET0_POS_VSCP_SIZE_LSB] == 3
+    assert frame[vscp.VSCP_MULTICAST_PACKET0_POS_VSCP_DATA] == 0x88
+
+def test_roundtrip_zero_copy():
+    ex = make_event()
+    buf = bytearray(100)
+    n = vscp_packet.encode_packet0(ex, buf, 10)
+    ev = vscp_packet.decode_packet0(memoryview(buf), 10)
+    assert vscp_packet.packet0_size(ev.sizedata) == n
+    assert (ev.vscpclass, ev.vscptype, ev.head, ev.timestamp) == (10, 6, ex.head, ex.timestamp)
+    assert ev.getGuidStr() == ex.getGuidStr()
+    assert ev.getIsoDateTime() == "{0:04n}-{1:02}-{2:02}T{3:02}:{4:02}:{5:02}Z".format(
+        ex.year, ex.month, ex.day, ex.hour, ex.minute, ex.second)
+    buf[10 + vscp.VSCP_MULTICAST_PACKET0_POS_VSCP_DATA] = 0x99
+    assert ev.data[0] == 0x99    # view into receive buffer
+    ex2 = ev.toEventEx()
+    assert ex2.sizedata == 3 and ex2.data[0] == 0x99
+
+def test_batch_rows():
+    batch = vscp_batch.VscpEventBatch()
+    frame = vscp_packet.make_packet0(make_event())
+    assert vscp_packet.decode_packet0_into(batch, frame) == len(frame)
+    out = bytearray(len(frame))
+    vscp_packet.encode_packet0_row(batch, 0, out)
+    assert out == frame
+
+def test_short_frame():
+    try:
+        vscp_packet.decode_packet0(bytes(20))
+        assert False
+    except ValueError:
+        pass
@@ -0,0 +1,134 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import json
+import time
+import socket
+import pytest
+import vscp
+from vscp_packet import make_packet0, decode_packet0
+from vscp_pipeline import FrameRing, VscpPipeline
+
+def frames(n, nguids=20):
+    return [make_packet0(vscp.vscpEventEx.new(10 + i % 2, 1, bytes(15) + bytes((i % nguids,)),
+                                                bytes((i & 0xff,)), timestamp=i, dt=False))
+            for i in range(n)]
+
+def class_filter(vscpclass):
+    flt = vscp.vscpEventFilter()
+    flt.mask_class = 0xFFFF
+    flt.filter_class = vscpclass
+    return flt
+
+def in_order(records):
+    last = {}
+    for rec in records:
+        ev = decode_packet0(rec)
+        g = bytes(ev.guid)
+        assert last.get(g, -1) < ev.timestamp
+        last[g] = ev.timestamp
+    return True
+
+def test_ring_wrap():
+    ring = FrameRing(4096)
+    reader = FrameRing(name=ring.name)
+    got = []
+    for i in range(500):
+        assert ring.put(bytes([i & 0xff]) * (1 + i % 300))
+        ring.commit()
+        got.extend([bytes(v) for v in reader.records()])
+        reader.release()
+    assert [len(g) for g in got] == [1 + i % 300 for i in range(500)]
+    assert got[257] == bytes([1]) * 258
+    reader.close()
+    ring.close()
+    ring.unlink()
+
+def test_ring_full():
+    ring = FrameRing(4096)
+    assert ring.put(b'x' * 2000) and ring.put(b'y' * 2000)
+    assert not ring.put(b'z' * 100, block=False)
+    assert not ring.put(b'z' * 100, timeout=0.01)
+    assert ring.pending() == 4008           # Committed while waiting
+    with pytest.raises(ValueError):
+        ring.put(b'x' * 3000)
+    ring.close()
+    ring.unlink()
+
+def test_filter_and_order():
+    fr = frames(3000)
+    fr[4] = bytearray(fr[4])
+    fr[4][-1] ^= 1                  # Bad CRC, class 10
+    fr[5] = bytearray(fr[5])
+    fr[5][-1] ^= 1                  # Bad CRC, filtered out before the check
+    with VscpPipeline(workers=3, filters=class_filter(10)) as pipe:
+        assert pipe.putMany(fr) == 3000
+        pipe.put(b'\x00\x01')       # Too short
+        pipe.close()
+        out = list(pipe)
+        assert pipe.read() == []
+    assert len(out) == 1499
+    assert all(10 == decode_packet0(r).vscpclass for r in out)
+    assert in_order(out)
+    assert pipe.getBadFrameCount() == 2 and pipe.getFilteredCount() == 1500
+    stats = pipe.getStatistics()
+    assert (stats.cntReceiveFrames, stats.cntTransmitFrames, stats.cntOverruns) == (3001, 1499, 0)
+
+def test_put_more_than_rings_hold():
+    fr = frames(3000, nguids=1)
+    size = 16384
+    assert sum(len(f) for f in fr) > 4 * size
+    with VscpPipeline(workers=1, ring_size=size) as pipe:
+        assert pipe.putMany(fr) == 3000
+        pipe.close()
+        out = pipe.read(10)
+        assert len(out) == 10
+        out += list(pipe)
+    assert len(out) == 3000 and in_order(out)
+    assert pipe.getStatistics().cntOverruns == 0
+    with VscpPipeline(workers=1, ring_size=size) as pipe:
+        start = time.monotonic()
+        n = pipe.putMany(frames(20000, nguids=1), timeout=0.5)
+        assert time.monotonic() - start < 5
+        pipe.close()
+        assert len(list(pipe)) == n
+    assert pipe.getStatistics().cntOverruns == 20000 - n
+
+def test_ndjson():
+    with VscpPipeline(workers=2, fmt="ndjson") as pipe:
+        pipe.putMany(frames(100))
+        pipe.close()
+        lines = [json.loads(line) for line in pipe]
+    assert 100 == len(lines)
+    assert sorted(d["vscpTimeStamp"] for d in lines) == list(range(100))
+
+def test_receiver():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    addr = sock.getsockname()
+    with VscpPipeline(workers=2) as pipe:
+        pipe.startReceiver(sock)
+        with pytest.raises(vscp.VscpError):
+            pipe.put(frames(1)[0])
+        tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        out = []
+        for fr in frames(200):
+            tx.sendto(fr, addr)
+            out += pipe.read(timeout=0)
+        tx.close()
+        deadline = time.monotonic() + 10
+        while len(out) < 200 and time.monotonic() < deadline:
+            out += pipe.read(timeout=0.1)
+        pipe.close()
+        out += list(pipe)
+    assert len(out) == 200 and in_order(out)
+    assert pipe.getStatistics().cntReceiveFrames == 200
+
+def test_bad_arguments():
+    with pytest.raises(ValueError):
+        VscpPipeline(workers=0)
+    with pytest.raises(ValueError):
+        VscpPipeline(fmt="xml")
+    with pytest.raises(TypeError):
+        VscpPipeline(filters=[object()])
+    with pytest.raises(ValueError):
+        FrameRing(100)
@@ -0,0 +1,145 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import asyncio
+import pytest
+import vscp
+import vscp_register
+
+
+GUID = bytes(range(15)) + b'\x05'
+
+# A node answering extended page reads/writes. Requests to drop are
+# ignored to test retries.
+class Node:
+
+    def __init__(self, transport, guid=GUID, drop=0):
+        self.transport = transport
+        self.guid = guid
+        self.drop = drop
+        self.requests = []
+        self.regs = {}
+        std = bytearray(128)
+        std[vscp.VSCP_STD_REGISTER_GUID - 0x80:vscp.VSCP_STD_REGISTER_GUID - 0x70] = guid
+        std[vscp.VSCP_STD_REGISTER_FIRMWARE_MAJOR - 0x80] = 1
+        std[vscp.VSCP_STD_REGISTER_FIRMWARE_MINOR - 0x80] = 2
+        std[vscp.VSCP_STD_REGISTER_DEVICE_URL - 0x80:vscp.VSCP_STD_REGISTER_DEVICE_URL - 0x80 + 8] = b'mdf.xml\x00'
+        self.std = std
+
+    def page(self, page):
+        return self.regs.setdefault(page, bytearray(range(128)))
+
+    def send(self, ev):
+        data = bytes(ev.data[:ev.sizedata])
+        if data[0] != self.guid[15]:
+            return
+        self.requests.append((ev.vscptype, data))
+        if self.drop:
+            self.drop -= 1
+            return
+        page = (data[1] << 8) | data[2]
+        reg = data[3]
+        if ev.vscptype == vscp_register.VSCP_TYPE_PROTOCOL_EXTENDED_PAGE_WRITE:
+            values = data[4:]
+            for i, v in enumerate(values):
+                self.set(page, reg + i, v)
+        else:
+            values = bytes(self.get(page, r) for r in range(reg, reg + data[4]))
+        loop = asyncio.get_running_loop()
+        for resp in vscp_register.make_page_responses(self.guid, page, reg, values):
+            loop.call_soon(self.transport.feed, resp)
+
+    def get(self, page, reg):
+        return self.std[reg - 0x80] if reg >= 0x80 else self.page(page)[reg]
+
+    def set(self, page, reg, v):
+        if reg >= 0x80:
+            self.std[reg - 0x80] = v
+        else:
+            self.page(page)[reg] = v
+
+def setup(drop=0, **kwargs):
+    nodes = {}
+    def send(ev):
+        for n in nodes.values():
+            n.send(ev)
+    transport = vscp_register.EventRegisterTransport(send, timeout=0.2, **kwargs)
+    node = Node(transport, drop=drop)
+    nodes[5] = node
+    return transport, node
+
+def test_coalesce():
+    assert vscp_register.coalesce([1, 2, 3, 9, 30, 31], 128, 8) == [(1, 9), (30, 2)]
+    assert vscp_register.coalesce(list(range(10)), 4, 8) == [(0, 4), (4, 4), (8, 2)]
+
+def test_cache_reads():
+    async def test():
+        transport, node = setup()
+        cache = vscp_register.RegisterCache(GUID, transport)
+        assert await cache.read(0x10, 8, page=1) == bytes(range(0x10, 0x18))
+        assert await cache.read(0x12, 2, page=1) == bytes([0x12, 0x13])
+        assert len(node.requests) == 1
+        # Two ranges with a small gap become one block read
+        assert await cache.read(0x20, 4) + await cache.read(0x26, 2) == bytes([0x20, 0x21, 0x22, 0x23, 0x26, 0x27])
+        cache.invalidate()
+        assert await cache.read(0x20, 10) == bytes(range(0x20, 0x2A))
+        assert len(node.requests) == 4
+        # Spans user and standard registers
+        assert len(await cache.read(0x7E, 4, page=2)) == 4
+        assert cache.getCached(0x7F, page=2) == 0x7F
+        assert cache.getCached(0x7F, page=3) is None
+        # The alarm register is never cached, the GUID is kept until restart
+        n = len(node.requests)
+        await cache.read(vscp.VSCP_STD_REGISTER_ALARM_STATUS)
+        await cache.read(vscp.VSCP_STD_REGISTER_ALARM_STATUS)
+        assert len(node.requests) == n + 2
+        assert bytes(await cache.getGuid()) == GUID
+        cache.invalidate()
+        assert bytes(await cache.getGuid()) == GUID
+        assert await cache.getFirmwareVersion() == (1, 2, 0)
+        assert await cache.getMdfUrl() == "mdf.xml"
+        assert len(node.requests) == n + 5
+        cache.nodeRestarted()
+        await cache.getGuid()
+        assert len(node.requests) == n + 6
+    asyncio.run(test())
+
+def test_concurrent_reads_share_request():
+    async def test():
+        transport, node = setup()
+        cache = vscp_register.RegisterCache(GUID, transport)
+        res = await asyncio.gather(cache.read(0, 16), cache.read(4, 4), cache.read(8, 16))
+        assert res == [bytes(range(16)), bytes(range(4, 8)), bytes(range(8, 24))]
+        assert len(node.requests) == 2
+    asyncio.run(test())
+
+def test_write_and_retry():
+    async def test():
+        transport, node = setup(drop=1)
+        cache = vscp_register.RegisterCache(GUID, transport)
+        assert await cache.write(0x40, b'\x01\x02\x03\x04\x05\x06', page=7) == b'\x01\x02\x03\x04\x05\x06'
+        assert transport.cntTimeouts == 1
+        assert node.page(7)[0x40:0x46] == b'\x01\x02\x03\x04\x05\x06'
+        n = len(node.requests)
+        assert await cache.read(0x40, 6, page=7) == b'\x01\x02\x03\x04\x05\x06'
+        assert len(node.requests) == n
+        node.drop = 100
+        cache.invalidate(0x40, 1, page=7)
+        with pytest.raises(vscp.VscpError):
+            await cache.read(0x40, 1, page=7)
+    asyncio.run(test())
+
+def test_many_nodes():
+    async def test():
+        nodes = {}
+        def send(ev):
+            for node in nodes.values():
+                node.send(ev)
+        transport = vscp_register.EventRegisterTransport(send, timeout=0.2, level2=False)
+        guids = [bytes(15) + bytes([i]) for i in range(1, 21)]
+        for g in guids:
+            nodes[g] = Node(transport, g)
+        caches = vscp_register.RegisterCaches(transport)
+        res = await caches.readMany(guids, vscp.VSCP_STD_REGISTER_GUID, 16)
+        assert len(caches) == 20
+        assert all(bytes(g) == bytes(v) for g, v in res.items())
+    asyncio.run(test())
@@ -0,0 +1,128 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import random
+import pytest
+import vscp
+import vscp_batch
+import vscp_rollup
+from vscp_rollup import RollupEngine
+
+GUID = bytes(15) + b'\x01'
+
+# These tests use microsecond timestamps
+US = 1000000
+
+def ev(value, ts, index=0, guid=GUID):
+    return vscp.vscpEventEx.new(10, 6, guid, bytes((0x60 | index,)) + value.to_bytes(2, "big", signed=True), ts)
+
+def test_tumbling():
+    r = RollupEngine(window=1.0, units_per_second=US)
+    out = []
+    for i, v in enumerate([1, 5, 3, 10, -2]):
+        out += r.update(ev(v, i * 400000))
+    assert [(x.start, x.end, x.count, x.min, x.max, x.avg) for x in out] == \
+            [(0, 1000000, 3, 1, 5, 3.0)]
+    out = r.flush()
+    assert [(x.start, x.count, x.min, x.max) for x in out] == [(1000000, 2, -2, 10)]
+    assert out[0].guid == vscp.vscpGuid(GUID) and out[0].vscpclass == 10 and out[0].unit == 0
+    assert len(r) == 0
+
+def test_millisecond_timestamps():
+    r = RollupEngine(window=1.0)
+    out = []
+    for i in range(5):
+        out += r.update(ev(i, 1000000 + i * 1000))
+    assert [(x.start, x.end, x.count) for x in out] == \
+            [(1000000 + i * 1000, 1001000 + i * 1000, 1) for i in range(4)]
+    import vscp_traffic
+    gen = vscp_traffic.TrafficGenerator(mix={(10, 6): 1}, nodes=1, sizes=3, rate=10)
+    r = RollupEngine(window=1.0)
+    out = []
+    for t, e in gen.events(35):
+        e.data[0] = 0x60
+        out += r.update(e)
+    out += r.flush()
+    start = int(vscp_traffic.DEFAULT_EPOCH * 1000) & 0xFFFFFFFF
+    first = start - start % 1000
+    assert [(x.start, x.end) for x in out] == \
+            [(first + i * 1000, first + (i + 1) * 1000) for i in range(len(out))]
+    assert sum(x.count for x in out) == 35
+    assert [x.count for x in out[1:-1]] == [10] * (len(out) - 2)
+
+def test_sliding_and_series():
+    r = RollupEngine(window=1.0, slide=0.5, units_per_second=US)
+    out = []
+    for i in range(8):
+        out += r.update(ev(i, i * 250000, index=i % 2))
+    ones = [(x.start, x.count, x.avg) for x in out if x.index == 1]
+    assert ones == [(-500000, 1, 1.0), (0, 2, 2.0), (500000, 2, 4.0)]
+    assert len(r) == 2
+    with pytest.raises(ValueError):
+        RollupEngine(window=1.0, slide=0.3, units_per_second=US)
+
+def test_lateness():
+    r = RollupEngine(window=1.0, lateness=0.5, units_per_second=US)
+    assert r.update(ev(1, 100)) == []
+    assert r.update(ev(2, 1200000)) == []       # Window 0 still open
+    assert r.update(ev(3, 900000)) == []        # In time
+    out = r.update(ev(4, 1600000))
+    assert [(x.start, x.count, x.avg) for x in out] == [(0, 2, 2.0)]
+    assert r.update(ev(5, 500000)) == []        # Late
+    assert r.cntLate == 1
+
+def test_timestamp_wrap():
+    r = RollupEngine(window=1.0, units_per_second=US)
+    out = r.update(ev(1, 0xFFFFFFFF - 10))
+    out += r.update(ev(2, 2000000))
+    assert [(x.start, x.count) for x in out] == [(4294000000, 1)]
+
+def make_batch(n=2000, disorder=0.01):
+    rnd = random.Random(5)
+    batch = vscp_batch.VscpEventBatch()
+    t = [0] * 4
+    for i in range(n):
+        g = i % 4
+        t[g] += rnd.randrange(0, 300000)
+        ts = t[g] - (rnd.randrange(0, 900000) if rnd.random() < disorder else 0)
+        batch.appendRow(10, 6, bytes(15) + bytes((g,)),
+                        bytes((0x60 | (i % 3),)) + rnd.randrange(-999, 999).to_bytes(2, "big", signed=True),
+                        timestamp=max(ts, 0))
+    return batch
+
+def rollups(out):
+    return sorted((x.vscpclass, bytes(x.guid), x.index, x.start, x.count, x.min, x.max,
+                    round(x.avg, 9)) for x in out)
+
+@pytest.mark.parametrize("use_numpy,disorder", [(False, 0.01), (True, 0.01), (True, 0)])
+def test_batch_matches_events(use_numpy, disorder):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    batch = make_batch(3000, disorder)
+    if not disorder:
+        # Replay the middle third so whole panes arrive late
+        batch.extend(batch[1000:2000])
+    a = RollupEngine(window=2.0, slide=0.5, lateness=0.2, units_per_second=US)
+    expected = []
+    for i in range(len(batch)):
+        expected += a.update(batch.getEventEx(i))
+    expected += a.flush()
+    b = RollupEngine(window=2.0, slide=0.5, lateness=0.2, units_per_second=US)
+    out = b.updateBatch(batch[:3000], use_numpy=use_numpy)
+    out += b.updateBatch(batch[3000:], use_numpy=use_numpy)
+    out += b.flush()
+    assert rollups(out) == rollups(expected)
+    assert a.cntLate == b.cntLate > 0
+
+def test_output():
+    r = RollupEngine(window=1.0, units_per_second=US)
+    r.update(ev(4, 0, index=2))
+    r.update(ev(6, 10, index=2))
+    recs = r.flush()
+    e = vscp_rollup.rollup_event(recs[0], "max")
+    assert e.vscpclass == 1060 and e.vscptype == 6
+    assert e.timestamp == 1000000
+    import vscp_measurement
+    m = vscp_measurement.decode_measurement(e)
+    assert (m.value, m.index) == (6.0, 2)
+    cols = vscp_rollup.rollup_arrays(recs, use_numpy=False)
+    assert list(cols["avg"]) == [5.0] and list(cols["count"]) == [2] and cols["guid"] == [recs[0].guid]
@@ -0,0 +1,73 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import io
+import json
+import socket
+import pytest
+import vscp
+import vscp_batch
+import vscp_serialize
+
+DT = (2017, 1, 13, 10, 16, 2)
+
+
+def make_events(n=20):
+    events = []
+    for i in range(n):
+        g = bytearray(16)
+        g[15] = i
+        events.append(vscp.vscpEventEx.new(10, i % 8, g, bytes(range(i % 9)),
+                                           timestamp=50817 + i, head=3, obid=i, dt=DT))
+    return events
+
+def same(a, b):
+    assert (a.head, a.obid, a.timestamp, a.vscpclass, a.vscptype) == \
+           (b.head, b.obid, b.timestamp, b.vscpclass, b.vscptype)
+    assert (a.year, a.month, a.day, a.hour, a.minute, a.second) == \
+           (b.year, b.month, b.day, b.hour, b.minute, b.second)
+    assert a.getGuidStr() == b.getGuidStr()
+    assert bytes(a.data[:a.sizedata]) == bytes(b.data[:b.sizedata])
+
+@pytest.mark.parametrize("fmt", ["ndjson", "xml", "html"])
+def test_roundtrip(fmt):
+    events = make_events()
+    buf = io.BytesIO()
+    assert vscp_serialize.write_events(buf, events, fmt, chunk_size=100) == len(events)
+    buf.seek(0)
+    back = list(vscp_serialize.read_events(buf, fmt, chunk_size=37))
+    assert len(back) == len(events)
+    for a, b in zip(events, back):
+        same(a, b)
+    buf.seek(0)
+    batch = vscp_serialize.read_batch(buf, fmt, chunk_size=64)
+    assert len(batch) == len(events)
+    same(batch[5], events[5])
+
+def test_ndjson_template_and_stored_time():
+    ex = make_events(3)[2]
+    line = io.StringIO()
+    with vscp_serialize.NdjsonWriter(line, note='say "hi"') as w:
+        w.write(ex)
+    o = json.loads(line.getvalue())
+    assert list(o.keys()) == list(vscp.VSCP_JSON_EVENT_TEMPLATE.keys())
+    assert o["vscpDateTime"] == "2017-01-13T10:16:02Z"
+    assert o["vscpData"] == [0, 1]
+    assert o["vscpNote"] == 'say "hi"'
+    assert ex.toJSON()["vscpDateTime"] == "2017-01-13T10:16:02Z"
+
+def test_batch_to_socket():
+    batch = vscp_batch.VscpEventBatch.fromEvents(make_events())
+    a, b = socket.socketpair()
+    with a, b:
+        with vscp_serialize.XmlWriter(a) as w:
+            w.writeMany(batch)
+        a.shutdown(socket.SHUT_WR)
+        r = vscp_serialize.XmlReader()
+        got = []
+        while True:
+            chunk = b.recv(50)
+            if not chunk:
+                break
+            got.extend(r.feed(chunk))
+    assert len(got) == len(batch)
+    same(got[7], batch[7])
@@ -2,10 +2,13 @@
 # testing in general, but rather to support the `find_packages` example in
 # setup.py that excludes installing the "tests" package
 
+import os
 import sys
 import datetime
+import subprocess
 sys.path.append('..')    # Should be executed from project root folder
 import vscp
+from ctypes import sizeof
 
 
 def test_success():
@@ -27,9 +30,88 @@ def test_setDateTimeNow():
     print(ex.getIsoDateTime())
     print("-------------------")
 
+def test_newEventEx():
+    g = vscp.guid("0F:0E:0D:0C:0B:0A:09:08:07:06:05:04:03:02:01:00")
+    ex = vscp.vscpEventEx.new(10, 6, g, b'\x01\x02\x03', timestamp=1234,
+                              dt=datetime.datetime(2020, 1, 2, 3, 4, 5))
+    assert (ex.vscpclass, ex.vscptype, ex.timestamp, ex.sizedata) == (10, 6, 1234, 3)
+    assert (ex.year, ex.month, ex.day, ex.hour, ex.minute, ex.second) == (2020, 1, 2, 3, 4, 5)
+    assert ex.getGuidStr() == g.getAsString()
+    assert list(ex.data[:4]) == [1, 2, 3, 0]
+    ex = vscp.vscpEventEx.new(20, 3)
+    assert ex.year >= 2020 and ex.sizedata == 0
+    buf = bytearray(2 * sizeof(vscp.vscpEventEx))
+    ex = vscp.vscpEventEx.newInBuffer(buf, sizeof(vscp.vscpEventEx), 30, 1, data=b'xy', dt=False)
+    assert (ex.vscpclass, ex.year, bytes(ex.data[:2])) == (30, 0, b'xy')
+    assert buf[sizeof(vscp.vscpEventEx) + vscp.vscpEventEx.data.offset] == ord('x')
+
+def test_guid_fixes():
+    g1 = vscp.guid()
+    g2 = vscp.guid()
+    g1.setAt(3, 0x55)
+    assert g2.getAt(3) == 0     # No shared default
+    g1.setFromString("00:00:00:00:00:00:00:00:00:00:00:00:00:00:00:01")
+    assert not g1.isSame(bytearray(16))
+    assert g1.isSame(bytearray(15) + b'\x01')
+    assert vscp.guid("0:1:2:3:4:5:6:7:8:9:A:B:C:D:E:F").getAsString() == \
+        "00:01:02:03:04:05:06:07:08:09:0A:0B:0C:0D:0E:0F"
+
+def test_vscpGuid():
+    s = "FF:FF:FF:FF:FF:FF:FF:FE:B8:27:EB:0A:11:22:00:01"
+    a = vscp.vscpGuid(s)
+    b = vscp.vscpGuid(bytes.fromhex(s.replace(":", "")))
+    assert a is b
+    assert a == vscp.guid(s) and a == bytes(b)
+    assert str(a) == s and a.getAsString() is a.getAsString()
+    assert {a: 1}[vscp.vscpGuid(s)] == 1
+    assert a.getNicknameID() == 1 and a.getClientID() == 0x1122
+    assert a.withNickname(2).getNickname() == 2
+    assert a.withClientID(0x3344).getClientID() == 0x3344
+    assert vscp.vscpGuid().isNULL()
+    ex = vscp.vscpEventEx.new(10, 6, a)
+    assert vscp.vscpGuid(ex.guid) is a
+    try:
+        a._b = b'x'
+        assert False
+    except AttributeError:
+        pass
+
+def test_vscpGuid_intern_size():
+    from vscp.guids import VSCP_GUID_INTERN_SIZE
+    vscp.vscpGuid.clearInternTable()
+    # Spellings of one GUID differing in case are interned as strings only
+    for i in range(VSCP_GUID_INTERN_SIZE + 100):
+        parts = [("FF", "ff", "Ff", "fF")[(i >> (2 * k)) & 3] for k in range(16)]
+        assert vscp.vscpGuid(":".join(parts)) == bytes([0xFF] * 16)
+        assert len(vscp.vscpGuid._intern) <= VSCP_GUID_INTERN_SIZE
+    vscp.vscpGuid.clearInternTable()
+
+def test_lazy_import():
+    code = ("import sys, vscp\n"
+            "assert vscp.VSCP_ERROR_TIMEOUT == 32\n"
+            "assert 'ctypes' not in sys.modules and 'getmac' not in sys.modules\n"
+            "assert 'vscp.events' not in sys.modules\n"
+            "vscp.vscpEventEx\n"
+            "assert 'vscp.events' in sys.modules and 'vscp.transport' not in sys.modules\n"
+            "assert 'getmac' not in sys.modules\n")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+    assert "vscpGuid" in vscp.__all__ and "VSCP_LEVEL2_MAXDATA" in vscp.__all__
+    assert "vscpEventEx" in dir(vscp)
+    try:
+        vscp.noSuchName
+        assert False
+    except AttributeError:
+        pass
+
 if __name__ == "__main__":
     print(datetime.datetime.utcnow())
     test_success()
     test_guid()
     test_setDateTimeNow()
+    test_newEventEx()
+    test_guid_fixes()
+    test_vscpGuid()
+    test_vscpGuid_intern_size()
+    test_lazy_import()
     print("Everything passed")
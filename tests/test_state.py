@@ -0,0 +1,103 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import math
+import threading
+import vscp
+import vscp_batch
+from vscp_packet import make_packet0, decode_packet0
+from vscp_state import StateStore
+
+def guid(n):
+    return bytes(15) + bytes((n,))
+
+def temp(node, index, value, ts=0):
+    # CLASS1.MEASUREMENT temperature, integer coded, sensor index
+    return vscp.vscpEventEx.new(10, 6, guid(node), bytes((0x60 | index, value)), timestamp=ts)
+
+def test_latest_wins():
+    store = StateStore(shards=4)
+    store.update(temp(1, 0, 20, 1))
+    store.update(temp(1, 1, 30, 2))
+    v = store.update(temp(1, 0, 21, 3))
+    store.update(vscp.vscpEventEx.new(20, 3, guid(1), b'\x01'))
+    assert len(store) == 3 and store.nodeCount() == 1
+    st = store.get(guid(1), 10, 6, 0)
+    assert (st.value, st.timestamp, st.version, st.data) == (21.0, 3, v, bytes((0x60, 21)))
+    assert store.get(guid(1), 10, 6, 1).value == 30.0
+    assert math.isnan(store.get(guid(1), 20, 3).value)
+    assert store.get(guid(2), 10, 6) is None
+    assert [s.index for s in store.getNode(guid(1)) if s.vscpclass == 10] == [1, 0]
+    ex = st.toEventEx()
+    assert (ex.vscpclass, ex.vscptype, bytes(ex.data[:2])) == (10, 6, bytes((0x60, 21)))
+
+def test_packet_and_batch():
+    store = StateStore()
+    store.update(decode_packet0(make_packet0(temp(5, 2, 40))))
+    assert store.get(guid(5), 10, 6, 2).value == 40.0
+    batch = vscp_batch.VscpEventBatch.fromEvents([temp(n % 7, 0, n) for n in range(50)])
+    assert store.updateBatch(batch) == 50
+    assert store.get(guid(6), 10, 6).value == 48.0      # Last row of node 6
+    assert store.nodeCount() == 7
+
+def test_changes():
+    store = StateStore(shards=3)
+    for n in range(10):
+        store.update(temp(n, 0, n))
+    diff = store.snapshot()
+    assert diff.full and len(diff.changed) == 10 and diff.removed == []
+    assert store.changes(diff.version).changed == []
+    store.update(temp(3, 0, 33))
+    store.update(temp(11, 0, 1))
+    store.update(temp(3, 0, 34))
+    assert store.remove(guid(4)) and not store.remove(guid(4))
+    d = store.changes(diff.version)
+    assert not d.full
+    assert [(s.guid.getNickname(), s.value) for s in d.changed] == [(11, 1.0), (3, 34.0)]
+    assert d.removed == [(vscp.vscpGuid(guid(4)), 10, 6, 0)]
+    assert store.changes(d.version)[1:] == (False, [], [])
+    assert store.changes(store.getVersion()).changed == []
+
+def test_lru_and_expire():
+    store = StateStore(shards=1, max_nodes=3)
+    for n in range(3):
+        store.update(temp(n, 0, n), t=n)
+    v = store.getVersion()
+    store.update(temp(0, 0, 9), t=10)                   # Node 0 is now the most recent
+    store.update(temp(7, 0, 7), t=11)                   # Evicts node 1
+    assert store.nodeCount() == 3 and store.get(guid(1), 10, 6) is None
+    assert store.changes(v).removed == [(vscp.vscpGuid(guid(1)), 10, 6, 0)]
+    assert store.expire(5, now=14) == [vscp.vscpGuid(guid(2))]
+    assert store.nodeCount() == 2 and len(store) == 2
+
+def test_forgotten_removals():
+    import vscp_state
+    old = vscp_state.TOMBSTONE_LIMIT
+    vscp_state.TOMBSTONE_LIMIT = 2
+    try:
+        store = StateStore(shards=1)
+        for n in range(5):
+            store.update(temp(n, 0, n))
+        v = store.getVersion()
+        for n in range(4):
+            store.remove(guid(n))
+        d = store.changes(v)
+        assert d.full and [s.guid.getNickname() for s in d.changed] == [4]
+    finally:
+        vscp_state.TOMBSTONE_LIMIT = old
+
+def test_threads():
+    store = StateStore(shards=8)
+
+    def run(base):
+        for i in range(2000):
+            store.update(temp(base + i % 10, 0, i & 0x7f, i))
+
+    threads = [threading.Thread(target=run, args=(k * 10,)) for k in range(4)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    diff = store.snapshot()
+    assert len(diff.changed) == 40
+    assert all(s.timestamp >= 1990 for s in diff.changed)
+    assert len(set(s.version for s in diff.changed)) == 40
@@ -0,0 +1,98 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import asyncio
+import threading
+import vscp
+import vscp_batch
+import vscp_bus
+import vscp_stats
+from vscp_stats import Instrumentation
+
+def test_channel_shards():
+    instr = Instrumentation()
+    ch = instr.channel("udp")
+    assert instr.channel("udp") is ch
+
+    def work():
+        for _ in range(1000):
+            ch.received(1, 8)
+        ch.transmitted(2, 16)
+        ch.overrun()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    st = instr.getStatistics("udp")
+    assert (st.cntReceiveFrames, st.cntReceiveData) == (4000, 32000)
+    assert (st.cntTransmitFrames, st.cntTransmitData, st.cntOverruns) == (8, 64, 4)
+    ch.error(vscp.VSCP_ERROR_TIMEOUT, 2, "first")
+    ch.error(vscp.VSCP_ERROR_COMMUNICATION, 0, "bad frame")
+    status = instr.getStatus("udp")
+    assert status.lasterrorcode == vscp.VSCP_ERROR_COMMUNICATION
+    assert bytes(status.lasterrorstr[:9]) == b'bad frame'
+    assert instr.getErrorCount("udp") == 2
+    instr.reset()
+    assert instr.getStatistics("udp").cntReceiveFrames == 0
+
+def test_stage_sampling():
+    instr = Instrumentation(sample_every=4)
+    samples = []
+    instr.addHook(lambda stage, ns: samples.append(stage))
+    st = instr.stage(vscp_stats.STAGE_DECODE)
+    for _ in range(40):
+        t0 = st.begin()
+        if t0:
+            st.end(t0)
+    count, total, buckets = instr.getHistogram("decode")
+    assert count == 10 == sum(buckets) == len(samples)
+    st.observe(1000)
+    assert instr.getQuantile("decode", 1.0) >= 1024
+    assert instr.getQuantile("encode", 0.5) is None
+
+def test_export():
+    instr = Instrumentation()
+    instr.channel("udp").received(3, 30)
+    instr.channel("udp").error(vscp.VSCP_ERROR_TIMEOUT)
+    instr.stage("filter").observe(1500)
+    text = vscp_stats.export_prometheus(instr)
+    assert '# TYPE vscp_receive_frames_total counter' in text
+    assert 'vscp_receive_frames_total{channel="udp"} 3' in text
+    assert 'vscp_last_error_code{channel="udp"} 32' in text
+    assert 'vscp_stage_latency_seconds_bucket{stage="filter",le="2.048e-06"} 1' in text
+    assert 'vscp_stage_latency_seconds_bucket{stage="filter",le="1.024e-06"} 0' in text
+    assert 'vscp_stage_latency_seconds_count{stage="filter"} 1' in text
+    om = vscp_stats.export_prometheus(instr, openmetrics=True)
+    assert '# TYPE vscp_receive_frames counter' in om and om.endswith("# EOF\n")
+
+def test_bus_instrumented():
+    instr = Instrumentation(sample_every=1)
+    bus = vscp_bus.EventBus(instrumentation=instr)
+    bus.subscribe(maxqueue=2)
+    bus.subscribe()
+    for i in range(5):
+        bus.publish(vscp.vscpEventEx.new(10, 1))
+    st = instr.getStatistics("bus")
+    assert (st.cntTransmitFrames, st.cntOverruns) == (5, 3)
+    assert instr.getHistogram("filter")[0] == 5 and instr.getHistogram("dispatch")[0] == 5
+    bus.publishMany(vscp_batch.VscpEventBatch.fromEvents([vscp.vscpEventEx.new(10, 1)] * 4))
+    assert instr.getStatistics("bus").cntTransmitFrames == 9
+    assert instr.getHistogram("filter")[0] == 6
+
+def test_exporter_http():
+    async def run():
+        instr = Instrumentation()
+        instr.channel("tcp").transmitted(7, 70)
+        server = await vscp_stats.start_exporter(instr, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b'GET /metrics HTTP/1.1\r\nHost: x\r\n\r\n')
+        data = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return data
+    data = asyncio.run(run())
+    assert data.startswith(b'HTTP/1.1 200 OK')
+    assert b'vscp_transmit_frames_total{channel="tcp"} 7' in data
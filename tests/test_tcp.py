@@ -0,0 +1,187 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import asyncio
+import pytest
+import vscp
+import vscp_tcp
+
+
+################################################################################
+# Minimal VSCP link protocol server used by the tests
+#
+
+class MockServer:
+
+    def __init__(self):
+        self.fifo = []
+        self.received = []
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        def reply(*lines):
+            writer.write("".join(l + "\r\n" for l in lines).encode())
+        reply("Welcome to the mock VSCP daemon", "+OK - Success.")
+        user = None
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            cmd, _, arg = line.decode().strip().partition(" ")
+            cmd = cmd.lower()
+            if cmd == "user":
+                user = arg
+                reply("+OK - User name accepted, password please")
+            elif cmd == "pass":
+                if user == "admin" and arg == "secret":
+                    reply("+OK - Ready to work.")
+                else:
+                    reply("-OK - Password or user name is invalid.")
+            elif cmd == "noop":
+                reply("+OK - Success.")
+            elif cmd == "send":
+                self.received.append(arg)
+                self.fifo.append(arg)
+                reply("+OK - Success.")
+            elif cmd == "chkdata":
+                reply(str(len(self.fifo)), "+OK - Success.")
+            elif cmd == "retr":
+                n = int(arg or 1)
+                if not self.fifo:
+                    reply("-OK - No event(s) available.")
+                else:
+                    out, self.fifo = self.fifo[:n], self.fifo[n:]
+                    reply(*(out + ["+OK - Success."]))
+            elif cmd == "clra":
+                self.fifo = []
+                reply("+OK - All events cleared.")
+            elif cmd == "rcvloop":
+                reply("+OK - Receive loop entered. QUITLOOP to terminate.")
+                events, self.fifo = self.fifo, []
+                reply(*events)
+                reply("+OK")
+            elif cmd == "quitloop":
+                reply("+OK - Quit receive loop.")
+            elif cmd == "quit":
+                reply("+OK - Connection closed by user.")
+                await writer.drain()
+                break
+            else:
+                reply("-OK - Unknown command.")
+            await writer.drain()
+        writer.close()
+
+
+def make_event(vscptype):
+    ex = vscp.vscpEventEx()
+    ex.head = 3
+    ex.vscpclass = 10
+    ex.vscptype = vscptype
+    ex.guid[15] = 2
+    ex.sizedata = 2
+    ex.data[0] = 0x48
+    ex.data[1] = vscptype
+    return ex
+
+def run(test):
+    async def main():
+        srv = MockServer()
+        port = await srv.start()
+        try:
+            await asyncio.wait_for(test(srv, port), 5)
+        finally:
+            await srv.stop()
+    asyncio.run(main())
+
+def test_event_string():
+    ex = make_event(6)
+    s = vscp_tcp.make_event_string(ex)
+    assert s.startswith("3,10,6,0,")
+    assert s.endswith(",00:00:00:00:00:00:00:00:00:00:00:00:00:00:00:02,0x48,0x06")
+    ex2 = vscp_tcp.parse_event_string(s)
+    assert vscp_tcp.make_event_string(ex2) == s
+
+def test_pipelined_commands():
+    async def test(srv, port):
+        c = await vscp_tcp.VscpTcpClient.open("127.0.0.1", port, "admin", "secret")
+        pending = [c.send(make_event(i)) for i in range(5)]
+        count = c.chkdata()
+        assert c.inFlight() == 6
+        await asyncio.gather(*pending)
+        assert await count == 5
+        events = await c.retr(3)
+        assert [ex.vscptype for ex in events] == [0, 1, 2]
+        assert events[1].data[1] == 1
+        await c.sendMany([make_event(7), make_event(8)])
+        await c.clearAll()
+        assert await c.retr(1) == []
+        with pytest.raises(vscp.VscpError) as e:
+            await c.command("bogus")
+        assert e.value.code == vscp.VSCP_ERROR_NOT_SUPPORTED
+        await c.close()
+    run(test)
+
+def test_bad_login():
+    clients = []
+    class Client(vscp_tcp.VscpTcpClient):
+        def __init__(self):
+            super().__init__()
+            clients.append(self)
+    async def test(srv, port):
+        with pytest.raises(vscp.VscpError) as e:
+            await Client.open("127.0.0.1", port, "admin", "wrong")
+        assert e.value.code == vscp.VSCP_ERROR_PASSWORD
+        assert clients[0]._writer is None and clients[0]._task.done()
+    run(test)
+
+def test_receive_loop():
+    async def test(srv, port):
+        c = await vscp_tcp.VscpTcpClient.open("127.0.0.1", port)
+        await c.sendMany([make_event(i) for i in range(3)])
+        got = []
+        async for ex in c.receiveLoop():
+            got.append(ex.vscptype)
+            if len(got) == 3:
+                await c.quitLoop()
+        assert got == [0, 1, 2]
+        await c.noop()
+        await c.close()
+    run(test)
+
+def test_receive_loop_full_queue():
+    async def test(srv, port):
+        c = await vscp_tcp.VscpTcpClient.open("127.0.0.1", port)
+        await c.sendMany([make_event(i) for i in range(5)])
+        got = []
+        async for ex in c.receiveLoop(maxqueue=2):
+            await asyncio.sleep(0.05)       # Slow consumer
+            got.append(ex.vscptype)
+            if len(got) == 2:
+                await c.quitLoop()
+        assert got == [0, 1]
+        assert c.stats.cntOverruns == 3 and c.stats.cntReceiveFrames == 2
+        assert c.connected
+        await c.noop()
+        await c.close()
+    run(test)
+
+def test_pool():
+    async def test(srv, port):
+        pool = vscp_tcp.VscpTcpPool("127.0.0.1", port, "admin", "secret", size=2)
+        async def worker(i):
+            c = await pool.get()
+            await c.send(make_event(i))
+        await asyncio.gather(*[worker(i) for i in range(10)])
+        assert len(srv.received) == 10
+        assert 1 <= len(pool) <= 2
+        await pool.close()
+    run(test)
+    with pytest.raises(ValueError):
+        vscp_tcp.VscpTcpPool(size=0)
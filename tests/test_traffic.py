@@ -0,0 +1,117 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import io
+import socket
+import pytest
+import vscp
+import vscp_log
+import vscp_packet
+import vscp_serialize
+import vscp_traffic
+
+
+def frames(schedule):
+    return [(t, bytes(vscp_packet.make_packet0(ev))) for t, ev in schedule]
+
+def test_deterministic():
+    gen = vscp_traffic.TrafficGenerator(arrival=vscp_traffic.ARRIVAL_POISSON, seed=7)
+    a = frames(gen.events(200))
+    assert a == frames(gen.events(200))
+    assert a == frames(vscp_traffic.TrafficGenerator(arrival=vscp_traffic.ARRIVAL_POISSON,
+                                                        seed=7).events(200))
+    assert a != frames(vscp_traffic.TrafficGenerator(arrival=vscp_traffic.ARRIVAL_POISSON,
+                                                        seed=8).events(200))
+
+def test_population_and_mix():
+    gen = vscp_traffic.TrafficGenerator(mix={(10, 6): 1, 20: 1}, clients=3, nodes=5,
+                                        sizes={0: 1, vscp.VSCP_LEVEL2_MAXDATA: 1})
+    assert len(gen.guids) == 15
+    seen = set()
+    for t, ev in gen.events(500):
+        g = vscp.guid(bytes(ev.guid))
+        assert g.getAsString().startswith("FF:FF:FF:FF:FF:FF:FF:FE:00:00:00:00")
+        assert g.getClientID() < 3 and g.getNicknameID() < 5
+        assert ev.vscpclass == 20 or (ev.vscpclass, ev.vscptype) == (10, 6)
+        assert ev.sizedata in (0, vscp.VSCP_LEVEL2_MAXDATA)
+        seen.add((ev.vscpclass, ev.sizedata))
+    assert len(seen) == 4
+    gen = vscp_traffic.TrafficGenerator(sizes=(3, 5))
+    assert {ev.sizedata for t, ev in gen.events(200)} == {3, 4, 5}
+    with pytest.raises(ValueError):
+        vscp_traffic.TrafficGenerator(sizes=vscp.VSCP_LEVEL2_MAXDATA + 1)
+    with pytest.raises(ValueError):
+        vscp_traffic.TrafficGenerator(arrival="sometimes")
+
+def test_arrivals():
+    gen = vscp_traffic.TrafficGenerator(rate=100)
+    assert [t for t, ev in gen.events(3)] == [0.0, 0.01, 0.02]
+    t, ev = list(gen.events(2))[1]
+    assert ev.timestamp == int((vscp_traffic.DEFAULT_EPOCH + 0.01) * 1000) & 0xFFFFFFFF
+    assert (ev.year, ev.month, ev.day) == (2020, 9, 13)
+    gen = vscp_traffic.TrafficGenerator(rate=100, arrival=vscp_traffic.ARRIVAL_BURST, burst=5)
+    times = [t for t, ev in gen.events(10)]
+    assert times == [0.0] * 5 + [0.05] * 5
+    gen = vscp_traffic.TrafficGenerator(rate=1000, arrival=vscp_traffic.ARRIVAL_POISSON)
+    times = [t for t, ev in gen.events(5001)]
+    assert times == sorted(times)
+    assert 4.5 < times[-1] < 5.5
+
+def test_replay_pacing():
+    schedule = list(vscp_traffic.TrafficGenerator(rate=500).events(26))   # 50 ms
+    sink = vscp_traffic.MemorySink()
+    result = vscp_traffic.Replayer(sink).run(schedule)
+    assert result.count == len(sink) == 26
+    assert result.elapsed >= 0.05
+    assert sink.times[-1] - sink.times[0] >= 0.05 - result.lag_max
+    sink.clear()
+    result = vscp_traffic.Replayer(sink, speed=10).run(schedule)
+    assert 0.005 <= result.elapsed < 0.05
+    result = vscp_traffic.Replayer(sink, speed=vscp_traffic.MAX_SPEED).run(schedule, count=10)
+    assert result.count == 10 and result.lag_max == 0.0
+    got = []
+    r = vscp_traffic.Replayer(got.append)
+    result = r.run(vscp_traffic.TrafficGenerator(rate=1000).events(), duration=0.02)
+    assert result.count == len(got) == 20
+    with pytest.raises(ValueError):
+        vscp_traffic.Replayer(sink, speed=-1)
+
+def test_udp_sink():
+    rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx.bind(("127.0.0.1", 0))
+    rx.settimeout(5)
+    schedule = list(vscp_traffic.TrafficGenerator(sizes=(0, 64)).events(20))
+    try:
+        with vscp_traffic.UdpSink(rx.getsockname()) as sink:
+            vscp_traffic.Replayer(sink, speed=vscp_traffic.MAX_SPEED).run(schedule)
+            assert sink.stats.cntTransmitFrames == 20
+        for t, ex in schedule:
+            ev = vscp_packet.decode_packet0(memoryview(rx.recv(2048)))
+            assert (ev.vscpclass, ev.vscptype, bytes(ev.data)) == \
+                    (ex.vscpclass, ex.vscptype, bytes(ex.data[:ex.sizedata]))
+    finally:
+        rx.close()
+
+def test_recorded(tmp_path):
+    schedule = list(vscp_traffic.TrafficGenerator(rate=200).events(10))
+    with vscp_log.EventLogWriter(str(tmp_path)) as log:
+        for t, ev in schedule:
+            log.append(ev, 1600000000.0 + t)
+    reader = vscp_log.EventLogReader(str(tmp_path))
+    try:
+        sink = vscp_traffic.MemorySink()
+        result = vscp_traffic.Replayer(sink, speed=2).run(vscp_traffic.from_log(reader))
+        assert result.count == 10 and result.elapsed >= 0.045 / 2
+        assert [ev.timestamp for ev in sink.events] == [ev.timestamp for t, ev in schedule]
+    finally:
+        reader.close()
+    fp = io.StringIO()
+    vscp_serialize.write_events(fp, [ev for t, ev in schedule])
+    fp.seek(0)
+    times = [t for t, ev in vscp_traffic.from_timestamps(vscp_serialize.read_events(fp))]
+    assert [round(b - times[0], 3) for b in times] == [round(t, 3) for t, ev in schedule]
+    events = [vscp.vscpEventEx.new(timestamp=ts) for ts in (0xFFFFFFF0, 5)]
+    assert [t for t, ev in vscp_traffic.from_timestamps(events)] == \
+            [0xFFFFFFF0 / 1000.0, 0x100000005 / 1000.0]
+    events = [vscp.vscpEventEx.new(timestamp=ts) for ts in (1000, 999, 1001, 0xFFFFFFFF, 1002)]
+    assert [t for t, ev in vscp_traffic.from_timestamps(events)] == \
+            [1.0, 0.999, 1.001, -0.001, 1.002]
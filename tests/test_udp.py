@@ -0,0 +1,112 @@
+import sys
+sys.path.append('..')    # Should be executed from project root folder
+import asyncio
+import pytest
+import vscp
+import vscp_batch
+import vscp_stats
+import vscp_udp
+
+
+def make_event(vscptype):
+    ex = vscp.vscpEventEx()
+    ex.vscpclass = 10
+    ex.vscptype = vscptype
+    ex.sizedata = 1
+    ex.data[0] = vscptype
+    return ex
+
+async def loopback(test, **kwargs):
+    rx = await vscp_udp.VscpUdpEndpoint.openUdp(local_addr=("127.0.0.1", 0), **kwargs)
+    tx = await vscp_udp.VscpUdpEndpoint.openUdp(local_addr=("127.0.0.1", 0),
+                                                remote_addr=rx.getLocalAddr(), **kwargs)
+    try:
+        return await asyncio.wait_for(test(rx, tx), 5)
+    finally:
+        tx.close()
+        rx.close()
+
+def test_send_receive():
+    async def test(rx, tx):
+        tx.send(make_event(6))
+        ev = await rx.recv()
+        assert (ev.vscpclass, ev.vscptype, bytes(ev.data)) == (10, 6, b'\x06')
+        await tx.sendBatch([make_event(i) for i in range(10)])
+        got = []
+        async for ev in rx:
+            got.append(ev.vscptype)
+            if len(got) == 10:
+                break
+        assert got == list(range(10))
+        assert tx.stats.cntTransmitFrames == 11
+        assert rx.stats.cntReceiveFrames == 11
+    asyncio.run(loopback(test))
+
+def test_encrypted():
+    async def test(rx, tx):
+        tx.send(make_event(6))
+        await tx.sendBatch([make_event(i) for i in range(3)])
+        got = [await rx.recv() for _ in range(4)]
+        assert [ev.vscptype for ev in got] == [6, 0, 1, 2]
+        assert rx.cntBadFrames == 0
+    asyncio.run(loopback(test, key=vscp.VSCP_DEFAULT_KEY32))
+
+def test_instrumented():
+    instr = vscp_stats.Instrumentation(sample_every=1)
+    async def test(rx, tx):
+        tx.send(make_event(6))
+        await tx.sendBatch([make_event(i) for i in range(3)])
+        tx._transport.sendto(b'garbage', rx.getLocalAddr())
+        for _ in range(4):
+            await rx.recv()
+        while not rx.cntBadFrames:
+            await asyncio.sleep(0.01)
+    asyncio.run(loopback(test, instrumentation=instr))
+    st = instr.getStatistics("udp")
+    assert (st.cntTransmitFrames, st.cntReceiveFrames, st.cntReceiveData) == (4, 4, 4)
+    assert instr.getErrorCount("udp") == 1
+    assert instr.getHistogram("decode")[0] == 4
+    assert instr.getHistogram("encode")[0] == 2
+
+def test_send_batch_and_bad_frames():
+    async def test(rx, tx):
+        batch = vscp_batch.VscpEventBatch()
+        for i in range(5):
+            batch.appendRow(20, i, data=bytes([i] * i))
+        tx._transport.sendto(b'garbage', rx.getLocalAddr())
+        await tx.sendBatch(batch)
+        got = []
+        while len(got) < 5:
+            got.extend(await rx.recvMany())
+        assert [bytes(ev.data) for ev in got] == [bytes([i] * i) for i in range(5)]
+        assert rx.cntBadFrames == 1
+    asyncio.run(loopback(test))
+
+def test_backpressure():
+    async def test(rx, tx):
+        rx.maxqueue = 4
+        await tx.sendBatch([make_event(i) for i in range(20)])
+        got = []
+        while len(got) < 20:
+            ev = await rx.recv()
+            got.append(ev.vscptype)
+        assert got == list(range(20))
+        assert rx.stats.cntOverruns == 0
+    asyncio.run(loopback(test))
+
+def test_multicast_loopback():
+    async def run():
+        try:
+            ep = await vscp_udp.VscpUdpEndpoint.openMulticast(port=0, interface="127.0.0.1")
+        except OSError:
+            pytest.skip("Multicast not available")
+        try:
+            ep.remote_addr = (vscp.VSCP_MULTICAST_IPV4_ADDRESS_STR, ep.getLocalAddr()[1])
+            ep.send(make_event(3))
+            ev = await asyncio.wait_for(ep.recv(), 2)
+            assert ev.vscptype == 3
+        except asyncio.TimeoutError:
+            pytest.skip("Multicast loopback not routed")
+        finally:
+            ep.close()
+    asyncio.run(run())
@@ -0,0 +1,64 @@
+# FILE: vscp/__init__.py
+#
+# General VSCP functionality
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from vscp import constants
+from vscp.constants import *
+
+# The constants are plain literals and are always loaded. Everything else
+# is loaded from its submodule the first time it is used, so tools that
+# only need a few constants never import ctypes or getmac.
+#
+#   vscp.constants      constants, error codes, VscpError, templates, macros
+#   vscp.events         vscpEventEx, vscpEvent, vscpEventFilter, vscpMyNode
+#   vscp.guids          guid, vscpGuid
+#   vscp.transport      VSCPStatistics, VSCPStatus, VSCPChannelInfo
+#
+
+_LAZY = {}
+for _name in ("guidarray", "vscpEventEx", "vscpEvent", "vscpEventFilter", "vscpMyNode"):
+    _LAZY[_name] = "vscp.events"
+for _name in ("guid", "vscpGuid", "VSCP_GUID_INTERN_SIZE"):
+    _LAZY[_name] = "vscp.guids"
+for _name in ("VSCPStatistics", "VSCPStatus", "VSCPChannelInfo"):
+    _LAZY[_name] = "vscp.transport"
+del _name
+
+__all__ = [n for n in dir(constants) if not n.startswith("_")] + list(_LAZY)
+
+# Load a lazy name from its submodule and keep it in the package namespace
+def __getattr__(name):
+    modname = _LAZY.get(name)
+    if modname is None:
+        raise AttributeError("module 'vscp' has no attribute '{0}'".format(name))
+    value = getattr(__import__(modname, fromlist=[name]), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,322 @@
+# FILE: vscp/events.py
+#
+# VSCP event and event filter structures
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import time
+import struct
+import datetime
+from ctypes import *
+
+from vscp.constants import *
+from vscp.guids import _guid_hex, _NULL_GUID
+
+# Use in assignment's as 'a = guidarray(0,0,0,0,0,0,0,0,0,0,0,0,0,0,0xAA,0x55)'
+guidarray = c_ubyte * 16
+
+# Timestamp in milliseconds (lower 32 bits) for a time.time() value
+def _timestamp(t):
+    return int(t * 1000) & 0xFFFFFFFF
+
+# Native layout of vscpEventEx up to and including sizedata followed by
+# the data. One compiled struct per data size.
+_EX_HEADER_FORMAT = "@HIHBBBBBIHHH16sH"
+_ex_structs = {}
+
+def _ex_struct(sizedata):
+    st = _ex_structs.get(sizedata)
+    if st is None:
+        st = _ex_structs[sizedata] = struct.Struct("{0}{1}s".format(_EX_HEADER_FORMAT, sizedata))
+    return st
+
+# Write all vscpEventEx fields into buf at offset with one pack
+def _fill_ex(buf, offset, vscpclass, vscptype, g, data, timestamp, head, obid, dt):
+    if g is None:
+        g = _NULL_GUID
+    elif not isinstance(g, (bytes, bytearray, memoryview)):
+        g = bytes(getattr(g, "guid", g))
+    if dt is None or timestamp is None:
+        t = time.time()
+        if timestamp is None:
+            timestamp = _timestamp(t)
+        if dt is None:
+            dt = time.gmtime(t)
+    if dt is False:
+        dt = (0, 0, 0, 0, 0, 0)
+    elif isinstance(dt, datetime.datetime):
+        dt = (dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second)
+    sizedata = len(data)
+    if sizedata > VSCP_LEVEL2_MAXDATA:
+        raise ValueError("Event data can be at most {0} bytes".format(VSCP_LEVEL2_MAXDATA))
+    _ex_struct(sizedata).pack_into(buf, offset, 0, obid,
+                                    dt[0], dt[1], dt[2], dt[3], dt[4], dt[5],
+                                    timestamp, head, vscpclass, vscptype,
+                                    bytes(g), sizedata, bytes(data))
+
+# Stored date/time of an event as 2013-11-02T12:34:22Z
+def _iso_datetime(ev):
+    return "{0:04}-{1:02}-{2:02}T{3:02}:{4:02}:{5:02}Z".format(ev.year, ev.month, ev.day,
+                                                                ev.hour, ev.minute, ev.second)
+
+# VSCP event ex structure
+class vscpEventEx(Structure):
+
+    _fields_ = [("crc", c_uint16),
+                ("obid", c_uint32),
+                ("year", c_uint16),
+                ("month", c_ubyte),
+                ("day", c_ubyte),
+                ("hour", c_ubyte),
+                ("minute", c_ubyte),
+                ("second", c_ubyte),
+                ("timestamp", c_uint32),
+                ("head", c_uint16),
+                ("vscpclass", c_uint16),
+                ("vscptype", c_uint16),
+                ("guid", c_ubyte * 16),
+                ("sizedata", c_uint16),
+                ("data", c_ubyte * VSCP_LEVEL2_MAXDATA)]
+
+    def __init__(self):
+        # All fields are zeroed by ctypes. Date/time and timestamp
+        # are set from one clock reading.
+        t = time.time()
+        self.timestamp = _timestamp(t)
+        self.year, self.month, self.day, self.hour, self.minute, self.second = time.gmtime(t)[:6]
+
+    # Fast construction of an event. guid is a guid object or 16 bytes and
+    # data any object supporting the buffer protocol. If timestamp or dt
+    # (datetime.datetime or (year,month,day,hour,minute,second) tuple) is
+    # not given it is set from one clock reading. With dt=False date/time
+    # is left unset.
+    @classmethod
+    def new(cls, vscpclass=0, vscptype=0, guid=None, data=b'', timestamp=None,
+                head=0, obid=0, dt=None):
+        ex = cls.__new__(cls)
+        _fill_ex(ex, 0, vscpclass, vscptype, guid, data, timestamp, head, obid, dt)
+        return ex
+
+    # As new() but the event is placed in the writable buffer buf at
+    # offset (sizeof(vscpEventEx) bytes) instead of in new memory. Use it
+    # to keep many events in one preallocated buffer.
+    @classmethod
+    def newInBuffer(cls, buf, offset=0, vscpclass=0, vscptype=0, guid=None, data=b'',
+                        timestamp=None, head=0, obid=0, dt=None):
+        _fill_ex(buf, offset, vscpclass, vscptype, guid, data, timestamp, head, obid, dt)
+        return cls.from_buffer(buf, offset)
+
+    def setTimestamp(self):
+        self.timestamp = int((datetime.datetime.utcnow() - datetime.datetime(1970, 1, 1)).total_seconds() * 1000)
+
+    def setDateTimeNow(self):
+        dt = datetime.datetime.utcnow()
+        self.year=dt.year
+        self.month=dt.month
+        self.day=dt.day
+        self.hour=dt.hour
+        self.minute=dt.minute
+        self.second=dt.second
+
+    # 2013-11-02T12:34:22Z
+    def getIsoDateTime(self):
+        # Update time to now
+        self.setDateTimeNow()
+        return "{0:04n}-{1:02}-{2:02}T{3:02}:{4:02}:{5:02}Z".format(self.year,
+                                                                        self.month,
+                                                                        self.day,
+                                                                        self.hour,
+                                                                        self.minute,
+                                                                        self.second)
+
+    def getGuidStr(self):
+        return _guid_hex(bytes(self.guid))
+
+    # Event as a dict. The stored date/time is used.
+    def toJSON(self):
+        return {
+            "vscpHead": self.head,
+            "vscpObId": self.obid,
+            "vscpDateTime": _iso_datetime(self),
+            "vscpTimeStamp":self.timestamp,
+            "vscpClass": self.vscpclass,
+            "vscpType": self.vscptype,
+            "vscpGuid": self.getGuidStr(),
+            "vscpData": self.data[:self.sizedata]
+        }
+
+    def dump(self):
+        print("------------------------------------------------------------------------")
+        print("Dump of vscpEventEx content")
+        print(" %04d-%02d-%02dT%02d:%02d:%02dZ UTC Timestamp=%08X" % (self.year,self.month, self.day, self.hour, self.minute, self.second, self.timestamp))
+        print(" head=%04X class=%d type=%d size=%d" % (self.head, self.vscpclass, self.vscptype, self.sizedata ) )
+        if self.sizedata > 0:
+            out = "Data = "
+            for i in range(0,self.sizedata):
+                out += "0:02X ".format(self.data[i])
+            print(out)
+        else:
+            print("No data.")
+        print("crc={0:04X} obid={1:08X}".format(self.crc, self.obid))
+        print("------------------------------------------------------------------------")
+
+# VSCP event structure  (!!!!! Use vscpEventEx !!!!!)
+class vscpEvent(Structure):
+
+    _fields_ = [("crc", c_uint16),
+                ("obid", c_uint32),
+                ("year", c_uint16),
+                ("month", c_ubyte),
+                ("day", c_ubyte),
+                ("hour", c_ubyte),
+                ("minute", c_ubyte),
+                ("second", c_ubyte),
+                ("timestamp", c_uint32),
+                ("head", c_uint16),
+                ("vscpclass", c_uint16),
+                ("vscptype", c_uint16),
+                ("guid", c_ubyte * 16),
+                ("sizedata", c_uint16),
+                ("pdata", POINTER(c_ubyte))]
+
+    def __init__(self):
+        # All fields are zeroed by ctypes. Date/time and timestamp
+        # are set from one clock reading.
+        t = time.time()
+        self.timestamp = _timestamp(t)
+        self.year, self.month, self.day, self.hour, self.minute, self.second = time.gmtime(t)[:6]
+
+    def setTimestamp(self):
+        self.timestamp = int((datetime.datetime.utcnow() - datetime.datetime(1970, 1, 1)).total_seconds() * 1000)
+
+    def setDateTimeNow(self):
+        # Update time to now
+        dt = datetime.datetime.utcnow()
+        self.year=dt.year
+        self.month=dt.month
+        self.day=dt.day
+        self.hour=dt.hour
+        self.minute=dt.minute
+        self.second=dt.second
+
+    # 2013-11-02T12:34:22Z
+    def getIsoDateTime(self):
+        # Update time to now
+        self.setDateTimeNow()
+        return "{0:04n}-{1:02}-{2:02}T{3:02}:{4:02}:{5:02}Z".format(self.year,
+                                                                        self.month,
+                                                                        self.day,
+                                                                        self.hour,
+                                                                        self.minute,
+                                                                        self.second)
+
+    def getGuidStr(self):
+        return _guid_hex(bytes(self.guid))
+
+    # Event as a dict. The stored date/time is used.
+    def toJSON(self):
+        a = self.pdata[:self.sizedata] if self.sizedata else []
+        return {
+            "vscpHead": self.head,
+            "vscpObId": self.obid,
+            "vscpDateTime": _iso_datetime(self),
+            "vscpTimeStamp":self.timestamp,
+            "vscpClass": self.vscpclass,
+            "vscpType": self.vscptype,
+            "vscpGuid": self.getGuidStr(),
+            "vscpData": a
+        }
+
+    def dump(self):
+        print("------------------------------------------------------------------------")
+        print("Dump of vscpEvent content")
+        print(" %04d-%02d-%02d %02d:%02d:%02d UTC Timestamp=%08X" % (self.year,self.month, self.day, self.hour, self.minute, self.second, self.timestamp))
+        print(" head=%04X class=%d type=%d size=%d" % (self.head, self.vscpclass, self.vscptype, self.sizedata ) )
+        if self.sizedata > 0:
+            out = "Data = "
+            for i in range(0,self.sizedata):
+                out += "%02X " % self.pdata[i]
+            print(out)
+        else:
+            print("No data.")
+        print("crc=%04X obid=%08X" % (self.crc, self.obid))
+        print("------------------------------------------------------------------------")
+
+# Receiving event filter
+class vscpEventFilter(Structure):
+    _fields_ = [("filter_priority", c_ubyte),
+                ("mask_priority", c_ubyte),
+                ("filter_class", c_ushort),
+                ("mask_class", c_ushort),
+                ("filter_type", c_ushort),
+                ("mask_type", c_ushort),
+                ("filter_guid", c_ubyte * 16),
+                ("mask_guid", c_ubyte * 16) ]
+
+    def __init__(self):
+        self.filter_priority = 0
+        self.mask_priority = 0
+        self.filter_class = 0
+        self.mask_class = 0
+        self.filter_type = 0
+        self.mask_type = 0
+        for i in (0,15):
+            self.filter_guid[i] = 0
+        for i in (0,15):
+            self.mask_guid[i] = 0
+
+    def clear(self):
+        self.filter_priority = 0
+        self.mask_priority = 0
+        self.filter_class = 0
+        self.mask_class = 0
+        self.filter_type = 0
+        self.mask_type = 0
+        for i in (0,15):
+            self.filter_guid[i] = 0
+        for i in (0,15):
+            self.mask_guid[i] = 0
+
+    # True if event is let through by the filter. A bit set in a mask means
+    # the corresponding bit in the filter must be equal to the event bit.
+    # Priority is compared as a value 0-7.
+    def match(self, ev):
+        if ((self.filter_priority ^ ((ev.head >> 5) & 7)) & self.mask_priority):
+            return False
+        if ((self.filter_class ^ ev.vscpclass) & self.mask_class):
+            return False
+        if ((self.filter_type ^ ev.vscptype) & self.mask_type):
+            return False
+        for f, m, v in zip(self.filter_guid, self.mask_guid, bytes(ev.guid)):
+            if ((f ^ v) & m):
+                return False
+        return True
+
+# Node data - the required registers are fetched from this
+#	structure
+class vscpMyNode(Structure):
+    _fields_ = [ ("guid", c_ubyte * 16),
+                 ("nicknameID", c_ubyte ) ]
@@ -0,0 +1,293 @@
+# FILE: vscp/guids.py
+#
+# VSCP GUID classes
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import sys
+from ctypes import c_ubyte
+
+_NULL_GUID = bytes(16)
+
+################################################################################
+# Encapsulate the VSCP GUID
+#
+
+class guid:
+
+    def __init__(self,guid = None):
+        if guid is None:
+            self.guid = bytearray(16)
+        elif isinstance(guid,str):
+            self.setFromString(guid)
+        elif isinstance(guid,bytearray):
+            self.guid = guid
+        elif isinstance(guid,(bytes,vscpGuid)):
+            self.guid = bytearray(guid)
+        else :
+            raise TypeError("Assigned GUID must be string or bytearray")
+
+    def getArrayFromString(self, guidstr):
+        if 47 == len(guidstr):
+            try:
+                return (c_ubyte * 16).from_buffer_copy(bytes.fromhex(guidstr.replace(':','')))
+            except ValueError:
+                pass
+        g = tuple(int(z,16) for z in guidstr.split(':',16))
+        return ((c_ubyte * 16)(*g))
+
+    def setFromString(self, guidstr):
+        self.guid = self.getArrayFromString(guidstr)
+
+    def getAsString(self):
+        return _guid_hex(bytes(self.guid))
+
+    def reverse(self):
+        self.guid = self.guid[::-1]
+
+    def clear(self):
+        self.setFromString("00:00:00:00:00:00:00:00:00:00:00:00:00:00:00:00")
+
+    def getAt(self,pos):
+        return self.guid[pos]
+
+    def setAt(self,pos,value):
+        self.guid[pos] = value
+
+    def getLSB(self):
+        return self.guid[15]
+
+    def setLSB(self,value):
+        self.guid[15] = value
+
+    def getNickname(self):
+        return self.guid[15]
+
+    def setNickname(self, value):
+        self.guid[15] = value
+
+    def getNicknameID(self):
+        return ((self.guid[14]<<8) + self.guid[15])
+
+    def setNicknameID(self,nicknameid):
+        self.guid[14] = ((nicknameid >> 8) & 0xFF)
+        self.guid[15] = (nicknameid & 0xFF)
+
+    def getClientID(self):
+        return ((self.guid[12]<<8) + self.guid[13])
+
+    def setClientID(self,clientid):
+        self.guid[12] = ((clientid >> 8) & 0xFF)
+        self.guid[13] = (clientid & 0xFF)
+
+    def isSame(self,arr):
+        if 16 > len(arr): return False
+        return bytes(self.guid) == bytes(arr[:16])
+
+    def isNULL(self):
+        return (0 == sum(self.guid))
+
+    # getmac is slow to import and only needed here
+    def setGUIDFromMAC(self, id=0):
+        import getmac
+        self.guid = self.getArrayFromString('FF:FF:FF:FF:FF:FF:FF:FE:' + \
+  	                            getmac.get_mac_address().upper() + \
+  	                            ":{0:02X}:{1:02X}".format(int(id/256),id & 0xFF))
+
+
+# Colon separated upper case hex string for GUID bytes
+if sys.version_info >= (3, 8):
+    def _guid_hex(b):
+        return b.hex(":").upper()
+else:
+    def _guid_hex(b):
+        return ":".join(["%02X" % v for v in b])
+
+# Number of interned vscpGuid objects before the intern table is flushed
+VSCP_GUID_INTERN_SIZE = 65536
+
+################################################################################
+# Immutable and hashable VSCP GUID
+#
+# A vscpGuid is a 16 byte value that can be used as a dict key. Equal
+# GUID's created through the constructor are interned and share one
+# object, and the string form is only formatted once.
+#
+#   g = vscpGuid("FF:FF:FF:FF:FF:FF:FF:FE:B8:27:EB:0A:11:22:00:01")
+#   g = vscpGuid(ex.guid)
+#   state[g] = ...
+#
+
+class vscpGuid:
+
+    __slots__ = ("_b", "_str", "_hash")
+
+    _intern = {}
+
+    def __new__(cls, value=None):
+        if isinstance(value, vscpGuid):
+            return value
+        if isinstance(value, str):
+            g = cls._intern.get(value)
+            if g is None:
+                g = cls._create(cls._parse(value))
+                if len(cls._intern) >= VSCP_GUID_INTERN_SIZE:
+                    cls._intern.clear()
+                cls._intern[value] = g
+            return g
+        if value is None:
+            b = _NULL_GUID
+        elif isinstance(value, guid):
+            b = bytes(value.guid)
+        else:
+            b = bytes(value)
+        g = cls._intern.get(b)
+        if g is None:
+            g = cls._create(b)
+        return g
+
+    @classmethod
+    def _create(cls, b):
+        if 16 != len(b):
+            raise ValueError("GUID must be 16 bytes")
+        intern = cls._intern
+        g = intern.get(b)
+        if g is None:
+            if len(intern) >= VSCP_GUID_INTERN_SIZE:
+                intern.clear()
+            g = object.__new__(cls)
+            object.__setattr__(g, "_b", b)
+            object.__setattr__(g, "_str", None)
+            object.__setattr__(g, "_hash", hash(b))
+            intern[b] = g
+        return g
+
+    @staticmethod
+    def _parse(s):
+        if 47 == len(s):
+            try:
+                return bytes.fromhex(s.replace(":", ""))
+            except ValueError:
+                pass
+        parts = s.split(":")
+        if 16 != len(parts):
+            raise ValueError("GUID string must have 16 parts")
+        return bytes(int(z, 16) for z in parts)
+
+    # Remove all interned GUID's
+    @classmethod
+    def clearInternTable(cls):
+        cls._intern.clear()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("vscpGuid is immutable")
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, vscpGuid):
+            return self._b == other._b
+        if isinstance(other, (bytes, bytearray, memoryview)):
+            return self._b == other
+        if isinstance(other, guid):
+            return self._b == bytes(other.guid)
+        return NotImplemented
+
+    def __ne__(self, other):
+        r = self.__eq__(other)
+        return r if r is NotImplemented else not r
+
+    def __lt__(self, other):
+        return self._b < vscpGuid(other)._b
+
+    def __bytes__(self):
+        return self._b
+
+    def __len__(self):
+        return 16
+
+    def __getitem__(self, pos):
+        return self._b[pos]
+
+    def __iter__(self):
+        return iter(self._b)
+
+    def __reduce__(self):
+        return (vscpGuid, (self._b,))
+
+    def __repr__(self):
+        return "vscpGuid('{0}')".format(self.getAsString())
+
+    def __str__(self):
+        return self.getAsString()
+
+    def getAsString(self):
+        s = self._str
+        if s is None:
+            s = _guid_hex(self._b)
+            object.__setattr__(self, "_str", s)
+        return s
+
+    def getBytes(self):
+        return self._b
+
+    def getAt(self, pos):
+        return self._b[pos]
+
+    def getLSB(self):
+        return self._b[15]
+
+    def getNickname(self):
+        return self._b[15]
+
+    def getNicknameID(self):
+        return (self._b[14] << 8) + self._b[15]
+
+    def getClientID(self):
+        return (self._b[12] << 8) + self._b[13]
+
+    def isNULL(self):
+        return self._b == _NULL_GUID
+
+    def isSame(self, arr):
+        return len(arr) >= 16 and self._b == bytes(arr[:16])
+
+    # Copies with some bytes changed
+    def withNickname(self, nickname):
+        return vscpGuid(self._b[:15] + bytes([nickname & 0xff]))
+
+    def withNicknameID(self, nicknameid):
+        return vscpGuid(self._b[:14] + bytes([(nicknameid >> 8) & 0xff, nicknameid & 0xff]))
+
+    def withClientID(self, clientid):
+        return vscpGuid(self._b[:12] + bytes([(clientid >> 8) & 0xff, clientid & 0xff]) + self._b[14:])
+
+    # Mutable guid object with the same value
+    def toGuid(self):
+        return guid(bytearray(self._b))
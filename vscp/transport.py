@@ -0,0 +1,79 @@
+# FILE: vscp/transport.py
+#
+# VSCP communication channel structures
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from ctypes import Structure, c_ubyte, c_ulong, c_ushort
+
+from vscp.constants import VSCP_STATUS_ERROR_STRING_SIZE
+
+# Transmission statistics structure
+class VSCPStatistics(Structure):
+    _fields_ = [("cntReceiveFrames", c_ulong),
+                ("cntTransmitFrames", c_ulong),
+                ("cntReceiveData", c_ulong),
+                ("cntTransmitData", c_ulong),
+                ("cntOverruns", c_ulong),
+                ("x", c_ulong),    # Placeholder
+                ("y", c_ulong),    # Placeholder
+                ("z", c_ulong) ]   # Placeholder
+
+    def __init__(self):
+        self.cntReceiveFrames = 0
+        self.cntTransmitFrames = 0
+        self.cntReceiveData = 0
+        self.cntTransmitData = 0
+        self.cntOverruns = 0
+        self.x = 0
+        self.y = 0
+        self.z = 0
+
+# Communication channel status
+class VSCPStatus(Structure):
+    _fields_ = [("channel_status", c_ulong),
+                ("lasterrorcode", c_ulong),
+                ("lasterrorsubcode", c_ulong),
+                ("lasterrorstr", c_ubyte * VSCP_STATUS_ERROR_STRING_SIZE)]
+
+    def __init__(self):
+        self.channel_status = 0
+        self.lasterrorcode = 0
+        self.lasterrorsubcode = 0
+        for i in (0,VSCP_STATUS_ERROR_STRING_SIZE-1):
+            self.lasterrorstr[i] = 0
+
+# Communication channel info
+class VSCPChannelInfo(Structure):
+    _fields_ = [("channelType", c_ubyte),
+                ("channel", c_ushort),
+                ("guid", c_ubyte * 16)]
+
+    def __init__(self):
+        self.channelType = 0
+        self.channel = 0
+        for i in (0,15):
+            self.guid[i] = 0
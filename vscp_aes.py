@@ -0,0 +1,240 @@
+# FILE: vscp_aes.py
+#
+# AES encryption of VSCP multicast/UDP frames
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Encrypted frames are laid out as in the VSCP C code
+#
+#   pkttype | AES-CBC(frame[1:] zero padded) | IV (16 bytes)
+#
+# The low nibble of the packet type byte tells the algorithm
+# (VSCP_ENCRYPTION_AES128/192/256) and is left in clear together with the
+# rest of the packet type byte.
+#
+# AES key schedules are expanded once per key and kept in a cache. CBC is
+# chained here on top of a cached ECB context, so no cipher object is set
+# up per frame and a burst of frames can be decrypted with one call.
+
+import os
+
+from Crypto.Cipher import AES
+
+from vscp import *
+from vscp_packet import decode_packet0, make_packet0
+
+# Number of expanded keys kept before the cache is flushed
+CIPHER_CACHE_SIZE = 64
+
+# Frames with more blocks than this are encrypted with a one-shot CBC
+# object. Shorter frames are chained block by block through the cached
+# context which is cheaper than setting up a new cipher.
+CHAIN_BLOCKS = 3
+
+AES_BLOCK_SIZE = 16
+AES_IV_SIZE = 16
+
+_KEY_SIZE = { VSCP_ENCRYPTION_AES128: 16,
+              VSCP_ENCRYPTION_AES192: 24,
+              VSCP_ENCRYPTION_AES256: 32 }
+
+_ENCRYPTION = dict((v, k) for k, v in _KEY_SIZE.items())
+
+_TOKENS = { VSCP_ENCRYPTION_NONE: VSCP_ENCRYPTION_TOKEN_0,
+            VSCP_ENCRYPTION_AES128: VSCP_ENCRYPTION_TOKEN_1,
+            VSCP_ENCRYPTION_AES192: VSCP_ENCRYPTION_TOKEN_2,
+            VSCP_ENCRYPTION_AES256: VSCP_ENCRYPTION_TOKEN_3 }
+
+_ciphers = {}
+
+# Encryption code from token ("", "AES128", "AES192" or "AES256")
+def encryption_from_token(token):
+    token = token.strip().upper()
+    for code, t in _TOKENS.items():
+        if t == token:
+            return code
+    raise ValueError("Unknown encryption: " + token)
+
+# Token for encryption code
+def encryption_token(encryption):
+    try:
+        return _TOKENS[encryption]
+    except KeyError:
+        raise ValueError("Unknown encryption: {0}".format(encryption))
+
+# Key as bytes. A key can be given as bytes or as a hex string like
+# VSCP_DEFAULT_KEY16.
+def make_key(key):
+    if isinstance(key, str):
+        key = bytes.fromhex(key)
+    else:
+        key = bytes(key)
+    if len(key) not in _ENCRYPTION:
+        raise ValueError("AES key must be 16, 24 or 32 bytes")
+    return key
+
+# Encryption code to use for a key
+def key_encryption(key):
+    return _ENCRYPTION[len(make_key(key))]
+
+# Cached ECB context for a key (bytes)
+def _cipher(key):
+    c = _ciphers.get(key)
+    if c is None:
+        if len(_ciphers) >= CIPHER_CACHE_SIZE:
+            _ciphers.clear()
+        c = AES.new(key, AES.MODE_ECB)
+        _ciphers[key] = c
+    return c
+
+def clear_cipher_cache():
+    _ciphers.clear()
+
+# Key for a frame. keys is one key or a dict with a key for each
+# encryption code.
+def _frame_key(keys, encryption):
+    if isinstance(keys, dict):
+        try:
+            key = make_key(keys[encryption])
+        except KeyError:
+            raise ValueError("No key for {0}".format(encryption_token(encryption)))
+    else:
+        key = make_key(keys)
+    if len(key) != _KEY_SIZE.get(encryption):
+        raise ValueError("Key size does not match frame encryption")
+    return key
+
+def _xor(a, b):
+    return (int.from_bytes(a, "big") ^ int.from_bytes(b, "big")).to_bytes(len(a), "big")
+
+# Encrypt a frame (packet type byte first) with key. A random IV is used
+# unless one is given. Returns the encrypted frame as a bytearray.
+def encrypt_frame(frame, key, iv=None):
+    key = make_key(key)
+    if iv is None:
+        iv = os.urandom(AES_IV_SIZE)
+    elif len(iv) != AES_IV_SIZE:
+        raise ValueError("IV must be 16 bytes")
+    n = len(frame)
+    padlen = n + AES_BLOCK_SIZE - (n % AES_BLOCK_SIZE)      # Same padding as VSCP C code
+    plain = bytes(frame[1:]) + bytes(padlen - n + 1)
+    if padlen > CHAIN_BLOCKS * AES_BLOCK_SIZE:
+        ct = AES.new(key, AES.MODE_CBC, bytes(iv)).encrypt(plain)
+    else:
+        encrypt = _cipher(key).encrypt
+        prev = bytes(iv)
+        blocks = []
+        for i in range(0, padlen, AES_BLOCK_SIZE):
+            prev = encrypt(_xor(plain[i:i+AES_BLOCK_SIZE], prev))
+            blocks.append(prev)
+        ct = b"".join(blocks)
+    out = bytearray(1 + padlen + AES_IV_SIZE)
+    out[0] = (frame[0] & 0xF0) | _ENCRYPTION[len(key)]
+    out[1:1+padlen] = ct
+    out[1+padlen:] = iv
+    return out
+
+def _split(frame):
+    n = len(frame)
+    if n < 1 + AES_BLOCK_SIZE + AES_IV_SIZE or (n - 1 - AES_IV_SIZE) % AES_BLOCK_SIZE:
+        raise ValueError("Invalid encrypted frame size")
+    encryption = GET_VSCP_MULTICAST_PACKET_ENCRYPTION(frame[0])
+    if encryption == VSCP_ENCRYPTION_NONE:
+        raise ValueError("Frame is not encrypted")
+    return encryption, frame[1:n-AES_IV_SIZE], frame[n-AES_IV_SIZE:]
+
+# Decrypt an encrypted frame. keys is the key or a dict with a key for
+# each encryption code. Returns the plain frame (with encryption cleared
+# in the packet type and padding left at the end) as a bytearray.
+def decrypt_frame(frame, keys):
+    mv = memoryview(frame)
+    encryption, ct, iv = _split(mv)
+    plain = _cipher(_frame_key(keys, encryption)).decrypt(ct)
+    out = bytearray(1 + len(ct))
+    out[0] = mv[0] & 0xF0
+    out[1:] = _xor(plain, bytes(iv) + bytes(ct[:-AES_BLOCK_SIZE]))
+    return out
+
+# Decrypt many frames. Frames that use the same key are decrypted with one
+# cipher call. Returns a list with the plain frame for each frame, or None
+# for frames that could not be decrypted.
+def decrypt_many(frames, keys):
+    out = [None] * len(frames)
+    groups = {}
+    for i, frame in enumerate(frames):
+        mv = memoryview(frame)
+        try:
+            encryption, ct, iv = _split(mv)
+            key = _frame_key(keys, encryption)
+        except ValueError:
+            continue
+        groups.setdefault(key, []).append((i, mv[0] & 0xF0, ct, iv))
+    for key, items in groups.items():
+        ct = b"".join(item[2] for item in items)
+        chain = b"".join(bytes(item[3]) + bytes(item[2][:-AES_BLOCK_SIZE]) for item in items)
+        plain = _xor(_cipher(key).decrypt(ct), chain)
+        pos = 0
+        for i, pkttype, c, _ in items:
+            n = len(c)
+            frame = bytearray(1 + n)
+            frame[0] = pkttype
+            frame[1:] = plain[pos:pos+n]
+            out[i] = frame
+            pos += n
+    return out
+
+# Encode event as an encrypted packet type 0 frame
+def encode_packet0_encrypted(event, key, iv=None):
+    return encrypt_frame(make_packet0(event), key, iv)
+
+# Decode a packet type 0 frame that may be encrypted. Plain frames are
+# decoded as is. Raises ValueError as decode_packet0 does and for frames
+# that can not be decrypted.
+def decode_packet0_encrypted(frame, keys, verify=True):
+    if GET_VSCP_MULTICAST_PACKET_ENCRYPTION(frame[0]) == VSCP_ENCRYPTION_NONE:
+        return decode_packet0(frame, 0, verify)
+    return decode_packet0(memoryview(decrypt_frame(frame, keys)), 0, verify)
+
+# Decode many frames (a burst of datagrams). Returns a list with a
+# Packet0View for each frame, or None for frames that were bad.
+def decode_packet0_many(frames, keys, verify=True):
+    out = [None] * len(frames)
+    encrypted = []
+    for i, frame in enumerate(frames):
+        if GET_VSCP_MULTICAST_PACKET_ENCRYPTION(frame[0]) == VSCP_ENCRYPTION_NONE:
+            try:
+                out[i] = decode_packet0(frame, 0, verify)
+            except ValueError:
+                pass
+        else:
+            encrypted.append(i)
+    plain = decrypt_many([frames[i] for i in encrypted], keys)
+    for i, frame in zip(encrypted, plain):
+        if frame is not None:
+            try:
+                out[i] = decode_packet0(memoryview(frame), 0, verify)
+            except ValueError:
+                pass
+    return out
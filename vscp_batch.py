@@ -0,0 +1,242 @@
+# FILE: vscp_batch.py
+#
+# Columnar container for many VSCP events
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from array import array
+from ctypes import addressof, string_at
+
+from vscp import vscpEventEx, vscpGuid, VSCP_LEVEL2_MAXDATA, VSCP_HEADER_PRIORITY_MASK
+
+# Offset of the data array inside a vscpEventEx
+_EX_DATA_OFFSET = vscpEventEx.data.offset
+
+_NULL_GUID = bytes(16)
+
+# Columns that hold one fixed size value per event
+_COLUMNS = ( ("head", 'H'),
+             ("vscpclass", 'H'),
+             ("vscptype", 'H'),
+             ("timestamp", 'I'),
+             ("obid", 'I'),
+             ("year", 'H'),
+             ("month", 'B'),
+             ("day", 'B'),
+             ("hour", 'B'),
+             ("minute", 'B'),
+             ("second", 'B') )
+
+################################################################################
+# A batch of events stored as parallel columns
+#
+# Each event costs its fixed columns (19 bytes), 16 bytes of GUID, 8 bytes
+# of data offset and the actual data bytes. The data of all events share one
+# arena and event i owns data[offsets[i]:offsets[i+1]].
+#
+# The event CRC is a frame property and is not stored.
+#
+
+class VscpEventBatch:
+
+    __slots__ = [name for name, _ in _COLUMNS] + ["guid", "offsets", "data"]
+
+    def __init__(self):
+        for name, code in _COLUMNS:
+            setattr(self, name, array(code))
+        self.guid = bytearray()
+        self.offsets = array('Q', [0])
+        self.data = bytearray()
+
+    # Create a batch from an iterable of vscpEventEx
+    @classmethod
+    def fromEvents(cls, events):
+        batch = cls()
+        batch.extend(events)
+        return batch
+
+    def __len__(self):
+        return len(self.head)
+
+    def __iter__(self):
+        for i in range(len(self.head)):
+            yield self.getEventEx(i)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self.head))
+            if 1 != step:
+                return self.take(range(start, stop, step))
+            return self._slice(start, max(start, stop))
+        return self.getEventEx(self._index(idx))
+
+    def _index(self, idx):
+        n = len(self.head)
+        if idx < 0:
+            idx += n
+        if idx < 0 or idx >= n:
+            raise IndexError("batch index out of range")
+        return idx
+
+    def _slice(self, start, stop):
+        batch = VscpEventBatch.__new__(VscpEventBatch)
+        for name, _ in _COLUMNS:
+            setattr(batch, name, getattr(self, name)[start:stop])
+        batch.guid = self.guid[start*16:stop*16]
+        base = self.offsets[start]
+        batch.offsets = array('Q', [o - base for o in self.offsets[start:stop+1]])
+        batch.data = self.data[base:self.offsets[stop]]
+        return batch
+
+    # Remove all events
+    def clear(self):
+        self.__init__()
+
+    # Add one event given as column values. guid and data can be any
+    # buffer protocol object. dt is a (year,month,day,hour,minute,second) tuple.
+    def appendRow(self, vscpclass, vscptype, guid=_NULL_GUID, data=b'',
+                    head=0, timestamp=0, obid=0, dt=(0,0,0,0,0,0)):
+        if len(guid) != 16:
+            raise ValueError("GUID must be 16 bytes")
+        if len(data) > VSCP_LEVEL2_MAXDATA:
+            raise ValueError("Event data can be at most {0} bytes".format(VSCP_LEVEL2_MAXDATA))
+        self.head.append(head)
+        self.vscpclass.append(vscpclass)
+        self.vscptype.append(vscptype)
+        self.timestamp.append(timestamp)
+        self.obid.append(obid)
+        self.year.append(dt[0])
+        self.month.append(dt[1])
+        self.day.append(dt[2])
+        self.hour.append(dt[3])
+        self.minute.append(dt[4])
+        self.second.append(dt[5])
+        self.guid += guid
+        self.data += data
+        self.offsets.append(len(self.data))
+
+    # Add a vscpEventEx
+    def append(self, ex):
+        self.appendRow(ex.vscpclass, ex.vscptype,
+                        string_at(addressof(ex.guid), 16),
+                        string_at(addressof(ex) + _EX_DATA_OFFSET, ex.sizedata),
+                        ex.head, ex.timestamp, ex.obid,
+                        (ex.year, ex.month, ex.day, ex.hour, ex.minute, ex.second))
+
+    # Add all events from an iterable of vscpEventEx or another batch
+    def extend(self, events):
+        if isinstance(events, VscpEventBatch):
+            for name, _ in _COLUMNS:
+                getattr(self, name).extend(getattr(events, name))
+            base = self.offsets[-1]
+            self.offsets.extend([o + base for o in events.offsets[1:]])
+            self.guid += events.guid
+            self.data += events.data
+            return
+        for ex in events:
+            self.append(ex)
+
+    # Data of event i as a memoryview into the data arena (no copy)
+    def getData(self, i):
+        return memoryview(self.data)[self.offsets[i]:self.offsets[i+1]]
+
+    def getSizeData(self, i):
+        return self.offsets[i+1] - self.offsets[i]
+
+    # GUID of event i as a memoryview into the GUID matrix (no copy)
+    def getGuid(self, i):
+        return memoryview(self.guid)[i*16:i*16+16]
+
+    def getGuidStr(self, i):
+        return vscpGuid(bytes(self.guid[i*16:i*16+16])).getAsString()
+
+    def getDateTime(self, i):
+        return (self.year[i], self.month[i], self.day[i],
+                    self.hour[i], self.minute[i], self.second[i])
+
+    # Materialize event i as a vscpEventEx
+    def getEventEx(self, i):
+        return vscpEventEx.new(self.vscpclass[i], self.vscptype[i],
+                                self.guid[i*16:i*16+16],
+                                self.data[self.offsets[i]:self.offsets[i+1]],
+                                self.timestamp[i], self.head[i], self.obid[i],
+                                self.getDateTime(i))
+
+    def toEvents(self):
+        return [self.getEventEx(i) for i in range(len(self.head))]
+
+    # New batch holding the rows given by an iterable of indexes
+    def take(self, indices):
+        batch = VscpEventBatch()
+        rows = list(indices)
+        for name, _ in _COLUMNS:
+            col = getattr(self, name)
+            setattr(batch, name, array(col.typecode, [col[i] for i in rows]))
+        src = memoryview(self.data)
+        offsets = self.offsets
+        guids = memoryview(self.guid)
+        pos = 0
+        newoffsets = [0]
+        for i in rows:
+            batch.guid += guids[i*16:i*16+16]
+            batch.data += src[offsets[i]:offsets[i+1]]
+            pos += offsets[i+1] - offsets[i]
+            newoffsets.append(pos)
+        batch.offsets = array('Q', newoffsets)
+        return batch
+
+    # New batch holding the rows where mask is true
+    def compress(self, mask):
+        return self.take(i for i, m in enumerate(mask) if m)
+
+    # Indexes of rows matching all given column values
+    def where(self, vscpclass=None, vscptype=None, guid=None, priority=None):
+        rows = range(len(self.head))
+        if vscpclass is not None:
+            col = self.vscpclass
+            rows = [i for i in rows if col[i] == vscpclass]
+        if vscptype is not None:
+            col = self.vscptype
+            rows = [i for i in rows if col[i] == vscptype]
+        if priority is not None:
+            col = self.head
+            rows = [i for i in rows if (col[i] & VSCP_HEADER_PRIORITY_MASK) == priority]
+        if guid is not None:
+            g = bytes(guid)
+            m = self.guid
+            rows = [i for i in rows if m[i*16:i*16+16] == g]
+        return list(rows)
+
+    # New batch with the rows matching all given column values
+    def select(self, vscpclass=None, vscptype=None, guid=None, priority=None):
+        return self.take(self.where(vscpclass, vscptype, guid, priority))
+
+    # Number of bytes used by the batch buffers
+    def nbytes(self):
+        n = len(self.guid) + len(self.data)
+        for name, _ in _COLUMNS:
+            col = getattr(self, name)
+            n += col.itemsize * len(col)
+        return n + self.offsets.itemsize * len(self.offsets)
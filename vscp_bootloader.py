@@ -0,0 +1,502 @@
+# FILE: vscp_bootloader.py
+#
+# Firmware loading with the VSCP boot loader algorithm
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# The VSCP boot loader algorithm (VSCP_BOOTLOADER_VSCP) uses CLASS1.PROTOCOL
+#
+#   host                                node
+#   ENTER_BOOT_LOADER          ->
+#                              <-       ACK_BOOT_LOADER (block size, block count)
+#   for each block
+#     START_BLOCK (block)      ->
+#     BLOCK_DATA x block size/8 ->
+#                              <-       BLOCK_DATA_ACK (CRC16, write pointer)
+#     PROGRAM_DATA_BLOCK       ->
+#                              <-       PROGRAM_DATA_BLOCK_ACK (block)
+#   ACTIVATE_NEW_IMAGE (CRC16) ->
+#                              <-       ACTIVATE_NEW_IMAGE_ACK
+#
+# A firmware image is loaded from Intel HEX into a BlockMap. Blocks that
+# are all 0xFF are already erased on the node and are not sent. Blocks
+# are streamed with up to 'window' blocks waiting for acks at a time,
+# sized from the receive buffer of the node (VSCP_STD_REGISTER_BUFFER_SIZE).
+# Each block is verified with the CRC16 in its ack and resent if it does
+# not match.
+#
+# Level I boot loader events carry no destination, so nodes on the same
+# bus must be loaded one at a time unless level2=True, where events are
+# sent as CLASS2.LEVEL1.PROTOCOL with the destination GUID first in data.
+
+import asyncio
+import inspect
+import struct
+
+from vscp import *
+from vscp_crc import crc16
+
+# Memory type in START_BLOCK
+VSCP_BOOT_MEMORY_FLASH = 0
+
+DEFAULT_BLOCK_SIZE = 256
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_RETRIES = 3
+
+# Bytes of block data in one BLOCK_DATA event
+BLOCK_DATA_SIZE = 8
+
+_U32 = struct.Struct(">I")
+_ACK = struct.Struct(">II")
+_DATA_ACK = struct.Struct(">HI")
+
+
+################################################################################
+# Intel HEX
+#
+
+# Parse Intel HEX text (a string or an iterable of lines). Returns a list
+# of (address, bytes) with adjacent records joined. Raises ValueError for
+# malformed records and bad checksums.
+def parse_intel_hex(lines):
+    if isinstance(lines, (str, bytes)):
+        lines = lines.splitlines()
+    segments = []
+    base = 0
+    for lineno, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode("ascii")
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] != ':':
+            raise ValueError("Line {0}: not an Intel HEX record".format(lineno))
+        try:
+            rec = bytes.fromhex(line[1:])
+        except ValueError:
+            raise ValueError("Line {0}: bad hex digits".format(lineno))
+        if len(rec) < 5 or len(rec) != rec[0] + 5:
+            raise ValueError("Line {0}: bad record length".format(lineno))
+        if sum(rec) & 0xFF:
+            raise ValueError("Line {0}: checksum error".format(lineno))
+        rtype = rec[3]
+        payload = rec[4:-1]
+        if rtype == 0:
+            addr = base + ((rec[1] << 8) | rec[2])
+            if segments and segments[-1][0] + len(segments[-1][1]) == addr:
+                segments[-1][1].extend(payload)
+            else:
+                segments.append((addr, bytearray(payload)))
+        elif rtype == 1:
+            break
+        elif rtype == 2:
+            base = int.from_bytes(payload, "big") << 4
+        elif rtype == 4:
+            base = int.from_bytes(payload, "big") << 16
+        elif rtype not in (3, 5):
+            raise ValueError("Line {0}: unknown record type {1}".format(lineno, rtype))
+    return [(a, bytes(d)) for a, d in segments]
+
+# Intel HEX text for (address, bytes) segments
+def make_intel_hex(segments, record_size=16):
+    lines = []
+    upper = None
+    for addr, data in segments:
+        for pos in range(0, len(data), record_size):
+            a = addr + pos
+            chunk = bytes(data[pos:pos + record_size])
+            if (a >> 16) != upper:
+                upper = a >> 16
+                lines.append(_hex_record(0, 4, struct.pack(">H", upper)))
+            # A record must not cross a 64k boundary
+            n = min(len(chunk), 0x10000 - (a & 0xFFFF))
+            lines.append(_hex_record(a & 0xFFFF, 0, chunk[:n]))
+            if n < len(chunk):
+                upper = (a + n) >> 16
+                lines.append(_hex_record(0, 4, struct.pack(">H", upper)))
+                lines.append(_hex_record(0, 0, chunk[n:]))
+    lines.append(":00000001FF")
+    return "\n".join(lines) + "\n"
+
+def _hex_record(addr, rtype, payload):
+    rec = bytes((len(payload), addr >> 8, addr & 0xFF, rtype)) + payload
+    return ":" + (rec + bytes(((-sum(rec)) & 0xFF,))).hex().upper()
+
+
+################################################################################
+# Firmware image as a sparse map of fixed size blocks
+#
+#   image = BlockMap.fromHex(open("firmware.hex").read(), block_size=256)
+#
+
+class BlockMap:
+
+    def __init__(self, block_size=DEFAULT_BLOCK_SIZE, base=0):
+        if block_size <= 0 or block_size % BLOCK_DATA_SIZE:
+            raise ValueError("Block size must be a multiple of {0}".format(BLOCK_DATA_SIZE))
+        self.block_size = block_size
+        self.base = base
+        self.blocks = {}
+
+    @classmethod
+    def fromHex(cls, text, block_size=DEFAULT_BLOCK_SIZE, base=0):
+        bm = cls(block_size, base)
+        for addr, data in parse_intel_hex(text):
+            bm.write(addr, data)
+        return bm
+
+    # Place data at address. Addresses are relative to base.
+    def write(self, addr, data):
+        addr -= self.base
+        if addr < 0:
+            raise ValueError("Address below image base")
+        bs = self.block_size
+        pos = 0
+        while pos < len(data):
+            n, off = divmod(addr + pos, bs)
+            chunk = min(bs - off, len(data) - pos)
+            blk = self.blocks.get(n)
+            if blk is None:
+                blk = self.blocks[n] = bytearray(b'\xff' * bs)
+            blk[off:off + chunk] = data[pos:pos + chunk]
+            pos += chunk
+
+    # Numbers of the blocks to send (not all 0xFF) in order
+    def dirtyBlocks(self):
+        empty = b'\xff' * self.block_size
+        return sorted(n for n, b in self.blocks.items() if b != empty)
+
+    # Number of blocks the image spans
+    def blockCount(self):
+        return max(self.blocks) + 1 if self.blocks else 0
+
+    def getBlock(self, n):
+        blk = self.blocks.get(n)
+        return bytes(blk) if blk is not None else b'\xff' * self.block_size
+
+    # CRC16 of the image over count blocks (default all), unwritten
+    # blocks as 0xFF
+    def crc(self, count=None):
+        if count is None:
+            count = self.blockCount()
+        c = VSCP_CRC16_REMINDER
+        for n in range(count):
+            c = crc16(self.getBlock(n), c)
+        return c
+
+
+################################################################################
+# Boot loader for nodes on one event connection
+#
+#   loader = VscpBootloader(client.send)
+#   ... give all received events to loader.feed(ev)
+#   await loader.flash(guid, image)
+#   results = await loader.flashMany(guids, image)
+#
+
+class _Session:
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.waiters = {}           # (type, key) -> future
+        self.nacks = {}
+
+    def expect(self, vscptype, key=None):
+        fut = self.loop.create_future()
+        self.waiters[(vscptype, key)] = fut
+        return fut
+
+    def resolve(self, vscptype, key, value):
+        fut = self.waiters.pop((vscptype, key), None)
+        if fut is not None and not fut.done():
+            fut.set_result(value)
+            return True
+        return False
+
+class VscpBootloader:
+
+    def __init__(self, send, guid=None, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                    level2=False, progress=None):
+        self._send = send
+        self.guid = bytes(16) if guid is None else bytes(vscpGuid(guid))
+        self.timeout = timeout
+        self.retries = retries
+        self.level2 = level2
+        self.progress = progress
+        self.cntResent = 0
+        self._sessions = {}         # nickname -> _Session
+
+    def _event(self, guid, vscptype, data):
+        if self.level2:
+            return vscpEventEx.new(VSCP_CLASS2_LEVEL1_PROTOCOL, vscptype, self.guid,
+                                    bytes(guid) + data)
+        return vscpEventEx.new(VSCP_CLASS1_PROTOCOL, vscptype, self.guid, data)
+
+    async def _emit(self, guid, vscptype, data=b''):
+        r = self._send(self._event(guid, vscptype, data))
+        if inspect.isawaitable(r):
+            await r
+
+    # Give a received event to the boot loader. Returns True if it was for
+    # a node being loaded.
+    def feed(self, ev):
+        data = bytes(ev.data[:ev.sizedata])
+        if ev.vscpclass == VSCP_CLASS2_LEVEL1_PROTOCOL:
+            data = data[16:]
+        elif ev.vscpclass != VSCP_CLASS1_PROTOCOL:
+            return False
+        s = self._sessions.get(ev.guid[15])
+        if s is None:
+            return False
+        t = ev.vscptype
+        if t in (VSCP_TYPE_PROTOCOL_ACK_BOOT_LOADER, VSCP_TYPE_PROTOCOL_NACK_BOOT_LOADER):
+            ok = t == VSCP_TYPE_PROTOCOL_ACK_BOOT_LOADER and len(data) >= 8
+            return s.resolve(VSCP_TYPE_PROTOCOL_ACK_BOOT_LOADER, None,
+                                _ACK.unpack_from(data) if ok else None)
+        if t in (VSCP_TYPE_PROTOCOL_BLOCK_DATA_ACK, VSCP_TYPE_PROTOCOL_BLOCK_DATA_NACK):
+            if t == VSCP_TYPE_PROTOCOL_BLOCK_DATA_ACK and len(data) >= 6:
+                crc, ptr = _DATA_ACK.unpack_from(data)
+                return s.resolve(VSCP_TYPE_PROTOCOL_BLOCK_DATA_ACK, ptr, crc)
+            if len(data) >= 5:
+                return s.resolve(VSCP_TYPE_PROTOCOL_BLOCK_DATA_ACK, _U32.unpack_from(data, 1)[0], None)
+            return False
+        if t in (VSCP_TYPE_PROTOCOL_PROGRAM_BLOCK_DATA_ACK, VSCP_TYPE_PROTOCOL_PROGRAM_BLOCK_DATA_NACK):
+            ok = t == VSCP_TYPE_PROTOCOL_PROGRAM_BLOCK_DATA_ACK
+            pos = 0 if ok else 1
+            if len(data) < pos + 4:
+                return False
+            return s.resolve(VSCP_TYPE_PROTOCOL_PROGRAM_BLOCK_DATA_ACK,
+                                _U32.unpack_from(data, pos)[0], ok)
+        if t in (VSCP_TYPE_PROTOCOL_ACTIVATE_NEW_IMAGE_ACK, VSCP_TYPE_PROTOCOL_ACTIVATE_NEW_IMAGE_NACK):
+            return s.resolve(VSCP_TYPE_PROTOCOL_ACTIVATE_NEW_IMAGE_ACK, None,
+                                t == VSCP_TYPE_PROTOCOL_ACTIVATE_NEW_IMAGE_ACK)
+        return False
+
+    async def _wait(self, fut, what):
+        try:
+            return await asyncio.wait_for(fut, self.timeout)
+        except asyncio.TimeoutError:
+            raise VscpError(VSCP_ERROR_TIMEOUT, "No {0} from node".format(what))
+
+    async def _block(self, s, lock, guid, image, n):
+        bs = image.block_size
+        blk = image.getBlock(n)
+        want = crc16(blk)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.cntResent += 1
+            ack = s.expect(VSCP_TYPE_PROTOCOL_BLOCK_DATA_ACK, n * bs)
+            # The frames of a block must not be mixed with another block
+            async with lock:
+                await self._emit(guid, VSCP_TYPE_PROTOCOL_START_BLOCK,
+                                    _U32.pack(n) + bytes((VSCP_BOOT_MEMORY_FLASH,)))
+                for pos in range(0, bs, BLOCK_DATA_SIZE):
+                    await self._emit(guid, VSCP_TYPE_PROTOCOL_BLOCK_DATA,
+                                        blk[pos:pos + BLOCK_DATA_SIZE])
+            try:
+                crc = await self._wait(ack, "block data ack")
+            except VscpError:
+                continue
+            if crc != want:
+                continue
+            done = s.expect(VSCP_TYPE_PROTOCOL_PROGRAM_BLOCK_DATA_ACK, n)
+            await self._emit(guid, VSCP_TYPE_PROTOCOL_PROGRAM_BLOCK_DATA, _U32.pack(n))
+            try:
+                if await self._wait(done, "program ack"):
+                    return
+            except VscpError:
+                continue
+        raise VscpError(VSCP_ERROR_ERROR, "Failed to load block {0}".format(n))
+
+    # Load image into node with guid and activate it. window is the number
+    # of blocks that may wait for acks at a time. It is computed from
+    # buffer_size (VSCP_STD_REGISTER_BUFFER_SIZE of the node) if not given.
+    async def flash(self, guid, image, window=None, buffer_size=None):
+        guid = bytes(vscpGuid(guid))
+        nickname = guid[15]
+        if nickname in self._sessions:
+            raise VscpError(VSCP_ERROR_ERROR, "Node {0} is already being loaded".format(nickname))
+        s = self._sessions[nickname] = _Session(asyncio.get_running_loop())
+        try:
+            ack = s.expect(VSCP_TYPE_PROTOCOL_ACK_BOOT_LOADER)
+            await self._emit(guid, VSCP_TYPE_PROTOCOL_ENTER_BOOT_LOADER,
+                                bytes((nickname, VSCP_BOOTLOADER_VSCP,
+                                        guid[0], guid[3], guid[5], guid[7], 0, 0)))
+            info = await self._wait(ack, "boot loader ack")
+            if info is None:
+                raise VscpError(VSCP_ERROR_ERROR, "Node refused to enter boot loader")
+            block_size, block_count = info
+            if block_size != image.block_size:
+                raise VscpError(VSCP_ERROR_PARAMETER,
+                                "Node block size is {0}, image has {1}".format(block_size,
+                                                                                image.block_size))
+            if image.blockCount() > block_count:
+                raise VscpError(VSCP_ERROR_PARAMETER, "Image does not fit in node")
+            if window is None:
+                window = max(1, (buffer_size or 0) // block_size)
+            blocks = image.dirtyBlocks()
+            lock = asyncio.Lock()
+            sem = asyncio.Semaphore(window)
+            done = [0]
+
+            async def one(n):
+                async with sem:
+                    await self._block(s, lock, guid, image, n)
+                done[0] += 1
+                if self.progress is not None:
+                    self.progress(vscpGuid(guid), done[0], len(blocks))
+
+            tasks = [asyncio.ensure_future(one(n)) for n in blocks]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for t in tasks:
+                    t.cancel()
+                raise
+            fut = s.expect(VSCP_TYPE_PROTOCOL_ACTIVATE_NEW_IMAGE_ACK)
+            await self._emit(guid, VSCP_TYPE_PROTOCOL_ACTIVATE_NEW_IMAGE,
+                                struct.pack(">H", image.crc(block_count)))
+            if not await self._wait(fut, "activate ack"):
+                raise VscpError(VSCP_ERROR_ERROR, "Node rejected the new image")
+            return len(blocks)
+        finally:
+            del self._sessions[nickname]
+
+    # Load image into many nodes, at most concurrency at a time. Returns a
+    # dict guid -> number of blocks sent or the exception for nodes that
+    # failed.
+    async def flashMany(self, guids, image, concurrency=16, **kwargs):
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(g):
+            async with sem:
+                return await self.flash(g, image, **kwargs)
+
+        guids = [vscpGuid(g) for g in guids]
+        res = await asyncio.gather(*[one(g) for g in guids], return_exceptions=True)
+        return dict(zip(guids, res))
+
+
+################################################################################
+# A simulated node running the VSCP boot loader
+#
+# Events from the host are given to feed() and replies are sent with
+# send() after 'latency' seconds. Received blocks are buffered until they
+# are programmed, at most buffer_size bytes. corrupt is a set of block
+# numbers that are received with an error the first time.
+#
+
+class SimulatedBootNode:
+
+    def __init__(self, guid, send, block_size=DEFAULT_BLOCK_SIZE, block_count=64,
+                    buffer_size=None, latency=0.0, level2=False, corrupt=()):
+        self.guid = bytes(vscpGuid(guid))
+        self._send = send
+        self.block_size = block_size
+        self.block_count = block_count
+        self.buffer_size = block_size if buffer_size is None else buffer_size
+        self.latency = latency
+        self.level2 = level2
+        self.corrupt = set(corrupt)
+        self.flash = bytearray(b'\xff' * (block_size * block_count))
+        self.inBootLoader = False
+        self.activated = False
+        self.cntFrames = 0
+        self.cntOverruns = 0
+        self._block = None
+        self._data = bytearray()
+        self._buffered = {}
+
+    def _reply(self, vscptype, data):
+        if self.level2:
+            ev = vscpEventEx.new(VSCP_CLASS2_LEVEL1_PROTOCOL, vscptype, self.guid, bytes(16) + data)
+        else:
+            ev = vscpEventEx.new(VSCP_CLASS1_PROTOCOL, vscptype, self.guid, data)
+        if self.latency:
+            asyncio.get_running_loop().call_later(self.latency, self._send, ev)
+        else:
+            asyncio.get_running_loop().call_soon(self._send, ev)
+
+    def feed(self, ev):
+        data = bytes(ev.data[:ev.sizedata])
+        if ev.vscpclass == VSCP_CLASS2_LEVEL1_PROTOCOL:
+            if data[:16] != self.guid:
+                return
+            data = data[16:]
+        elif ev.vscpclass != VSCP_CLASS1_PROTOCOL:
+            return
+        t = ev.vscptype
+        self.cntFrames += 1
+        if t == VSCP_TYPE_PROTOCOL_ENTER_BOOT_LOADER:
+            g = self.guid
+            if len(data) >= 6 and data[0] == g[15] and data[2:6] == bytes((g[0], g[3], g[5], g[7])):
+                if data[1] != VSCP_BOOTLOADER_VSCP:
+                    self._reply(VSCP_TYPE_PROTOCOL_NACK_BOOT_LOADER, b'\x01')
+                    return
+                self.inBootLoader = True
+                self._reply(VSCP_TYPE_PROTOCOL_ACK_BOOT_LOADER,
+                            _ACK.pack(self.block_size, self.block_count))
+            return
+        if not self.inBootLoader:
+            return
+        if t == VSCP_TYPE_PROTOCOL_START_BLOCK:
+            self._block = _U32.unpack_from(data)[0]
+            self._data = bytearray()
+            # A resent block replaces the buffered copy
+            self._buffered.pop(self._block, None)
+        elif t == VSCP_TYPE_PROTOCOL_BLOCK_DATA and self._block is not None:
+            self._data += data
+            if len(self._data) >= self.block_size:
+                n = self._block
+                blk = bytes(self._data[:self.block_size])
+                self._block = None
+                ptr = n * self.block_size
+                if n >= self.block_count:
+                    self._reply(VSCP_TYPE_PROTOCOL_BLOCK_DATA_NACK, b'\x01' + _U32.pack(ptr))
+                    return
+                if (len(self._buffered) + 1) * self.block_size > self.buffer_size:
+                    self.cntOverruns += 1
+                    self._reply(VSCP_TYPE_PROTOCOL_BLOCK_DATA_NACK, b'\x02' + _U32.pack(ptr))
+                    return
+                if n in self.corrupt:
+                    self.corrupt.discard(n)
+                    blk = bytes((blk[0] ^ 0xFF,)) + blk[1:]
+                self._buffered[n] = blk
+                self._reply(VSCP_TYPE_PROTOCOL_BLOCK_DATA_ACK, _DATA_ACK.pack(crc16(blk), ptr))
+        elif t == VSCP_TYPE_PROTOCOL_PROGRAM_BLOCK_DATA:
+            n = _U32.unpack_from(data)[0]
+            blk = self._buffered.pop(n, None)
+            if blk is None:
+                self._reply(VSCP_TYPE_PROTOCOL_PROGRAM_BLOCK_DATA_NACK, b'\x01' + _U32.pack(n))
+                return
+            self.flash[n * self.block_size:(n + 1) * self.block_size] = blk
+            self._reply(VSCP_TYPE_PROTOCOL_PROGRAM_BLOCK_DATA_ACK, _U32.pack(n))
+        elif t == VSCP_TYPE_PROTOCOL_ACTIVATE_NEW_IMAGE:
+            ok = len(data) >= 2 and struct.unpack_from(">H", data)[0] == crc16(self.flash)
+            self.activated = ok
+            if ok:
+                self.inBootLoader = False
+            self._reply(VSCP_TYPE_PROTOCOL_ACTIVATE_NEW_IMAGE_ACK if ok
+                            else VSCP_TYPE_PROTOCOL_ACTIVATE_NEW_IMAGE_NACK, b'')
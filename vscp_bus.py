@@ -0,0 +1,336 @@
+# FILE: vscp_bus.py
+#
+# In-process publish/subscribe of VSCP events
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Each subscriber has a filter (vscpEventFilter) and its own bounded
+# queue, so a slow subscriber only ever delays itself. Queues hold one
+# FIFO for each of the eight VSCP priorities and events are taken highest
+# priority (VSCP_PRIORITY_0) first, so alarms get past queued bulk
+# traffic. When a queue is full its policy decides what happens
+#
+#   DROP_OLDEST     The oldest event of the lowest priority queued is dropped
+#   DROP_NEWEST     The newest event of the lowest priority queued is dropped
+#                   (the new event itself if it has that priority)
+#   BLOCK           publishWait() waits for room, publish() drops the new
+#                   event
+#
+# Dropped events are counted in cntOverruns of the VSCPStatistics of the
+# subscriber and of the bus.
+#
+# Events are not copied, all subscribers get the same object and must
+# not change it.
+#
+# With an Instrumentation object (vscp_stats) the statistics of the bus
+# are attached to the channel named channel and filter and dispatch
+# latency is sampled.
+#
+#   bus = EventBus()
+#   alarms = bus.subscribe(flt, maxqueue=100)
+#   bus.publish(ev)
+#   async for ev in alarms:
+#       ...
+
+import asyncio
+import itertools
+from collections import deque
+from time import perf_counter_ns
+
+from vscp import *
+from vscp_filter import FilterSet
+from vscp_stats import STAGE_DISPATCH, STAGE_FILTER
+
+DEFAULT_QUEUE_SIZE = 1024
+
+DROP_OLDEST = 0
+DROP_NEWEST = 1
+BLOCK = 2
+
+_LEVELS = 8
+
+def _level(head):
+    return (head & VSCP_HEADER_PRIORITY_MASK) >> 5
+
+
+################################################################################
+# A subscriber queue
+#
+
+class Subscription:
+
+    def __init__(self, bus, sid, flt, maxqueue, policy, name):
+        if maxqueue <= 0:
+            raise ValueError("Queue size must be positive")
+        if policy not in (DROP_OLDEST, DROP_NEWEST, BLOCK):
+            raise ValueError("Unknown queue policy")
+        self.bus = bus
+        self.sid = sid
+        self.filter = flt
+        self.maxqueue = maxqueue
+        self.policy = policy
+        self.name = name
+        self.stats = VSCPStatistics()
+        self.closed = False
+        self._levels = [deque() for _ in range(_LEVELS)]
+        self._count = 0
+        self._top = _LEVELS         # No queued event has higher priority than this
+        self._waiter = None
+        self._space = None
+
+    def __repr__(self):
+        return "Subscription({0!r}, pending={1})".format(self.name, self._count)
+
+    # Number of events waiting
+    def pending(self):
+        return self._count
+
+    def full(self):
+        return self._count >= self.maxqueue
+
+    def _wakeup(self):
+        w = self._waiter
+        if w is not None and not w.done():
+            w.set_result(None)
+
+    def _put(self, ev, level):
+        self.stats.cntReceiveFrames += 1
+        self._levels[level].append(ev)
+        self._count += 1
+        if level < self._top:
+            self._top = level
+        if self._count > self.maxqueue:
+            self._drop()
+        self._wakeup()
+
+    def _drop(self):
+        levels = self._levels
+        for q in reversed(levels):
+            if q:
+                if self.policy == DROP_OLDEST:
+                    q.popleft()
+                else:
+                    q.pop()
+                break
+        self._count -= 1
+        self.stats.cntOverruns += 1
+        self.bus.stats.cntOverruns += 1
+
+    # The highest priority event or None if the queue is empty
+    def get_nowait(self):
+        if not self._count:
+            return None
+        levels = self._levels
+        top = self._top
+        while not levels[top]:
+            top += 1
+        ev = levels[top].popleft()
+        self._top = top
+        self._count -= 1
+        s = self._space
+        if s is not None and not s.done():
+            s.set_result(None)
+        return ev
+
+    # Wait for the next event. Returns None when the subscription is closed.
+    async def get(self):
+        while not self._count:
+            if self.closed:
+                return None
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self.get_nowait()
+
+    # All waiting events (at least one) in priority order
+    async def getMany(self, maxcount=None):
+        first = await self.get()
+        if first is None:
+            return []
+        out = [first]
+        n = self._count if maxcount is None else min(self._count, maxcount - 1)
+        for _ in range(n):
+            out.append(self.get_nowait())
+        return out
+
+    async def _waitSpace(self):
+        while self._count >= self.maxqueue and not self.closed:
+            if self._space is None or self._space.done():
+                self._space = asyncio.get_running_loop().create_future()
+            await self._space
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        ev = await self.get()
+        if ev is None:
+            raise StopAsyncIteration
+        return ev
+
+    # Change the filter. A closed subscription can not get a new one.
+    def setFilter(self, flt):
+        if self.closed:
+            raise VscpError(VSCP_ERROR_INVALID_HANDLE, "Subscription is closed")
+        self.bus._filters.add(self.sid, flt)
+        self.filter = flt
+
+    # Stop getting events. Events already queued can still be read.
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+################################################################################
+# Event bus
+#
+
+class EventBus:
+
+    def __init__(self, instrumentation=None, channel="bus"):
+        self.stats = VSCPStatistics()
+        self._filters = FilterSet()
+        self._subs = {}
+        self._ids = itertools.count()
+        self._filterStage = None
+        self._dispatchStage = None
+        if instrumentation is not None:
+            instrumentation.channel(channel).attach(self.stats)
+            self._filterStage = instrumentation.stage(STAGE_FILTER)
+            self._dispatchStage = instrumentation.stage(STAGE_DISPATCH)
+            self._every = instrumentation.sample_every
+            self._left = self._every
+
+    def __len__(self):
+        return len(self._subs)
+
+    # New subscriber. Without a filter all events are received.
+    def subscribe(self, flt=None, maxqueue=DEFAULT_QUEUE_SIZE, policy=DROP_OLDEST, name=None):
+        if flt is None:
+            flt = vscpEventFilter()
+        sid = next(self._ids)
+        sub = Subscription(self, sid, flt, maxqueue, policy, name)
+        self._filters.add(sid, flt)
+        self._subs[sid] = sub
+        return sub
+
+    def unsubscribe(self, sub):
+        if self._subs.pop(sub.sid, None) is None:
+            return
+        self._filters.remove(sub.sid)
+        sub.closed = True
+        sub._wakeup()
+        s = sub._space
+        if s is not None and not s.done():
+            s.set_result(None)
+
+    def _deliver(self, ev, sids):
+        level = _level(ev.head)
+        subs = self._subs
+        blocked = None
+        for sid in sids:
+            sub = subs[sid]
+            if sub.policy == BLOCK and sub._count >= sub.maxqueue:
+                if blocked is None:
+                    blocked = []
+                blocked.append(sub)
+            else:
+                sub._put(ev, level)
+        return blocked
+
+    def _dropped(self, blocked):
+        for sub in blocked:
+            sub.stats.cntOverruns += 1
+            self.stats.cntOverruns += 1
+
+    # publish() with the filter and dispatch stages timed
+    def _publishTimed(self, ev):
+        self._left = self._every
+        t0 = perf_counter_ns()
+        sids = self._filters.match(ev)
+        t1 = perf_counter_ns()
+        self._filterStage.observe(t1 - t0)
+        blocked = self._deliver(ev, sids) if sids else None
+        self._dispatchStage.end(t1)
+        return sids, blocked
+
+    # Give an event to all subscribers whose filter matches. Never waits.
+    # Returns the number of subscribers the event was queued for.
+    def publish(self, ev):
+        self.stats.cntTransmitFrames += 1
+        if self._filterStage is not None:
+            self._left -= 1
+            if not self._left:
+                sids, blocked = self._publishTimed(ev)
+                if blocked:
+                    self._dropped(blocked)
+                    return len(sids) - len(blocked)
+                return len(sids)
+        sids = self._filters.match(ev)
+        if not sids:
+            return 0
+        blocked = self._deliver(ev, sids)
+        if blocked:
+            self._dropped(blocked)
+            return len(sids) - len(blocked)
+        return len(sids)
+
+    # As publish() but waits for room in the queues of BLOCK subscribers.
+    # Other subscribers get the event at once.
+    async def publishWait(self, ev):
+        self.stats.cntTransmitFrames += 1
+        sids = self._filters.match(ev)
+        if not sids:
+            return 0
+        blocked = self._deliver(ev, sids)
+        if blocked:
+            level = _level(ev.head)
+            for sub in blocked:
+                await sub._waitSpace()
+                if not sub.closed:
+                    sub._put(ev, level)
+        return len(sids)
+
+    # Publish many events (an iterable or a VscpEventBatch). Filters are
+    # matched for the whole batch at once. Returns the number of events
+    # queued in total.
+    def publishMany(self, events):
+        if hasattr(events, "offsets"):
+            t0 = perf_counter_ns() if self._filterStage is not None else 0
+            matches = self._filters.matchBatch(events)
+            if t0 and matches:
+                self._filterStage.end(t0, len(matches))
+            n = 0
+            for row, sids in enumerate(matches):
+                self.stats.cntTransmitFrames += 1
+                if sids:
+                    blocked = self._deliver(events[row], sids)
+                    n += len(sids)
+                    if blocked:
+                        self._dropped(blocked)
+                        n -= len(blocked)
+            return n
+        return sum(self.publish(ev) for ev in events)
@@ -0,0 +1,239 @@
+# FILE: vscp_can.py
+#
+# Conversion between Level I CAN frames and VSCP events
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# A Level I event travels on CAN in a 29-bit extended identifier
+#
+#   bits 28-26  priority
+#   bit  25     hard coded node (VSCP_CAN_ID_HARD_CODED)
+#   bits 24-16  class
+#   bits 15-8   type
+#   bits 7-0    nickname of the sending node
+#
+# with 0-8 data bytes. The nickname is kept in the LSB of the event GUID.
+# Events of class 512-1023 (Level I events sent over Level II) carry the
+# destination GUID in their first 16 data bytes. They are sent on CAN as
+# class - 512 to the nickname in the GUID.
+#
+# The batch functions work on arrays of CAN ids and a block with eight
+# data bytes for each frame, or directly on SocketCAN can_frame dumps.
+
+import struct
+from array import array
+from itertools import accumulate
+
+from vscp import *
+from vscp_batch import VscpEventBatch
+
+# SocketCAN id flags
+CAN_EFF_FLAG = 0x80000000       # Extended frame format
+CAN_RTR_FLAG = 0x40000000       # Remote transmission request
+CAN_ERR_FLAG = 0x20000000       # Error frame
+CAN_EFF_MASK = 0x1FFFFFFF
+
+# SocketCAN struct can_frame (native byte order)
+CAN_FRAME = struct.Struct("=IB3x8s")
+CAN_FRAME_SIZE = CAN_FRAME.size
+
+_LEVEL1_OVER_LEVEL2 = 512
+
+_NULL_GUID = bytes(16)
+
+# CAN id from event header fields
+def make_can_id(head, vscpclass, vscptype, nickname):
+    canid = ((head & VSCP_HEADER_PRIORITY_MASK) << 21) | \
+                ((vscpclass & 0x1FF) << 16) | ((vscptype & 0xFF) << 8) | (nickname & 0xFF)
+    if head & VSCP_HEADER_HARD_CODED:
+        canid |= VSCP_CAN_ID_HARD_CODED
+    return canid
+
+# Split CAN id into (head, vscpclass, vscptype, nickname)
+def split_can_id(canid):
+    head = (canid >> 21) & VSCP_HEADER_PRIORITY_MASK
+    if canid & VSCP_CAN_ID_HARD_CODED:
+        head |= VSCP_HEADER_HARD_CODED
+    return head, (canid >> 16) & 0x1FF, (canid >> 8) & 0xFF, canid & 0xFF
+
+# CAN id and data bytes for an event (vscpEventEx or anything with the same
+# fields). Raises ValueError for events that can not be sent on Level I.
+def can_from_event(ev):
+    data = bytes(ev.data[:ev.sizedata])
+    vscpclass = ev.vscpclass
+    nickname = ev.guid[15]
+    if _LEVEL1_OVER_LEVEL2 <= vscpclass < 2 * _LEVEL1_OVER_LEVEL2:
+        if len(data) < 16:
+            raise ValueError("Level I over Level II event without destination GUID")
+        vscpclass -= _LEVEL1_OVER_LEVEL2
+        nickname = data[15]
+        data = data[16:]
+    elif vscpclass >= _LEVEL1_OVER_LEVEL2:
+        raise ValueError("Class {0} is not a Level I class".format(vscpclass))
+    if len(data) > VSCP_LEVEL1_MAXDATA:
+        raise ValueError("Level I event data can be at most {0} bytes".format(VSCP_LEVEL1_MAXDATA))
+    return make_can_id(ev.head, vscpclass, ev.vscptype, nickname), data
+
+# Event from CAN id and data. The GUID is guid (for example the GUID of
+# the interface) with the nickname of the sender as LSB.
+def event_from_can(canid, data=b'', guid=None, timestamp=None, obid=0, dt=None):
+    if len(data) > VSCP_LEVEL1_MAXDATA:
+        raise ValueError("Level I event data can be at most {0} bytes".format(VSCP_LEVEL1_MAXDATA))
+    head, vscpclass, vscptype, nickname = split_can_id(canid)
+    g = bytes(guid[:15]) if guid is not None else _NULL_GUID[:15]
+    return vscpEventEx.new(vscpclass, vscptype, g + bytes((nickname,)), data,
+                            timestamp, head, obid, dt)
+
+# Split a buffer of SocketCAN can_frame structs into (ids, dlcs, data)
+# where ids is an array('I') with the id flags still set, dlcs a bytes
+# object and data a bytearray with eight bytes for each frame.
+def split_can_frames(buf):
+    mv = memoryview(buf).cast('B')
+    n = len(mv) // CAN_FRAME_SIZE
+    mv = mv[:n * CAN_FRAME_SIZE]
+    ids = array('I', mv.cast('I')[0::CAN_FRAME_SIZE // 4])
+    dlcs = bytes(mv[4::CAN_FRAME_SIZE])
+    data = bytearray(8 * n)
+    for j in range(8):
+        data[j::8] = mv[8+j::CAN_FRAME_SIZE]
+    return ids, dlcs, data
+
+# Join ids, dlcs and eight byte data slots into a buffer of SocketCAN
+# can_frame structs. flags are or'ed into every id.
+def join_can_frames(ids, dlcs, data, flags=CAN_EFF_FLAG):
+    n = len(ids)
+    out = bytearray(n * CAN_FRAME_SIZE)
+    mv = memoryview(out)
+    mv.cast('I')[0::CAN_FRAME_SIZE // 4] = array('I', [i | flags for i in ids])
+    mv[4::CAN_FRAME_SIZE] = bytes(dlcs)
+    data = memoryview(data).cast('B')
+    for j in range(8):
+        mv[8+j::CAN_FRAME_SIZE] = data[j::8]
+    return out
+
+# Column with value repeated n times, or the values of a sequence
+def _column(code, value, n):
+    if isinstance(value, int):
+        return array(code, [value]) * n
+    col = array(code, value)
+    if len(col) != n:
+        raise ValueError("Expected {0} values".format(n))
+    return col
+
+# Build a VscpEventBatch from CAN ids, data lengths and a data block with
+# eight bytes for each frame. ids may hold SocketCAN flags. The GUID of
+# each event is guid with the nickname of the sender as LSB. timestamp
+# and obid can be a value for all events or a sequence with one value for
+# each event. dt is a (year,month,day,hour,minute,second) tuple for all
+# events.
+def batch_from_can(ids, dlcs, data, guid=None, timestamp=0, obid=0, dt=(0,0,0,0,0,0)):
+    n = len(ids)
+    if len(dlcs) != n or len(data) < 8 * n:
+        raise ValueError("ids, dlcs and data do not match")
+    dlcs = bytes(dlcs)
+    if n and max(dlcs) > VSCP_LEVEL1_MAXDATA:
+        raise ValueError("Level I event data can be at most {0} bytes".format(VSCP_LEVEL1_MAXDATA))
+    batch = VscpEventBatch()
+    batch.head = array('H', [((i >> 21) & VSCP_HEADER_PRIORITY_MASK) |
+                                (VSCP_HEADER_HARD_CODED if i & VSCP_CAN_ID_HARD_CODED else 0)
+                                for i in ids])
+    batch.vscpclass = array('H', [(i >> 16) & 0x1FF for i in ids])
+    batch.vscptype = array('H', [(i >> 8) & 0xFF for i in ids])
+    batch.timestamp = _column('I', timestamp, n)
+    batch.obid = _column('I', obid, n)
+    batch.year = array('H', [dt[0]]) * n
+    for name, value in zip(("month", "day", "hour", "minute", "second"), dt[1:]):
+        setattr(batch, name, array('B', [value]) * n)
+    g = bytes(guid[:15]) if guid is not None else _NULL_GUID[:15]
+    guids = bytearray(g + b'\x00') * n
+    guids[15::16] = bytes([i & 0xFF for i in ids])
+    batch.guid = guids
+    batch.offsets = array('Q', [0])
+    batch.offsets.extend(accumulate(dlcs))    # accumulate(initial=) is 3.8+
+    mv = memoryview(data).cast('B')
+    if dlcs.count(8) == n:
+        batch.data = bytearray(mv[:8*n])
+    else:
+        batch.data = bytearray(b"".join([mv[k*8:k*8+d] for k, d in enumerate(dlcs)]))
+    return batch
+
+# Build a VscpEventBatch from a buffer of SocketCAN can_frame structs.
+# Standard frames, remote requests and error frames are skipped.
+def batch_from_can_frames(buf, guid=None, timestamp=0, obid=0, dt=(0,0,0,0,0,0)):
+    ids, dlcs, data = split_can_frames(buf)
+    bad = [k for k, i in enumerate(ids)
+            if (i & (CAN_EFF_FLAG | CAN_RTR_FLAG | CAN_ERR_FLAG)) != CAN_EFF_FLAG]
+    if bad:
+        keep = sorted(set(range(len(ids))) - set(bad))
+        ids = array('I', [ids[k] for k in keep])
+        dlcs = bytes([dlcs[k] for k in keep])
+        data = b"".join([data[k*8:k*8+8] for k in keep])
+        if not isinstance(timestamp, int):
+            timestamp = [timestamp[k] for k in keep]
+        if not isinstance(obid, int):
+            obid = [obid[k] for k in keep]
+    return batch_from_can(ids, dlcs, data, guid, timestamp, obid, dt)
+
+# CAN ids, data lengths and eight byte data slots for all events of a
+# VscpEventBatch. Raises ValueError if an event can not be sent on Level I.
+def can_from_batch(batch):
+    n = len(batch)
+    offsets = batch.offsets
+    vscpclass = batch.vscpclass
+    sizes = [offsets[k+1] - offsets[k] for k in range(n)]
+    if n and (max(vscpclass) >= _LEVEL1_OVER_LEVEL2 or max(sizes) > VSCP_LEVEL1_MAXDATA):
+        return _can_from_batch_slow(batch)
+    ids = array('I', [((h & VSCP_HEADER_PRIORITY_MASK) << 21) |
+                        (VSCP_CAN_ID_HARD_CODED if h & VSCP_HEADER_HARD_CODED else 0) |
+                        (c << 16) | (t << 8) | g
+                        for h, c, t, g in zip(batch.head, vscpclass, batch.vscptype,
+                                                batch.guid[15::16])])
+    dlcs = bytes(sizes)
+    if dlcs.count(8) == n:
+        data = bytearray(batch.data)
+    else:
+        src = memoryview(batch.data)
+        data = bytearray(8 * n)
+        for k in range(n):
+            o = offsets[k]
+            data[k*8:k*8+sizes[k]] = src[o:offsets[k+1]]
+    return ids, dlcs, data
+
+# Row by row conversion used when a batch holds events of class 512-1023
+def _can_from_batch_slow(batch):
+    ids = array('I')
+    dlcs = bytearray()
+    data = bytearray(8 * len(batch))
+    for k in range(len(batch)):
+        canid, d = can_from_event(batch.getEventEx(k))
+        ids.append(canid)
+        dlcs.append(len(d))
+        data[k*8:k*8+len(d)] = d
+    return ids, bytes(dlcs), data
+
+# All events of a VscpEventBatch as a buffer of SocketCAN can_frame structs
+def can_frames_from_batch(batch):
+    ids, dlcs, data = can_from_batch(batch)
+    return join_can_frames(ids, dlcs, data)
@@ -0,0 +1,221 @@
+# FILE: vscp_crc.py
+#
+# CRC8/CRC16/CRC32 calculations for VSCP frames and firmware images
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# The algorithms are the same as in the VSCP C code
+#
+#   CRC8  - Dallas/Maxim 1-wire CRC (VSCP_CRC8_POLYNOMIAL, shifted right)
+#   CRC16 - CRC-CCITT (VSCP_CRC16_POLYNOMIAL, start VSCP_CRC16_REMINDER)
+#   CRC32 - IEEE 802.3 (VSCP_CRC32_POLYNOMIAL reflected, start and final
+#           xor VSCP_CRC32_REMINDER)
+#
+# All functions accept any object supporting the buffer protocol.
+
+import struct
+import binascii
+from array import array
+
+from vscp import *
+
+try:
+    import zlib
+except ImportError:     # pragma: no cover
+    zlib = None
+
+_PACKET0_HEAD = struct.Struct(">H")
+_PACKET0_SIZE = struct.Struct(">H")
+
+# Reverse the bits in a value of width bits
+def _reflect(value, width):
+    r = 0
+    for i in range(width):
+        if value & (1 << i):
+            r |= 1 << (width - 1 - i)
+    return r
+
+def _make_crc8_table():
+    table = bytearray(256)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            if crc & 1:
+                crc = ((crc ^ VSCP_CRC8_POLYNOMIAL) >> 1) | 0x80
+            else:
+                crc >>= 1
+        table[i] = crc
+    return bytes(table)
+
+def _make_crc32_tables():
+    poly = _reflect(VSCP_CRC32_POLYNOMIAL, 32)
+    t0 = array('L', [0] * 256)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ poly if crc & 1 else crc >> 1
+        t0[i] = crc
+    tables = [t0]
+    for _ in range(7):
+        prev = tables[-1]
+        tables.append(array('L', [(prev[i] >> 8) ^ t0[prev[i] & 0xFF] for i in range(256)]))
+    return tables
+
+CRC8_TABLE = _make_crc8_table()
+CRC32_TABLES = _make_crc32_tables()
+
+_U32x2 = struct.Struct("<II")
+
+# CRC8 of data. Pass the previous result as crc to continue a calculation.
+def crc8(data, crc=VSCP_CRC8_REMINDER):
+    table = CRC8_TABLE
+    for b in memoryview(data).cast('B'):
+        crc = table[crc ^ b]
+    return crc
+
+# CRC16 of data. Pass the previous result as crc to continue a calculation.
+def crc16(data, crc=VSCP_CRC16_REMINDER):
+    return binascii.crc_hqx(data, crc)
+
+# Table driven slice-by-8 CRC32, used when zlib is not available
+def crc32_slice8(data, crc=0):
+    t0, t1, t2, t3, t4, t5, t6, t7 = CRC32_TABLES
+    mv = memoryview(data).cast('B')
+    n = len(mv)
+    end = n - (n & 7)
+    crc ^= VSCP_CRC32_REMINDER
+    for lo, hi in _U32x2.iter_unpack(mv[:end]):
+        lo ^= crc
+        crc = (t7[lo & 0xFF] ^ t6[(lo >> 8) & 0xFF] ^
+                t5[(lo >> 16) & 0xFF] ^ t4[lo >> 24] ^
+                t3[hi & 0xFF] ^ t2[(hi >> 8) & 0xFF] ^
+                t1[(hi >> 16) & 0xFF] ^ t0[hi >> 24])
+    for b in mv[end:]:
+        crc = t0[(crc ^ b) & 0xFF] ^ (crc >> 8)
+    return crc ^ VSCP_CRC32_REMINDER
+
+# CRC32 of data. Pass the previous result as crc to continue a calculation.
+if zlib is not None:
+    def crc32(data, crc=0):
+        return zlib.crc32(data, crc)
+else:                   # pragma: no cover
+    crc32 = crc32_slice8
+
+# Checksum many buffers in one call. Returns an array with one CRC per buffer.
+def crc8_many(buffers, crc=VSCP_CRC8_REMINDER):
+    return array('B', [crc8(b, crc) for b in buffers])
+
+def crc16_many(buffers, crc=VSCP_CRC16_REMINDER):
+    f = binascii.crc_hqx
+    return array('H', [f(b, crc) for b in buffers])
+
+def crc32_many(buffers, crc=0):
+    f = crc32
+    return array('L', [f(b, crc) for b in buffers])
+
+
+################################################################################
+# Incremental CRC calculation
+#
+#   c = Crc16()
+#   c.update(block1)
+#   c.update(block2)
+#   print(c.value)
+#
+
+class _CrcBase:
+
+    __slots__ = ["value"]
+
+    def __init__(self, data=None):
+        self.reset()
+        if data is not None:
+            self.update(data)
+
+    def reset(self):
+        self.value = self._init
+
+    def update(self, data):
+        self.value = self._func(data, self.value)
+        return self
+
+    def copy(self):
+        c = self.__class__()
+        c.value = self.value
+        return c
+
+class Crc8(_CrcBase):
+    __slots__ = []
+    _init = VSCP_CRC8_REMINDER
+    _func = staticmethod(crc8)
+
+class Crc16(_CrcBase):
+    __slots__ = []
+    _init = VSCP_CRC16_REMINDER
+    _func = staticmethod(crc16)
+
+class Crc32(_CrcBase):
+    __slots__ = []
+    _init = 0
+    _func = staticmethod(crc32)
+
+
+################################################################################
+# Event frame CRC
+#
+# The CRC of a packet type 0 frame covers everything from head up to and
+# including the data, the packet type byte is not included. If the
+# VSCP_HEADER_NO_CRC bit is set in head and the frame CRC is
+# VSCP_NOCRC_CALC_DUMMY_CRC the CRC is not checked.
+#
+
+# Calculated CRC for the packet type 0 frame at offset in buf
+def packet0_crc(buf, offset=0):
+    mv = memoryview(buf)
+    sizedata, = _PACKET0_SIZE.unpack_from(mv, offset + VSCP_MULTICAST_PACKET0_POS_VSCP_SIZE)
+    end = offset + VSCP_MULTICAST_PACKET0_POS_VSCP_DATA + sizedata
+    return binascii.crc_hqx(mv[offset + 1:end], VSCP_CRC16_REMINDER)
+
+# True if the CRC of the packet type 0 frame at offset in buf is valid
+# or should be skipped. False for a buffer too short to hold a frame.
+def check_packet0(buf, offset=0):
+    mv = memoryview(buf)
+    # Shorter than a frame without data (vscp_packet.packet0_size(0))
+    if offset + VSCP_MULTICAST_PACKET0_POS_VSCP_DATA + 2 > len(mv):
+        return False
+    head, = _PACKET0_HEAD.unpack_from(mv, offset + VSCP_MULTICAST_PACKET0_POS_HEAD)
+    sizedata, = _PACKET0_SIZE.unpack_from(mv, offset + VSCP_MULTICAST_PACKET0_POS_VSCP_SIZE)
+    end = offset + VSCP_MULTICAST_PACKET0_POS_VSCP_DATA + sizedata
+    if end + 2 > len(mv):
+        return False
+    if head & VSCP_HEADER_NO_CRC:
+        if _PACKET0_SIZE.unpack_from(mv, end)[0] == VSCP_NOCRC_CALC_DUMMY_CRC:
+            return True
+    # CRC over the frame including its CRC is zero when the frame is valid
+    return 0 == binascii.crc_hqx(mv[offset + 1:end + 2], VSCP_CRC16_REMINDER)
+
+# Check many packet type 0 frames in one call. Returns a list of booleans.
+def check_packet0_many(frames):
+    return [check_packet0(f) for f in frames]
@@ -0,0 +1,227 @@
+# FILE: vscp_dm.py
+#
+# Level I decision matrix decoding and evaluation
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# A Level I decision matrix is a table of eight byte rows
+# (VSCP_LEVEL1_DM_OFFSET_*) in the registers of a node. For each event the
+# node receives, every enabled row is tested in order and the action of
+# each row that matches is run. A row matches when
+#
+#   ((class_filter ^ class) & class_mask) == 0 and
+#   ((type_filter ^ type) & type_mask) == 0
+#
+# and, if flagged, the event comes from the node with nickname oaddr, has
+# the hard coded bit set and is for the zone/sub-zone of the node (data
+# byte 1 and 2, 255 matches all zones). Class mask and filter are nine
+# bits, the ninth bit is kept in the flags byte.
+#
+# DecisionMatrix compiles the enabled rows into match plans cached per
+# class/type so that an event costs one dict lookup plus the flag tests of
+# the rows that matched on class/type.
+
+from collections import namedtuple
+
+from vscp import *
+
+# Decision matrix row flags
+VSCP_LEVEL1_DM_FLAG_ENABLED                 =   0x80
+VSCP_LEVEL1_DM_FLAG_CHECK_OADDR             =   0x40
+VSCP_LEVEL1_DM_FLAG_HARDCODED               =   0x20
+VSCP_LEVEL1_DM_FLAG_CHECK_ZONE              =   0x10
+VSCP_LEVEL1_DM_FLAG_CHECK_SUBZONE           =   0x08
+VSCP_LEVEL1_DM_FLAG_CLASS_MASK              =   0x02    # Bit 8 of class mask
+VSCP_LEVEL1_DM_FLAG_CLASS_FILTER            =   0x01    # Bit 8 of class filter
+
+# Zone/sub-zone in an event that matches all zones
+VSCP_ALL_ZONES = 255
+
+# Number of (class,type) match plans kept before the plan cache is flushed
+PLAN_CACHE_SIZE = 8192
+
+_CHECKS = VSCP_LEVEL1_DM_FLAG_CHECK_OADDR | VSCP_LEVEL1_DM_FLAG_HARDCODED | \
+            VSCP_LEVEL1_DM_FLAG_CHECK_ZONE | VSCP_LEVEL1_DM_FLAG_CHECK_SUBZONE
+
+# A decoded row. class_mask and class_filter are nine bit values.
+DMRow = namedtuple("DMRow", "index oaddr flags class_mask class_filter "
+                            "type_mask type_filter action param")
+
+# An action triggered by an event
+DMAction = namedtuple("DMAction", "row action param")
+
+# Decode count rows (all complete rows if None) from a register dump
+def parse_dm(buf, offset=0, count=None):
+    buf = bytes(buf)
+    if count is None:
+        count = (len(buf) - offset) // VSCP_LEVEL1_DM_ROW_SIZE
+    rows = []
+    for i in range(count):
+        r = buf[offset + i * VSCP_LEVEL1_DM_ROW_SIZE:offset + (i + 1) * VSCP_LEVEL1_DM_ROW_SIZE]
+        if len(r) < VSCP_LEVEL1_DM_ROW_SIZE:
+            raise ValueError("Incomplete decision matrix row {0}".format(i))
+        flags = r[VSCP_LEVEL1_DM_OFFSET_FLAGS]
+        rows.append(DMRow(i, r[VSCP_LEVEL1_DM_OFFSET_OADDR], flags,
+                            ((flags & VSCP_LEVEL1_DM_FLAG_CLASS_MASK) << 7) |
+                                r[VSCP_LEVEL1_DM_OFFSET_CLASS_MASK],
+                            ((flags & VSCP_LEVEL1_DM_FLAG_CLASS_FILTER) << 8) |
+                                r[VSCP_LEVEL1_DM_OFFSET_CLASS_FILTER],
+                            r[VSCP_LEVEL1_DM_OFFSET_TYPE_MASK],
+                            r[VSCP_LEVEL1_DM_OFFSET_TYPE_FILTER],
+                            r[VSCP_LEVEL1_DM_OFFSET_ACTION],
+                            r[VSCP_LEVEL1_DM_OFFSET_ACTION_PARAM]))
+    return rows
+
+# Encode rows into register values
+def make_dm(rows):
+    out = bytearray()
+    for r in rows:
+        flags = r.flags & ~(VSCP_LEVEL1_DM_FLAG_CLASS_MASK | VSCP_LEVEL1_DM_FLAG_CLASS_FILTER)
+        flags |= ((r.class_mask >> 7) & VSCP_LEVEL1_DM_FLAG_CLASS_MASK) | \
+                    ((r.class_filter >> 8) & VSCP_LEVEL1_DM_FLAG_CLASS_FILTER)
+        out += bytes((r.oaddr, flags, r.class_mask & 0xFF, r.class_filter & 0xFF,
+                        r.type_mask, r.type_filter, r.action, r.param))
+    return bytes(out)
+
+# Make a row. class_mask is nine bits. Bit 8 of class mask and filter is
+# set in flags.
+def make_row(vscpclass, vscptype, action, param=0, class_mask=0x1FF, type_mask=0xFF,
+                oaddr=0, flags=VSCP_LEVEL1_DM_FLAG_ENABLED, index=0):
+    vscpclass &= class_mask
+    flags = (flags & ~(VSCP_LEVEL1_DM_FLAG_CLASS_MASK | VSCP_LEVEL1_DM_FLAG_CLASS_FILTER)) | \
+                ((class_mask >> 7) & VSCP_LEVEL1_DM_FLAG_CLASS_MASK) | \
+                ((vscpclass >> 8) & VSCP_LEVEL1_DM_FLAG_CLASS_FILTER)
+    return DMRow(index, oaddr, flags, class_mask, vscpclass,
+                    type_mask, vscptype & type_mask, action, param)
+
+
+################################################################################
+# A compiled decision matrix
+#
+#   dm = DecisionMatrix(parse_dm(registers), zone=1, subzone=2)
+#   for row, action, param in dm.evaluate(ex):
+#       ...
+#
+
+class DecisionMatrix:
+
+    def __init__(self, rows, zone=0, subzone=0):
+        self.zone = zone
+        self.subzone = subzone
+        self.rows = [r for r in rows if r.flags & VSCP_LEVEL1_DM_FLAG_ENABLED]
+        self._exact = {}
+        self._scan = []
+        for r in self.rows:
+            if r.class_mask == 0x1FF and r.type_mask == 0xFF:
+                self._exact.setdefault((r.class_filter << 8) | r.type_filter, []).append(r)
+            else:
+                self._scan.append(r)
+        self._plans = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Build the match plan for a class/type pair. A plan holds the rows
+    # in matrix order with the flag tests still to be done.
+    def _plan(self, vscpclass, vscptype):
+        rows = self._exact.get((vscpclass << 8) | vscptype, []) + \
+                [r for r in self._scan
+                    if not ((r.class_filter ^ vscpclass) & r.class_mask) and
+                        not ((r.type_filter ^ vscptype) & r.type_mask)]
+        rows.sort(key=lambda r: r.index)
+        plan = tuple((DMAction(r.index, r.action, r.param), r.flags & _CHECKS, r.oaddr)
+                        for r in rows)
+        if len(self._plans) >= PLAN_CACHE_SIZE:
+            self._plans.clear()
+        self._plans[(vscpclass << 8) | vscptype] = plan
+        return plan
+
+    def _run(self, plan, head, oaddr, data):
+        out = []
+        for act, checks, rowoaddr in plan:
+            if checks:
+                if checks & VSCP_LEVEL1_DM_FLAG_CHECK_OADDR and oaddr != rowoaddr:
+                    continue
+                if checks & VSCP_LEVEL1_DM_FLAG_HARDCODED and not head & VSCP_HEADER_HARD_CODED:
+                    continue
+                if checks & VSCP_LEVEL1_DM_FLAG_CHECK_ZONE:
+                    if len(data) < 2 or data[1] not in (VSCP_ALL_ZONES, self.zone):
+                        continue
+                if checks & VSCP_LEVEL1_DM_FLAG_CHECK_SUBZONE:
+                    if len(data) < 3 or data[2] not in (VSCP_ALL_ZONES, self.subzone):
+                        continue
+            out.append(act)
+        return out
+
+    # Actions triggered by an event (anything with head, vscpclass,
+    # vscptype, guid, data and sizedata) as a list of DMAction in matrix
+    # order. The nickname of the sender is the GUID LSB. Events above
+    # Level I classes never match.
+    def evaluate(self, ev):
+        vscpclass = ev.vscpclass
+        if vscpclass > 0x1FF:
+            return []
+        plan = self._plans.get((vscpclass << 8) | ev.vscptype)
+        if plan is None:
+            plan = self._plan(vscpclass, ev.vscptype)
+        if not plan:
+            return []
+        if all(not checks for _, checks, _ in plan):
+            return [act for act, _, _ in plan]
+        return self._run(plan, ev.head, ev.guid[15], bytes(ev.data[:min(ev.sizedata, 3)]))
+
+    # Evaluate all events of a VscpEventBatch. Returns a list with the list
+    # of triggered actions for each event.
+    def evaluateBatch(self, batch):
+        plans = self._plans
+        nicknames = batch.guid[15::16]
+        offsets = batch.offsets
+        data = batch.data
+        out = []
+        row = 0
+        for head, vscpclass, vscptype in zip(batch.head, batch.vscpclass, batch.vscptype):
+            if vscpclass > 0x1FF:
+                out.append([])
+                row += 1
+                continue
+            plan = plans.get((vscpclass << 8) | vscptype)
+            if plan is None:
+                plan = self._plan(vscpclass, vscptype)
+            if not plan:
+                out.append([])
+            else:
+                o = offsets[row]
+                out.append(self._run(plan, head, nicknames[row],
+                                        data[o:min(o + 3, offsets[row + 1])]))
+            row += 1
+        return out
+
+    # Number of times each row triggered for the events of a batch
+    def countBatch(self, batch):
+        counts = {}
+        for acts in self.evaluateBatch(batch):
+            for act in acts:
+                counts[act.row] = counts.get(act.row, 0) + 1
+        return counts
@@ -0,0 +1,183 @@
+# FILE: vscp_filter.py
+#
+# Indexed matching of events against many VSCP event filters
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from collections import namedtuple
+
+from vscp import vscpEventFilter
+
+_MASK16 = 0xFFFF
+
+# Number of (class,type) match plans kept before the plan cache is flushed
+PLAN_CACHE_SIZE = 8192
+
+# A compiled filter. Filter values are stored pre-masked and the GUID
+# filter/mask as 128-bit integers.
+_Compiled = namedtuple("_Compiled",
+                "sid mprio fprio mclass fclass mtype ftype mguid fguid")
+
+def _compile(sid, flt):
+    mguid = int.from_bytes(bytes(flt.mask_guid), "big")
+    return _Compiled(sid,
+                     flt.mask_priority, flt.filter_priority & flt.mask_priority,
+                     flt.mask_class, flt.filter_class & flt.mask_class,
+                     flt.mask_type, flt.filter_type & flt.mask_type,
+                     mguid, int.from_bytes(bytes(flt.filter_guid), "big") & mguid)
+
+def _passes(c, prio, gint):
+    return ((prio & c.mprio) == c.fprio) and ((gint & c.mguid) == c.fguid)
+
+
+################################################################################
+# A set of subscriber filters compiled for fast matching
+#
+# Filters with exact class and type masks are indexed on (class,type),
+# filters with an exact class mask on class, the rest are scanned. For each
+# (class,type) seen a match plan is built and cached. The plan holds the
+# subscribers that match on class/type alone and the ones that also need
+# a priority or GUID test, so most events are matched with one dict lookup.
+#
+#   fs = FilterSet()
+#   fs.add("logger", flt)
+#   for sid in fs.match(ex):
+#       ...
+#
+
+class FilterSet:
+
+    def __init__(self):
+        self._filters = {}
+        self._exact = {}
+        self._byclass = {}
+        self._scan = []
+        self._plans = {}
+
+    def __len__(self):
+        return len(self._filters)
+
+    def __contains__(self, sid):
+        return sid in self._filters
+
+    # Add or replace the filter for subscriber sid
+    def add(self, sid, flt):
+        if not isinstance(flt, vscpEventFilter):
+            raise TypeError("Filter must be a vscpEventFilter")
+        if sid in self._filters:
+            self.remove(sid)
+        c = _compile(sid, flt)
+        self._filters[sid] = c
+        if c.mclass == _MASK16 and c.mtype == _MASK16:
+            self._exact.setdefault((c.fclass << 16) | c.ftype, []).append(c)
+        elif c.mclass == _MASK16:
+            self._byclass.setdefault(c.fclass, []).append(c)
+        else:
+            self._scan.append(c)
+        self._plans.clear()
+
+    # Remove the filter for subscriber sid
+    def remove(self, sid):
+        c = self._filters.pop(sid)
+        if c.mclass == _MASK16 and c.mtype == _MASK16:
+            key = (c.fclass << 16) | c.ftype
+            self._exact[key].remove(c)
+            if not self._exact[key]:
+                del self._exact[key]
+        elif c.mclass == _MASK16:
+            self._byclass[c.fclass].remove(c)
+            if not self._byclass[c.fclass]:
+                del self._byclass[c.fclass]
+        else:
+            self._scan.remove(c)
+        self._plans.clear()
+
+    def clear(self):
+        self.__init__()
+
+    # Build the match plan for a class/type pair
+    def _plan(self, vscpclass, vscptype):
+        ids = []
+        checks = []
+        cands = (self._exact.get((vscpclass << 16) | vscptype, []) +
+                    self._byclass.get(vscpclass, []) +
+                    [c for c in self._scan
+                        if (vscpclass & c.mclass) == c.fclass and
+                            (vscptype & c.mtype) == c.ftype])
+        for c in cands:
+            if (vscptype & c.mtype) != c.ftype:
+                continue
+            if c.mprio or c.mguid:
+                checks.append(c)
+            else:
+                ids.append(c.sid)
+        plan = (ids, tuple(checks))
+        if len(self._plans) >= PLAN_CACHE_SIZE:
+            self._plans.clear()
+        self._plans[(vscpclass << 16) | vscptype] = plan
+        return plan
+
+    # Ids of all subscribers whose filter lets the event through. The
+    # event can be anything with head, vscpclass, vscptype and guid.
+    def match(self, ev):
+        plan = self._plans.get((ev.vscpclass << 16) | ev.vscptype)
+        if plan is None:
+            plan = self._plan(ev.vscpclass, ev.vscptype)
+        ids, checks = plan
+        if not checks:
+            return list(ids)
+        prio = (ev.head >> 5) & 7
+        gint = int.from_bytes(bytes(ev.guid), "big")
+        return ids + [c.sid for c in checks if _passes(c, prio, gint)]
+
+    # Match all events of a VscpEventBatch. Returns a list with the list
+    # of matching subscriber ids for each row.
+    def matchBatch(self, batch):
+        plans = self._plans
+        guids = batch.guid
+        out = []
+        row = 0
+        for head, vscpclass, vscptype in zip(batch.head, batch.vscpclass, batch.vscptype):
+            plan = plans.get((vscpclass << 16) | vscptype)
+            if plan is None:
+                plan = self._plan(vscpclass, vscptype)
+            ids, checks = plan
+            if checks:
+                prio = (head >> 5) & 7
+                gint = int.from_bytes(guids[row*16:row*16+16], "big")
+                out.append(ids + [c.sid for c in checks if _passes(c, prio, gint)])
+            else:
+                out.append(list(ids))
+            row += 1
+        return out
+
+    # Match all events of a VscpEventBatch. Returns a dict with the list of
+    # matching rows for each subscriber that matched at least one row.
+    def matchBatchBySubscriber(self, batch):
+        rows = {}
+        for row, ids in enumerate(self.matchBatch(batch)):
+            for sid in ids:
+                rows.setdefault(sid, []).append(row)
+        return rows
@@ -0,0 +1,494 @@
+# FILE: vscp_log.py
+#
+# Append-only segmented binary event log with indexed memory mapped replay
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# A log is a directory of segment files named 00000000.vlog, 00000001.vlog,
+# ... Each segment starts with a SEGMENT_HEADER followed by records
+#
+#   time (8 bytes, microseconds since epoch), obid (4 bytes), packet type 0 frame
+#
+# all big endian. When a segment reaches its maximum size it is sealed and
+# an index file (.vidx) is written next to it. The index holds the record
+# offsets sorted on time and, for each class/type pair, the positions of
+# its records in that order. An index is rebuilt by scanning the segment if
+# it is missing or was written on a machine with another byte order, and
+# the open segment is always scanned. A partial record left at the end of
+# the open segment by a crash is cut off when the log is opened for writing.
+#
+# Segments are read through mmap. Events returned by queries are
+# Packet0View objects whose data is a memoryview into the mapped file, so
+# nothing is copied until asked for.
+
+import os
+import sys
+import time
+import heapq
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from vscp import *
+from vscp_packet import decode_packet0, encode_packet0, encode_packet0_row, packet0_size
+from vscp_batch import VscpEventBatch
+
+# Default maximum size of a segment before a new one is started
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+SEGMENT_MAGIC = b'VSCPLOG\x00'
+INDEX_MAGIC = b'VSCPIDX\x00'
+FORMAT_VERSION = 1
+
+SEGMENT_HEADER = struct.Struct(">8sH6x")
+RECORD_HEADER = struct.Struct(">qI")
+
+# magic, version, byte order, record count, number of class/type keys
+_INDEX_HEADER = struct.Struct("=8sHBxQQ")
+_BYTE_ORDER = 1 if sys.byteorder == "little" else 2
+
+_SIZE_POS = RECORD_HEADER.size + VSCP_MULTICAST_PACKET0_POS_VSCP_SIZE
+_CLASS_POS = RECORD_HEADER.size + VSCP_MULTICAST_PACKET0_POS_VSCP_CLASS
+_SIZE = struct.Struct(">H")
+_CLASS_TYPE = struct.Struct(">HH")
+_SUFFIX = ".vlog"
+_INDEX_SUFFIX = ".vidx"
+
+# A record returned from a query. time is in seconds since epoch and event
+# is a Packet0View.
+LogRecord = namedtuple("LogRecord", "time obid event")
+
+def _record_size(sizedata):
+    return RECORD_HEADER.size + packet0_size(sizedata)
+
+def _usec(t):
+    if t is None:
+        return None
+    if hasattr(t, "timestamp"):     # datetime
+        t = t.timestamp()
+    return int(round(t * 1000000))
+
+def _segment_path(path, n, suffix=_SUFFIX):
+    return os.path.join(path, "{0:08d}{1}".format(n, suffix))
+
+def _segments(path):
+    out = []
+    for name in os.listdir(path):
+        if name.endswith(_SUFFIX) and name[:-len(_SUFFIX)].isdigit():
+            out.append(int(name[:-len(_SUFFIX)]))
+    return sorted(out)
+
+
+################################################################################
+# Index of one segment
+#
+# times and offsets are parallel arrays sorted on time. keys maps
+# (class << 16 | type) to an array of positions into times/offsets.
+#
+
+class _SegmentIndex:
+
+    def __init__(self):
+        self.times = array('q')
+        self.offsets = array('Q')
+        self.keys = {}
+
+    def __len__(self):
+        return len(self.times)
+
+    # Index from parallel time/offset/key columns in record order
+    @classmethod
+    def build(cls, times, offsets, keys):
+        idx = cls()
+        order = range(len(times))
+        if any(times[i] > times[i+1] for i in range(len(times) - 1)):
+            order = sorted(order, key=times.__getitem__)
+        idx.times = array('q', [times[i] for i in order])
+        idx.offsets = array('Q', [offsets[i] for i in order])
+        lists = {}
+        for pos, i in enumerate(order):
+            lists.setdefault(keys[i], []).append(pos)
+        idx.keys = dict((k, array('I', v)) for k, v in lists.items())
+        return idx
+
+    # Index by scanning a segment. Returns the index and the end of the
+    # last complete record.
+    @classmethod
+    def scan(cls, buf):
+        times = array('q')
+        offsets = array('Q')
+        keys = array('I')
+        end = len(buf)
+        pos = SEGMENT_HEADER.size
+        while pos + _record_size(0) <= end:
+            sizedata, = _SIZE.unpack_from(buf, pos + _SIZE_POS)
+            size = _record_size(sizedata)
+            if sizedata > VSCP_LEVEL2_MAXDATA or pos + size > end:
+                break
+            t, _ = RECORD_HEADER.unpack_from(buf, pos)
+            c, ty = _CLASS_TYPE.unpack_from(buf, pos + _CLASS_POS)
+            times.append(t)
+            offsets.append(pos)
+            keys.append((c << 16) | ty)
+            pos += size
+        return cls.build(times, offsets, keys), pos
+
+    def save(self, filename):
+        tmp = filename + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_INDEX_HEADER.pack(INDEX_MAGIC, FORMAT_VERSION, _BYTE_ORDER,
+                                        len(self.times), len(self.keys)))
+            self.times.tofile(f)
+            self.offsets.tofile(f)
+            for key in sorted(self.keys):
+                pos = self.keys[key]
+                f.write(struct.pack("=II", key, len(pos)))
+                pos.tofile(f)
+        os.replace(tmp, filename)
+
+    # Load an index file. Returns None if it can not be used.
+    @classmethod
+    def load(cls, filename):
+        try:
+            with open(filename, "rb") as f:
+                raw = f.read()
+        except OSError:
+            return None
+        if len(raw) < _INDEX_HEADER.size:
+            return None
+        magic, version, order, n, nkeys = _INDEX_HEADER.unpack_from(raw)
+        if magic != INDEX_MAGIC or version != FORMAT_VERSION or order != _BYTE_ORDER:
+            return None
+        idx = cls()
+        try:
+            pos = _INDEX_HEADER.size
+            idx.times.frombytes(raw[pos:pos + 8*n])
+            pos += 8*n
+            idx.offsets.frombytes(raw[pos:pos + 8*n])
+            pos += 8*n
+            for _ in range(nkeys):
+                key, cnt = struct.unpack_from("=II", raw, pos)
+                pos += 8
+                a = array('I')
+                a.frombytes(raw[pos:pos + 4*cnt])
+                pos += 4*cnt
+                idx.keys[key] = a
+        except (ValueError, struct.error):
+            return None
+        if len(idx.times) != n or len(idx.offsets) != n:
+            return None
+        return idx
+
+    # Positions of records in [start, end) matching class/type
+    def positions(self, vscpclass=None, vscptype=None, start=None, end=None):
+        times = self.times
+        lo = 0 if start is None else bisect_left(times, start)
+        hi = len(times) if end is None else bisect_left(times, end)
+        if lo >= hi:
+            return []
+        if vscpclass is None and vscptype is None:
+            return range(lo, hi)
+        if vscpclass is not None and vscptype is not None:
+            lists = [self.keys.get((vscpclass << 16) | vscptype)]
+        elif vscpclass is not None:
+            lists = [v for k, v in self.keys.items() if k >> 16 == vscpclass]
+        else:
+            lists = [v for k, v in self.keys.items() if k & 0xFFFF == vscptype]
+        parts = []
+        for pos in lists:
+            if pos:
+                parts.append(pos[bisect_left(pos, lo):bisect_left(pos, hi)])
+        if 1 == len(parts):
+            return parts[0]
+        return list(heapq.merge(*parts))
+
+
+################################################################################
+# Writer for an event log directory
+#
+#   with EventLogWriter("/var/log/vscp") as log:
+#       log.append(ex)
+#       log.appendBatch(batch)
+#
+# The time of a record is the time given to append() or the time of the
+# call. Records are buffered by the file object, call flush() to make them
+# visible to readers.
+#
+
+class EventLogWriter:
+
+    def __init__(self, path, segment_size=DEFAULT_SEGMENT_SIZE):
+        self.path = path
+        self.segment_size = segment_size
+        self._file = None
+        os.makedirs(path, exist_ok=True)
+        segs = _segments(path)
+        if segs and not os.path.exists(_segment_path(path, segs[-1], _INDEX_SUFFIX)):
+            self._reopen(segs[-1])
+        else:
+            self._start(segs[-1] + 1 if segs else 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _start(self, n):
+        self._segno = n
+        self._file = open(_segment_path(self.path, n), "wb")
+        self._file.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, FORMAT_VERSION))
+        self._size = SEGMENT_HEADER.size
+        self._times = array('q')
+        self._offsets = array('Q')
+        self._keys = array('I')
+
+    # Continue the open segment of a previous writer
+    def _reopen(self, n):
+        filename = _segment_path(self.path, n)
+        with open(filename, "rb") as f:
+            buf = f.read()
+        if len(buf) < SEGMENT_HEADER.size or \
+                SEGMENT_HEADER.unpack_from(buf)[0] != SEGMENT_MAGIC:
+            raise ValueError("Not a VSCP event log segment: " + filename)
+        idx, end = _SegmentIndex.scan(buf)
+        self._segno = n
+        self._file = open(filename, "r+b")
+        self._file.truncate(end)
+        self._file.seek(end)
+        self._size = end
+        # Kept in time order, which is fine for building the index later
+        self._times = idx.times
+        self._offsets = idx.offsets
+        self._keys = array('I', [0]) * len(idx)
+        for key, pos in idx.keys.items():
+            for p in pos:
+                self._keys[p] = key
+
+    # Seal the current segment and start a new one
+    def rotate(self):
+        self._file.close()
+        _SegmentIndex.build(self._times, self._offsets, self._keys).save(
+            _segment_path(self.path, self._segno, _INDEX_SUFFIX))
+        self._start(self._segno + 1)
+
+    def _record(self, t, vscpclass, vscptype, size):
+        if self._size + size > self.segment_size and len(self._times):
+            self.rotate()
+        self._times.append(t)
+        self._offsets.append(self._size)
+        self._keys.append((vscpclass << 16) | vscptype)
+        self._size += size
+
+    # Add an event (vscpEventEx or Packet0View). t is the time in seconds
+    # since epoch (or a datetime), default now. obid defaults to the obid
+    # of the event.
+    def append(self, ev, t=None, obid=None):
+        if obid is None:
+            obid = ev.obid
+        t = _usec(time.time() if t is None else t)
+        size = _record_size(ev.sizedata)
+        buf = bytearray(size)
+        RECORD_HEADER.pack_into(buf, 0, t, obid)
+        encode_packet0(ev, buf, RECORD_HEADER.size)
+        self._record(t, ev.vscpclass, ev.vscptype, size)
+        self._file.write(buf)
+
+    # Add all events of a VscpEventBatch. times is one time for all events
+    # or a sequence with a time for each event, default now.
+    def appendBatch(self, batch, times=None):
+        n = len(batch)
+        if times is None or isinstance(times, (int, float)) or hasattr(times, "timestamp"):
+            t = _usec(time.time() if times is None else times)
+            times = None
+        offsets = batch.offsets
+        buf = bytearray(_record_size(0) * n + offsets[n])
+        pos = 0
+        for i in range(n):
+            if times is not None:
+                t = _usec(times[i])
+            size = _record_size(offsets[i+1] - offsets[i])
+            if self._size + size > self.segment_size and len(self._times):
+                self._file.write(memoryview(buf)[:pos])
+                buf = buf[pos:]
+                pos = 0
+            RECORD_HEADER.pack_into(buf, pos, t, batch.obid[i])
+            encode_packet0_row(batch, i, buf, pos + RECORD_HEADER.size)
+            self._record(t, batch.vscpclass[i], batch.vscptype[i], size)
+            pos += size
+        self._file.write(memoryview(buf)[:pos])
+
+    def flush(self):
+        self._file.flush()
+
+    # Close the log. The open segment is left without index and is
+    # continued by the next writer.
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+################################################################################
+# A memory mapped segment
+#
+
+class _Segment:
+
+    def __init__(self, path, n):
+        self.number = n
+        self.sealed = os.path.exists(_segment_path(path, n, _INDEX_SUFFIX))
+        self._file = open(_segment_path(path, n), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < SEGMENT_HEADER.size:
+            self.mm = None
+            self.view = memoryview(b'')
+            self.index = _SegmentIndex()
+            return
+        self.mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mm)
+        if SEGMENT_HEADER.unpack_from(self.view)[0] != SEGMENT_MAGIC:
+            self.close()
+            raise ValueError("Not a VSCP event log segment: " + self._file.name)
+        idx = None
+        if self.sealed:
+            idx = _SegmentIndex.load(_segment_path(path, n, _INDEX_SUFFIX))
+        if idx is None:
+            idx, _ = _SegmentIndex.scan(self.view)
+        self.index = idx
+
+    # Record at position p of the index
+    def record(self, p, verify):
+        off = self.index.offsets[p]
+        t, obid = RECORD_HEADER.unpack_from(self.view, off)
+        return LogRecord(t / 1000000.0, obid,
+                            decode_packet0(self.view, off + RECORD_HEADER.size, verify))
+
+    def close(self):
+        self.view.release()
+        if self.mm is not None:
+            try:
+                self.mm.close()
+            except BufferError:
+                pass        # Events still refer to it. Closed when they are gone.
+        self._file.close()
+
+
+################################################################################
+# Reader for an event log directory
+#
+# The reader sees the log as it was when it was opened (or last
+# refreshed). Queries return LogRecord tuples in time order within each
+# segment, and segments in the order they were written.
+#
+#   log = EventLogReader("/var/log/vscp")
+#   for rec in log.query(vscpclass=10, start=t1, end=t2):
+#       print(rec.time, rec.event.vscptype, bytes(rec.event.data))
+#
+
+class EventLogReader:
+
+    def __init__(self, path, verify=False):
+        self.path = path
+        self.verify = verify
+        self._segments = []
+        self.refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Map segments written since the log was opened. Segments that were not
+    # sealed are mapped again as they may have grown.
+    def refresh(self):
+        known = dict((s.number, s) for s in self._segments)
+        segs = []
+        for n in _segments(self.path):
+            s = known.pop(n, None)
+            if s is not None and not s.sealed:
+                s.close()
+                s = None
+            segs.append(s if s is not None else _Segment(self.path, n))
+        for s in known.values():
+            s.close()
+        self._segments = segs
+
+    def __len__(self):
+        return sum(len(s.index) for s in self._segments)
+
+    def __iter__(self):
+        return self.query()
+
+    # Time of first and last record in seconds (None, None) if empty
+    def getTimeRange(self):
+        first = [s.index.times[0] for s in self._segments if len(s.index)]
+        last = [s.index.times[-1] for s in self._segments if len(s.index)]
+        if not first:
+            return None, None
+        return min(first) / 1000000.0, max(last) / 1000000.0
+
+    # Records with class and/or type with start <= time < end. Times are
+    # seconds since epoch or datetime objects.
+    def query(self, vscpclass=None, vscptype=None, start=None, end=None):
+        start = _usec(start)
+        end = _usec(end)
+        verify = self.verify
+        for seg in self._segments:
+            times = seg.index.times
+            if not times:
+                continue
+            if (start is not None and times[-1] < start) or \
+                    (end is not None and times[0] >= end):
+                continue
+            for p in seg.index.positions(vscpclass, vscptype, start, end):
+                yield seg.record(p, verify)
+
+    # Number of matching records without decoding them
+    def count(self, vscpclass=None, vscptype=None, start=None, end=None):
+        start = _usec(start)
+        end = _usec(end)
+        return sum(len(s.index.positions(vscpclass, vscptype, start, end))
+                    for s in self._segments)
+
+    # Matching records copied into a VscpEventBatch
+    def queryBatch(self, vscpclass=None, vscptype=None, start=None, end=None):
+        batch = VscpEventBatch()
+        for rec in self.query(vscpclass, vscptype, start, end):
+            ev = rec.event
+            batch.appendRow(ev.vscpclass, ev.vscptype, ev.guid, ev.data,
+                            ev.head, ev.timestamp, rec.obid,
+                            (ev.year, ev.month, ev.day, ev.hour, ev.minute, ev.second))
+        return batch
+
+    # Unmap all segments. Segments still referenced by returned events are
+    # unmapped when the last event is gone.
+    def close(self):
+        for s in self._segments:
+            s.close()
+        self._segments = []
@@ -0,0 +1,367 @@
+# FILE: vscp_measurement.py
+#
+# Decoding of VSCP measurement events
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Measurement events carry a value, the unit it is in and the index of the
+# sensor that made it. The layouts handled are
+#
+#   CLASS1.MEASUREMENT, MEASUREMENTX1-4 (10-14)
+#       data coding byte, value
+#   CLASS1.MEASUREMENT64 (60)
+#       64-bit float
+#   CLASS1.MEASUREZONE (65), CLASS1.SETVALUEZONE (85)
+#       sensor index, zone, sub-zone, data coding byte, value
+#   CLASS1.MEASUREMENT32 (70)
+#       32-bit float
+#   CLASS2.MEASUREMENT_STR (1040)
+#       sensor index, zone, sub-zone, unit, value as string
+#   CLASS2.MEASUREMENT_FLOAT (1060)
+#       sensor index, zone, sub-zone, unit, 64-bit float
+#
+# and the Level I classes sent over Level II (class + 512, destination
+# GUID first in data). All values are big endian.
+#
+# The data coding byte gives the coding of the value (VSCP_DATACODING_*),
+# the unit (VSCP_DATACODING_UNIT) and the sensor index
+# (VSCP_DATACODING_INDEX).
+#
+# decode_batch() decodes all measurement events in a VscpEventBatch at
+# once with NumPy when it is installed.
+
+import struct
+from array import array
+from collections import namedtuple
+
+from vscp import *
+
+try:
+    import numpy as np
+except ImportError:     # pragma: no cover
+    np = None
+
+VSCP_CLASS1_MEASUREMENT         =   10
+VSCP_CLASS1_MEASUREMENTX1       =   11
+VSCP_CLASS1_MEASUREMENTX2       =   12
+VSCP_CLASS1_MEASUREMENTX3       =   13
+VSCP_CLASS1_MEASUREMENTX4       =   14
+VSCP_CLASS1_MEASUREMENT64       =   60
+VSCP_CLASS1_MEASUREZONE         =   65
+VSCP_CLASS1_MEASUREMENT32       =   70
+VSCP_CLASS1_SETVALUEZONE        =   85
+VSCP_CLASS2_MEASUREMENT_STR     =   1040
+VSCP_CLASS2_MEASUREMENT_FLOAT   =   1060
+
+_LEVEL1_OVER_LEVEL2 = 512
+
+# Layouts
+_CODED = 1
+_ZONE = 2
+_DOUBLE = 3
+_SINGLE = 4
+_STR2 = 5
+_FLOAT2 = 6
+
+_LAYOUT = { VSCP_CLASS1_MEASUREMENT: _CODED,
+            VSCP_CLASS1_MEASUREMENTX1: _CODED,
+            VSCP_CLASS1_MEASUREMENTX2: _CODED,
+            VSCP_CLASS1_MEASUREMENTX3: _CODED,
+            VSCP_CLASS1_MEASUREMENTX4: _CODED,
+            VSCP_CLASS1_MEASUREMENT64: _DOUBLE,
+            VSCP_CLASS1_MEASUREZONE: _ZONE,
+            VSCP_CLASS1_MEASUREMENT32: _SINGLE,
+            VSCP_CLASS1_SETVALUEZONE: _ZONE,
+            VSCP_CLASS2_MEASUREMENT_STR: _STR2,
+            VSCP_CLASS2_MEASUREMENT_FLOAT: _FLOAT2 }
+
+_FLOAT = struct.Struct(">f")
+_DOUBLE_S = struct.Struct(">d")
+
+# A decoded measurement. zone and subzone are None for layouts without them.
+Measurement = namedtuple("Measurement", "value unit index zone subzone coding")
+
+# Decoded values of one sensor in a batch. rows are the rows of the batch.
+MeasurementSeries = namedtuple("MeasurementSeries", "rows timestamp value unit zone subzone")
+
+def is_measurement(vscpclass):
+    if _LEVEL1_OVER_LEVEL2 <= vscpclass < 2 * _LEVEL1_OVER_LEVEL2:
+        vscpclass -= _LEVEL1_OVER_LEVEL2
+    return vscpclass in _LAYOUT
+
+def _signed(b):
+    return int.from_bytes(b, "big", signed=True)
+
+# Value of data coded with coding byte coding. Bit and byte coded values
+# are returned as unsigned integers, strings as float when they can be
+# converted.
+def decode_value(coding, value):
+    value = bytes(value)
+    t = coding & VSCP_MASK_DATACODING_TYPE
+    if t == VSCP_DATACODING_BIT or t == VSCP_DATACODING_BYTE:
+        return int.from_bytes(value, "big")
+    if t == VSCP_DATACODING_INTEGER:
+        if not value:
+            raise ValueError("Empty integer value")
+        return _signed(value)
+    if t == VSCP_DATACODING_NORMALIZED:
+        if len(value) < 2:
+            raise ValueError("Normalized integer needs at least two bytes")
+        v = _signed(value[1:])
+        exp = value[0] & 0x7F
+        if value[0] & 0x80:
+            return v / (10 ** exp)
+        return float(v * (10 ** exp))
+    if t == VSCP_DATACODING_SINGLE:
+        if len(value) < 4:
+            raise ValueError("Single precision float needs four bytes")
+        return _FLOAT.unpack_from(value)[0]
+    if t == VSCP_DATACODING_DOUBLE:
+        if len(value) < 8:
+            raise ValueError("Double precision float needs eight bytes")
+        return _DOUBLE_S.unpack_from(value)[0]
+    if t == VSCP_DATACODING_STRING:
+        s = value.split(b'\x00')[0].decode("latin-1").strip()
+        try:
+            return float(s)
+        except ValueError:
+            return s
+    raise ValueError("Reserved data coding")
+
+# Decode a measurement from class and data. Returns None if class is not
+# a measurement class and raises ValueError if data is malformed.
+def decode_measurement_data(vscpclass, data):
+    data = bytes(data)
+    if _LEVEL1_OVER_LEVEL2 <= vscpclass < 2 * _LEVEL1_OVER_LEVEL2:
+        vscpclass -= _LEVEL1_OVER_LEVEL2
+        data = data[16:]
+    layout = _LAYOUT.get(vscpclass)
+    if layout is None:
+        return None
+    if layout == _CODED:
+        if not data:
+            raise ValueError("No data coding byte")
+        c = data[0]
+        return Measurement(decode_value(c, data[1:]), VSCP_DATACODING_UNIT(c),
+                            VSCP_DATACODING_INDEX(c), None, None, c)
+    if layout == _ZONE:
+        if len(data) < 4:
+            raise ValueError("Zone measurement needs at least four bytes")
+        c = data[3]
+        return Measurement(decode_value(c, data[4:]), VSCP_DATACODING_UNIT(c),
+                            data[0], data[1], data[2], c)
+    if layout == _DOUBLE:
+        return Measurement(decode_value(VSCP_DATACODING_DOUBLE, data), 0, 0, None, None,
+                            VSCP_DATACODING_DOUBLE)
+    if layout == _SINGLE:
+        return Measurement(decode_value(VSCP_DATACODING_SINGLE, data), 0, 0, None, None,
+                            VSCP_DATACODING_SINGLE)
+    if len(data) < 4:
+        raise ValueError("Level II measurement needs at least four bytes")
+    coding = VSCP_DATACODING_STRING if layout == _STR2 else VSCP_DATACODING_DOUBLE
+    return Measurement(decode_value(coding, data[4:]), data[3], data[0], data[1], data[2],
+                        coding)
+
+# Decode a measurement event (vscpEventEx, Packet0View, ...)
+def decode_measurement(ev):
+    return decode_measurement_data(ev.vscpclass, ev.data[:ev.sizedata])
+
+
+################################################################################
+# Batch decoding
+#
+# Returns a dict (vscpclass, vscptype, vscpGuid, index) -> MeasurementSeries
+# for all measurement events in a VscpEventBatch. Values are floats, string
+# values that are not numbers and malformed events are left out. With
+# NumPy the series columns are NumPy arrays, otherwise array.array.
+#
+
+def decode_batch(batch, use_numpy=True):
+    if np is not None and use_numpy:
+        return _decode_batch_numpy(batch)
+    return _decode_batch_python(batch)
+
+def _decode_batch_python(batch):
+    groups = {}
+    for row in range(len(batch)):
+        vscpclass = batch.vscpclass[row]
+        if not is_measurement(vscpclass):
+            continue
+        try:
+            m = decode_measurement_data(vscpclass, batch.getData(row))
+            value = float(m.value)
+        except ValueError:
+            continue
+        key = (vscpclass, batch.vscptype[row], bytes(batch.getGuid(row)), m.index)
+        cols = groups.get(key)
+        if cols is None:
+            cols = groups[key] = (array('Q'), array('I'), array('d'),
+                                    array('B'), array('B'), array('B'))
+        for col, v in zip(cols, (row, batch.timestamp[row], value, m.unit,
+                                    m.zone or 0, m.subzone or 0)):
+            col.append(v)
+    return dict(((c, t, vscpGuid(g), i), MeasurementSeries(*cols))
+                    for (c, t, g, i), cols in groups.items())
+
+# Big endian integers of length vlen (1-8) starting at vstart in data
+def _np_uint(data, vstart, vlen):
+    j = np.arange(8)
+    mask = j < vlen[:, None]
+    idx = np.where(mask, vstart[:, None] + j, 0)
+    b = np.where(mask, data[idx], 0).astype(np.uint64)
+    shift = np.where(mask, (vlen[:, None] - 1 - j) * 8, 0).astype(np.uint64)
+    return (b << shift).sum(axis=1, dtype=np.uint64)
+
+def _np_int(data, vstart, vlen):
+    v = _np_uint(data, vstart, vlen).view(np.int64)
+    bits = (vlen * 8).astype(np.int64)
+    short = bits < 64
+    sign = short & (((v >> np.where(short, bits - 1, 0)) & 1) == 1)
+    return np.where(sign, v - np.left_shift(1, np.where(short, bits, 0)), v)
+
+def _np_float(data, vstart, size, dtype):
+    idx = vstart[:, None] + np.arange(size)
+    return np.ascontiguousarray(data[idx]).view(dtype).ravel().astype(np.float64)
+
+def _decode_batch_numpy(batch):
+    n = len(batch)
+    if not n:
+        return {}
+    cls = np.frombuffer(batch.vscpclass, dtype=np.uint16).astype(np.int64)
+    offsets = np.frombuffer(batch.offsets, dtype=np.uint64).astype(np.int64)
+    data = np.frombuffer(bytes(batch.data) + bytes(8), dtype=np.uint8)
+    start = offsets[:-1].copy()
+    size = offsets[1:] - offsets[:-1]
+    base = cls.copy()
+    l1 = (cls >= _LEVEL1_OVER_LEVEL2) & (cls < 2 * _LEVEL1_OVER_LEVEL2)
+    base[l1] -= _LEVEL1_OVER_LEVEL2
+    start[l1] += 16
+    size[l1] -= 16
+
+    lut = np.zeros(2 * _LEVEL1_OVER_LEVEL2 + VSCP_CLASS2_MEASUREMENT_FLOAT + 1, dtype=np.int8)
+    for c, layout in _LAYOUT.items():
+        lut[c] = layout
+    layout = np.where(base < len(lut), lut[np.minimum(base, len(lut) - 1)], 0)
+    layout[l1 & ((layout == _STR2) | (layout == _FLOAT2))] = 0
+
+    # Header fields for each layout
+    coding = np.zeros(n, dtype=np.int64)
+    index = np.zeros(n, dtype=np.int64)
+    unit = np.zeros(n, dtype=np.int64)
+    zone = np.zeros(n, dtype=np.int64)
+    subzone = np.zeros(n, dtype=np.int64)
+    vstart = start.copy()
+    vlen = size.copy()
+    hdr = np.minimum(start, len(data) - 4)
+
+    sel = (layout == _CODED) & (size >= 1)
+    coding[sel] = data[start[sel]]
+    vstart[sel] += 1
+    vlen[sel] -= 1
+
+    sel4 = ((layout == _ZONE) | (layout == _STR2) | (layout == _FLOAT2)) & (size >= 4)
+    index[sel4] = data[hdr[sel4]]
+    zone[sel4] = data[hdr[sel4] + 1]
+    subzone[sel4] = data[hdr[sel4] + 2]
+    vstart[sel4] += 4
+    vlen[sel4] -= 4
+    z = sel4 & (layout == _ZONE)
+    coding[z] = data[hdr[z] + 3]
+    l2 = sel4 & (layout != _ZONE)
+    unit[l2] = data[hdr[l2] + 3]
+    coding[sel4 & (layout == _FLOAT2)] = VSCP_DATACODING_DOUBLE
+    coding[layout == _DOUBLE] = VSCP_DATACODING_DOUBLE
+    coding[layout == _SINGLE] = VSCP_DATACODING_SINGLE
+
+    c8 = sel | (sel4 & (layout == _ZONE))
+    unit[c8] = (coding[c8] & VSCP_MASK_DATACODING_UNIT) >> 3
+    index[sel] = coding[sel] & VSCP_MASK_DATACODING_INDEX
+    valid = sel | sel4 | (layout == _DOUBLE) | (layout == _SINGLE)
+    ctype = coding & VSCP_MASK_DATACODING_TYPE
+
+    value = np.full(n, np.nan)
+    ok = np.zeros(n, dtype=bool)
+
+    s = valid & ((ctype == VSCP_DATACODING_BIT) | (ctype == VSCP_DATACODING_BYTE)) & \
+            (vlen >= 0) & (vlen <= 8) & (layout != _STR2)
+    if s.any():
+        value[s] = _np_uint(data, vstart[s], vlen[s]).astype(np.float64)
+        ok |= s
+    s = valid & (ctype == VSCP_DATACODING_INTEGER) & (vlen >= 1) & (vlen <= 8) & (layout != _STR2)
+    if s.any():
+        value[s] = _np_int(data, vstart[s], vlen[s]).astype(np.float64)
+        ok |= s
+    s = valid & (ctype == VSCP_DATACODING_NORMALIZED) & (vlen >= 2) & (vlen <= 9) & (layout != _STR2)
+    if s.any():
+        exp = data[vstart[s]].astype(np.int64)
+        v = _np_int(data, vstart[s] + 1, vlen[s] - 1).astype(np.float64)
+        scale = 10.0 ** (exp & 0x7F)
+        value[s] = np.where(exp & 0x80, v / scale, v * scale)
+        ok |= s
+    s = valid & (ctype == VSCP_DATACODING_SINGLE) & (vlen >= 4) & (layout != _STR2)
+    if s.any():
+        value[s] = _np_float(data, vstart[s], 4, ">f4")
+        ok |= s
+    s = valid & (ctype == VSCP_DATACODING_DOUBLE) & (vlen >= 8) & (layout != _STR2)
+    if s.any():
+        value[s] = _np_float(data, vstart[s], 8, ">f8")
+        ok |= s
+    # Strings are rare, decode them one by one
+    for row in np.nonzero(valid & ((ctype == VSCP_DATACODING_STRING) | (layout == _STR2)))[0]:
+        try:
+            m = decode_measurement_data(int(cls[row]), batch.getData(int(row)))
+            value[row] = float(m.value)
+            ok[row] = True
+        except ValueError:
+            pass
+
+    rows = np.nonzero(ok)[0]
+    if not len(rows):
+        return {}
+    # Group on class/type/index and the two halves of the GUID. lexsort is
+    # stable so rows stay in batch order within a group.
+    g = np.frombuffer(bytes(batch.guid), dtype=">u8").reshape(n, 2)[rows]
+    typ = np.frombuffer(batch.vscptype, dtype=np.uint16).astype(np.int64)[rows]
+    k = (cls[rows] << 24) | (typ << 8) | index[rows]
+    order = np.lexsort((g[:, 1], g[:, 0], k))
+    k = k[order]
+    g = g[order]
+    change = np.ones(len(rows), dtype=bool)
+    change[1:] = (k[1:] != k[:-1]) | (g[1:, 0] != g[:-1, 0]) | (g[1:, 1] != g[:-1, 1])
+    bounds = list(np.nonzero(change)[0]) + [len(rows)]
+    rows = rows[order]
+    ts = np.frombuffer(batch.timestamp, dtype=np.uint32)
+    unit = unit.astype(np.uint8)
+    zone = zone.astype(np.uint8)
+    subzone = subzone.astype(np.uint8)
+    guids = batch.guid
+    out = {}
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        r = rows[a:b]
+        first = int(r[0])
+        key = (int(k[a] >> 24), int((k[a] >> 8) & 0xFFFF),
+                vscpGuid(bytes(guids[first*16:first*16+16])), int(k[a] & 0xFF))
+        out[key] = MeasurementSeries(r, ts[r], value[r], unit[r], zone[r], subzone[r])
+    return out
@@ -0,0 +1,425 @@
+# FILE: vscp_nodes.py
+#
+# Registry of nodes seen through heartbeat and capability events
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Events decoded
+#
+#   CLASS1.INFORMATION, NODE_HEARTBEAT (20, 9)
+#       The node is the sender.
+#   CLASS2.INFORMATION, LEVEL II NODE HEARTBEAT (1026, 2)
+#       The node is the sender.
+#   CLASS2.INFORMATION, LEVEL II PROXY NODE HEARTBEAT (1026, 3)
+#       Real GUID, interface GUID, level, node name and interface name at
+#       the VSCP_MULTICAST_PROXY_HEARTBEAT_POS_* offsets.
+#   CLASS2.PROTOCOL, HIGH END SERVER CAPABILITIES (1024, 20)
+#       64-bit capabilities (VSCP_SERVER_CAPABILITY_*), server GUID, IP
+#       address, server name and non standard ports at the
+#       VSCP_CAPABILITY_OFFSET_* offsets.
+#
+# Each node expires ttl seconds after it was last seen. Expiry times are
+# kept on one timer wheel so that refreshing a node and finding the
+# expired ones costs the same however many nodes there are. Listeners are
+# told about added, changed and removed nodes, a heartbeat that changes
+# nothing only moves the expiry time.
+
+import ipaddress
+import struct
+import time
+
+from vscp import *
+
+# Default time a node is kept after it was last seen (seconds)
+DEFAULT_TTL = 180.0
+
+# Default timer wheel resolution (seconds) and number of slots
+DEFAULT_RESOLUTION = 1.0
+DEFAULT_SLOTS = 512
+
+# Changes passed to listeners
+NODE_ADDED = 1
+NODE_CHANGED = 2
+NODE_REMOVED = 3
+
+# Layouts of the heartbeat and capabilities data
+_PROXY_HEARTBEAT = struct.Struct(">16s{0}x16sB{1}x64s64s".format(
+                        VSCP_MULTICAST_PROXY_HEARTBEAT_POS_IFGUID - 16,
+                        VSCP_MULTICAST_PROXY_HEARTBEAT_POS_NODENAME -
+                            VSCP_MULTICAST_PROXY_HEARTBEAT_POS_IFLEVEL - 1))
+_CAPS = struct.Struct(">Q16s16s64s")
+
+_V4_MAPPED = bytes(10) + b'\xff\xff'
+
+def _text(b):
+    return b.split(b'\x00', 1)[0].decode("utf-8", "replace")
+
+def _ipaddr(b):
+    if b[:12] == _V4_MAPPED:
+        return str(ipaddress.IPv4Address(b[12:]))
+    return str(ipaddress.IPv6Address(b))
+
+# Decode proxy heartbeat data. Returns (real guid, interface guid, level,
+# node name, interface name).
+def decode_proxy_heartbeat(data):
+    if len(data) < _PROXY_HEARTBEAT.size:
+        raise ValueError("Proxy heartbeat needs {0} bytes".format(_PROXY_HEARTBEAT.size))
+    real, ifguid, level, name, ifname = _PROXY_HEARTBEAT.unpack_from(data)
+    return vscpGuid(real), vscpGuid(ifguid), level, _text(name), _text(ifname)
+
+# Decode high end server capabilities data. Returns (capabilities,
+# server guid, ip address, server name, non standard ports).
+def decode_server_caps(data):
+    if len(data) < _CAPS.size:
+        raise ValueError("Server capabilities needs {0} bytes".format(_CAPS.size))
+    caps, guid, ip, name = _CAPS.unpack_from(data)
+    n = (len(data) - _CAPS.size) // 2
+    ports = tuple(p for p in struct.unpack_from(">{0}H".format(n), data, _CAPS.size) if p)
+    return caps, vscpGuid(guid), _ipaddr(ip), _text(name), ports
+
+# Data for a proxy heartbeat
+def make_proxy_heartbeat(guid, ifguid, level, name, ifname):
+    return _PROXY_HEARTBEAT.pack(bytes(vscpGuid(guid)), bytes(vscpGuid(ifguid)), level,
+                                    name.encode("utf-8")[:63], ifname.encode("utf-8")[:63])
+
+# Data for a high end server capabilities event
+def make_server_caps(caps, guid, ipaddr, name, ports=()):
+    ip = ipaddress.ip_address(ipaddr)
+    if ip.version == 4:
+        ip = ipaddress.IPv6Address(_V4_MAPPED + ip.packed)
+    return _CAPS.pack(caps, bytes(vscpGuid(guid)), ip.packed, name.encode("utf-8")[:63]) + \
+            struct.pack(">{0}H".format(len(ports)), *ports)
+
+
+################################################################################
+# Hashed timer wheel
+#
+# Keys are put in the slot of their deadline. advance() visits the slots
+# passed since the last call and returns the keys that are due. Deadlines
+# further away than one turn of the wheel stay in their slot until they
+# are due. Moving a key costs the same as adding it.
+#
+
+class TimerWheel:
+
+    def __init__(self, resolution=DEFAULT_RESOLUTION, slots=DEFAULT_SLOTS):
+        if resolution <= 0 or slots <= 0:
+            raise ValueError("Resolution and slots must be positive")
+        self.resolution = resolution
+        self._slots = [{} for _ in range(slots)]
+        self._where = {}            # key -> slot
+        self._tick = None           # Last tick visited
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    # Run key at deadline. Replaces an earlier deadline for key.
+    def schedule(self, key, deadline):
+        tick = -int(-deadline // self.resolution)
+        if self._tick is not None and tick <= self._tick:
+            tick = self._tick + 1
+        slot = tick % len(self._slots)
+        old = self._where.get(key)
+        if old is not None and old != slot:
+            del self._slots[old][key]
+        self._slots[slot][key] = deadline
+        self._where[key] = slot
+
+    def cancel(self, key):
+        slot = self._where.pop(key, None)
+        if slot is not None:
+            del self._slots[slot][key]
+
+    # Deadline of key or None
+    def getDeadline(self, key):
+        slot = self._where.get(key)
+        return None if slot is None else self._slots[slot][key]
+
+    # Remove and return the keys due at time now
+    def advance(self, now):
+        tick = int(now // self.resolution)
+        last = self._tick
+        self._tick = tick
+        if last is None:
+            last = tick - len(self._slots)
+        if tick <= last:
+            return []
+        slots = self._slots
+        n = len(slots)
+        due = []
+        for t in range(max(last + 1, tick - n + 1), tick + 1):
+            slot = slots[t % n]
+            if not slot:
+                continue
+            keys = [k for k, d in slot.items() if d <= now]
+            for k in keys:
+                del slot[k]
+                del self._where[k]
+            due.extend(keys)
+        return due
+
+
+################################################################################
+# A node
+#
+
+class NodeInfo:
+
+    __slots__ = ("guid", "level", "name", "ifguid", "ifname", "capabilities", "ipaddr",
+                    "srvname", "ports", "firstSeen", "lastSeen", "cntHeartbeats")
+
+    def __init__(self, guid, now):
+        self.guid = guid
+        self.level = None
+        self.name = None
+        self.ifguid = None
+        self.ifname = None
+        self.capabilities = None
+        self.ipaddr = None
+        self.srvname = None
+        self.ports = ()
+        self.firstSeen = now
+        self.lastSeen = now
+        self.cntHeartbeats = 0
+
+    def __repr__(self):
+        return "NodeInfo({0}, name={1!r}, level={2})".format(self.guid.getAsString(),
+                                                                self.name, self.level)
+
+    # True if the server has capability bit (VSCP_SERVER_CAPABILITY_*)
+    def hasCapability(self, bit):
+        return self.capabilities is not None and bool(self.capabilities & bit)
+
+
+################################################################################
+# Node registry
+#
+#   reg = NodeRegistry(ttl=180)
+#   reg.addListener(lambda change, node, fields: print(change, node, fields))
+#   async for ev in ep:
+#       reg.feed(ev)
+#   ...
+#   reg.expire()        # Call every resolution seconds
+#
+
+class NodeRegistry:
+
+    def __init__(self, ttl=DEFAULT_TTL, resolution=DEFAULT_RESOLUTION, slots=DEFAULT_SLOTS,
+                    clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.cntEvents = 0
+        self.cntBadEvents = 0
+        self._nodes = {}
+        self._byif = {}             # interface guid -> set of node guids
+        self._rawHeartbeat = {}     # guid bytes -> (last data, node)
+        self._rawCaps = {}
+        self._wheel = TimerWheel(resolution, slots)
+        self._listeners = []
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, guid):
+        return vscpGuid(guid) in self._nodes
+
+    def __iter__(self):
+        return iter(list(self._nodes.values()))
+
+    def get(self, guid, default=None):
+        return self._nodes.get(vscpGuid(guid), default)
+
+    # Nodes on the interface with GUID ifguid
+    def getInterfaceNodes(self, ifguid):
+        nodes = self._nodes
+        return [nodes[g] for g in self._byif.get(vscpGuid(ifguid), ())]
+
+    # Call listener(change, node, fields) when a node is added, changed or
+    # removed. fields is a tuple with the names of the changed fields.
+    def addListener(self, listener):
+        self._listeners.append(listener)
+
+    def removeListener(self, listener):
+        self._listeners.remove(listener)
+
+    def _notify(self, change, node, fields=()):
+        for listener in self._listeners:
+            listener(change, node, fields)
+
+    def _touch(self, guid, now):
+        node = self._nodes.get(guid)
+        added = node is None
+        if added:
+            node = self._nodes[guid] = NodeInfo(guid, now)
+        node.lastSeen = now
+        node.cntHeartbeats += 1
+        self._wheel.schedule(guid, now + self.ttl)
+        return node, added
+
+    def _update(self, node, added, values):
+        changed = []
+        for name, value in values:
+            if getattr(node, name) != value:
+                if name == "ifguid":
+                    self._unindex(node)
+                setattr(node, name, value)
+                if name == "ifguid":
+                    self._byif.setdefault(value, set()).add(node.guid)
+                changed.append(name)
+        if added:
+            self._notify(NODE_ADDED, node)
+        elif changed:
+            self._notify(NODE_CHANGED, node, tuple(changed))
+        return node
+
+    def _forget(self, node):
+        key = bytes(node.guid)
+        self._rawHeartbeat.pop(key, None)
+        self._rawCaps.pop(key, None)
+        self._unindex(node)
+
+    def _unindex(self, node):
+        members = self._byif.get(node.ifguid)
+        if members is not None:
+            members.discard(node.guid)
+            if not members:
+                del self._byif[node.ifguid]
+
+    # Update the registry from an event. Returns the node the event was
+    # about or None for other events.
+    def feed(self, ev, now=None):
+        return self._feed(ev.vscpclass, ev.vscptype, ev.guid, ev.data, ev.sizedata, now)
+
+    def _feed(self, vscpclass, vscptype, guid, data, sizedata, now):
+        if vscpclass == VSCP_CLASS2_INFORMATION:
+            if vscptype == VSCP2_TYPE_INFORMATION_PROXY_HEART_BEAT:
+                return self._proxyHeartbeat(bytes(memoryview(data)[:sizedata]), now)
+            if vscptype != VSCP2_TYPE_INFORMATION_HEART_BEAT:
+                return None
+            level = 1
+        elif vscpclass == VSCP_CLASS1_INFORMATION:
+            if vscptype != VSCP_TYPE_INFORMATION_NODE_HEARTBEAT:
+                return None
+            level = 0
+        elif vscpclass == VSCP_CLASS2_PROTOCOL and vscptype == VSCP2_TYPE_PROTOCOL_HIGH_END_SERVER_CAPS:
+            return self._serverCaps(bytes(memoryview(data)[:sizedata]), now)
+        else:
+            return None
+        self.cntEvents += 1
+        node, added = self._touch(vscpGuid(bytes(guid)), self.clock() if now is None else now)
+        return self._update(node, added, (("level", level),))
+
+    # A heartbeat with the same data as the last one from the node only
+    # moves the expiry time, it is not decoded again
+    def _known(self, raw, key, data, now):
+        last = raw.get(key)
+        if last is None or last[0] != data:
+            return None
+        node = last[1]
+        node.lastSeen = now
+        node.cntHeartbeats += 1
+        self._wheel.schedule(node.guid, now + self.ttl)
+        return node
+
+    def _proxyHeartbeat(self, data, now):
+        self.cntEvents += 1
+        now = self.clock() if now is None else now
+        key = data[VSCP_MULTICAST_PROXY_HEARTBEAT_POS_REALGUID:VSCP_MULTICAST_PROXY_HEARTBEAT_POS_REALGUID + 16]
+        node = self._known(self._rawHeartbeat, key, data, now)
+        if node is not None:
+            return node
+        try:
+            guid, ifguid, level, name, ifname = decode_proxy_heartbeat(data)
+        except ValueError:
+            self.cntBadEvents += 1
+            return None
+        node, added = self._touch(guid, now)
+        self._rawHeartbeat[key] = (data, node)
+        return self._update(node, added, (("ifguid", ifguid), ("level", level),
+                                            ("name", name), ("ifname", ifname)))
+
+    def _serverCaps(self, data, now):
+        self.cntEvents += 1
+        now = self.clock() if now is None else now
+        key = data[VSCP_CAPABILITY_OFFSET_GUID:VSCP_CAPABILITY_OFFSET_GUID + 16]
+        node = self._known(self._rawCaps, key, data, now)
+        if node is not None:
+            return node
+        try:
+            caps, guid, ip, name, ports = decode_server_caps(data)
+        except ValueError:
+            self.cntBadEvents += 1
+            return None
+        node, added = self._touch(guid, now)
+        self._rawCaps[key] = (data, node)
+        return self._update(node, added, (("level", 1), ("capabilities", caps), ("ipaddr", ip),
+                                            ("srvname", name), ("ports", ports)))
+
+    # Update the registry from many events (an iterable or a VscpEventBatch).
+    # Returns the number of events used.
+    def feedMany(self, events, now=None):
+        now = self.clock() if now is None else now
+        n = 0
+        if hasattr(events, "offsets"):
+            wanted = (VSCP_CLASS1_INFORMATION, VSCP_CLASS2_INFORMATION, VSCP_CLASS2_PROTOCOL)
+            for row, vscpclass in enumerate(events.vscpclass):
+                if vscpclass in wanted:
+                    data = events.getData(row)
+                    if self._feed(vscpclass, events.vscptype[row], events.getGuid(row),
+                                    data, len(data), now) is not None:
+                        n += 1
+            return n
+        for ev in events:
+            if self.feed(ev, now) is not None:
+                n += 1
+        return n
+
+    # Remove a node. Returns the node or None.
+    def remove(self, guid):
+        guid = vscpGuid(guid)
+        node = self._nodes.pop(guid, None)
+        if node is not None:
+            self._wheel.cancel(guid)
+            self._forget(node)
+            self._notify(NODE_REMOVED, node)
+        return node
+
+    # Remove nodes not seen for ttl seconds. Returns the removed nodes.
+    def expire(self, now=None):
+        now = self.clock() if now is None else now
+        out = []
+        for guid in self._wheel.advance(now):
+            node = self._nodes.pop(guid)
+            self._forget(node)
+            out.append(node)
+            self._notify(NODE_REMOVED, node)
+        return out
+
+    # Time node with guid expires or None
+    def getExpiry(self, guid):
+        return self._wheel.getDeadline(vscpGuid(guid))
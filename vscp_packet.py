@@ -0,0 +1,177 @@
+# FILE: vscp_packet.py
+#
+# Encoder/decoder for VSCP multicast/UDP packet type 0 frames
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import struct
+from collections import namedtuple
+from ctypes import addressof, string_at
+
+from vscp import *
+from vscp_crc import crc16
+
+# Frame layout (all values big endian)
+#
+#   pkttype, head, timestamp, year, month, day, hour, minute, second,
+#   class, type, guid, sizedata
+#
+# followed by sizedata bytes of data and a two byte CRC.
+PACKET0_HEADER = struct.Struct(">BHIHBBBBBHH16sH")
+PACKET0_CRC = struct.Struct(">H")
+
+# Sanity check of layout against the defined positions
+assert PACKET0_HEADER.size == VSCP_MULTICAST_PACKET0_POS_VSCP_DATA
+assert PACKET0_HEADER.size == 1 + VSCP_MULTICAST_PACKET0_HEADER_LENGTH
+
+_EX_DATA_OFFSET = vscpEventEx.data.offset
+
+_PKTTYPE_EVENT = SET_VSCP_MULTICAST_TYPE(VSCP_MULTICAST_TYPE_EVENT, VSCP_ENCRYPTION_NONE)
+
+# Size of a full frame (packet type, header, data and CRC)
+def packet0_size(sizedata):
+    return VSCP_MULTICAST_PACKET0_POS_VSCP_DATA + sizedata + 2
+
+
+_Packet0Fields = namedtuple("Packet0View",
+                    "pkttype head timestamp year month day hour minute second "
+                    "vscpclass vscptype guid sizedata data crc")
+
+################################################################################
+# A decoded packet type 0 frame
+#
+# Fields are named as in vscpEventEx. 'data' is a memoryview into the
+# receive buffer so the buffer must not be reused while the view is alive.
+# Use toEventEx() to get a copy that owns its data.
+#
+
+class Packet0View(_Packet0Fields):
+
+    __slots__ = ()
+
+    # Frames carry no obid
+    obid = 0
+
+    def getGuidStr(self):
+        return vscpGuid(self.guid).getAsString()
+
+    # 2013-11-02T12:34:22Z
+    def getIsoDateTime(self):
+        return "{0:04n}-{1:02}-{2:02}T{3:02}:{4:02}:{5:02}Z".format(self.year,
+                                                                        self.month,
+                                                                        self.day,
+                                                                        self.hour,
+                                                                        self.minute,
+                                                                        self.second)
+
+    def toEventEx(self):
+        ex = vscpEventEx.new(self.vscpclass, self.vscptype, self.guid, self.data,
+                                self.timestamp, self.head, 0,
+                                (self.year, self.month, self.day,
+                                    self.hour, self.minute, self.second))
+        ex.crc = self.crc
+        return ex
+
+
+# Write event (vscpEventEx or Packet0View) as a packet type 0 frame into
+# the writable buffer buf starting at offset. The CRC is calculated unless
+# VSCP_HEADER_NO_CRC is set in head. Returns the number of bytes written.
+def encode_packet0(event, buf, offset=0):
+    if isinstance(event, Packet0View):
+        g = event.guid
+        data = event.data
+    else:
+        g = string_at(addressof(event.guid), 16)
+        data = string_at(addressof(event) + _EX_DATA_OFFSET, event.sizedata)
+    return _encode(buf, offset, event.head, event.timestamp,
+                    event.year, event.month, event.day,
+                    event.hour, event.minute, event.second,
+                    event.vscpclass, event.vscptype, g, data)
+
+# Write row i of a VscpEventBatch as a packet type 0 frame
+def encode_packet0_row(batch, i, buf, offset=0):
+    return _encode(buf, offset, batch.head[i], batch.timestamp[i],
+                    batch.year[i], batch.month[i], batch.day[i],
+                    batch.hour[i], batch.minute[i], batch.second[i],
+                    batch.vscpclass[i], batch.vscptype[i],
+                    batch.getGuid(i), batch.getData(i))
+
+def _encode(buf, offset, head, timestamp, year, month, day, hour, minute, second,
+                vscpclass, vscptype, g, data):
+    sizedata = len(data)
+    if sizedata > VSCP_LEVEL2_MAXDATA:
+        raise ValueError("Event data can be at most {0} bytes".format(VSCP_LEVEL2_MAXDATA))
+    end = offset + packet0_size(sizedata)
+    if end > len(buf):
+        raise ValueError("Buffer to small for frame")
+    PACKET0_HEADER.pack_into(buf, offset, _PKTTYPE_EVENT, head, timestamp,
+                                year, month, day, hour, minute, second,
+                                vscpclass, vscptype, bytes(g), sizedata)
+    pos = offset + VSCP_MULTICAST_PACKET0_POS_VSCP_DATA
+    buf[pos:pos+sizedata] = data
+    if head & VSCP_HEADER_NO_CRC:
+        crc = VSCP_NOCRC_CALC_DUMMY_CRC
+    else:
+        crc = crc16(memoryview(buf)[offset+1:pos+sizedata])
+    PACKET0_CRC.pack_into(buf, pos + sizedata, crc)
+    return end - offset
+
+# Encode event into a new bytearray
+def make_packet0(event):
+    buf = bytearray(packet0_size(event.sizedata))
+    encode_packet0(event, buf)
+    return buf
+
+# Decode a packet type 0 frame at offset in buf (preferably a memoryview).
+# If verify is true a frame with a bad CRC raises ValueError.
+def decode_packet0(buf, offset=0, verify=True):
+    if not isinstance(buf, memoryview):
+        buf = memoryview(buf)
+    if len(buf) - offset < packet0_size(0):
+        raise ValueError("Frame to short")
+    hdr = PACKET0_HEADER.unpack_from(buf, offset)
+    if GET_VSCP_MULTICAST_PACKET_TYPE(hdr[0]) != VSCP_MULTICAST_TYPE_EVENT:
+        raise ValueError("Not a VSCP event frame")
+    if GET_VSCP_MULTICAST_PACKET_ENCRYPTION(hdr[0]) != VSCP_ENCRYPTION_NONE:
+        raise ValueError("Frame is encrypted")
+    sizedata = hdr[12]
+    pos = offset + VSCP_MULTICAST_PACKET0_POS_VSCP_DATA
+    if sizedata > VSCP_LEVEL2_MAXDATA or pos + sizedata + 2 > len(buf):
+        raise ValueError("Invalid frame data size")
+    crc, = PACKET0_CRC.unpack_from(buf, pos + sizedata)
+    if verify and not (hdr[1] & VSCP_HEADER_NO_CRC and VSCP_NOCRC_CALC_DUMMY_CRC == crc):
+        # CRC over the frame including its CRC is zero when the frame is valid
+        if crc16(buf[offset+1:pos+sizedata+2]):
+            raise ValueError("Frame CRC error")
+    return tuple.__new__(Packet0View, hdr + (buf[pos:pos+sizedata], crc))
+
+# Decode a packet type 0 frame at offset in buf and append it to a
+# VscpEventBatch. Returns the size of the frame.
+def decode_packet0_into(batch, buf, offset=0, verify=True):
+    ev = decode_packet0(buf, offset, verify)
+    batch.appendRow(ev.vscpclass, ev.vscptype, ev.guid, ev.data,
+                    ev.head, ev.timestamp, 0,
+                    (ev.year, ev.month, ev.day, ev.hour, ev.minute, ev.second))
+    return packet0_size(ev.sizedata)
@@ -0,0 +1,643 @@
+# FILE: vscp_pipeline.py
+#
+# Multiprocess decode and filter pipeline over shared memory rings
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# One process cannot keep up with decoding, CRC checking, filtering and
+# formatting at the peak rates of a busy multicast segment. A VscpPipeline
+# spreads that work over a pool of worker processes.
+#
+# A single receiver (the calling process with put(), or a receiver process
+# reading a UDP/multicast socket) writes the raw packet type 0 frames into
+# one shared memory ring for each worker. Frames are routed on a hash of
+# their GUID, so all frames of a node go through the same worker and stay
+# in order. Each worker decodes the frames of its ring, drops the ones its
+# filters (vscpEventFilter rules) do not let through, checks the CRC of the
+# rest and writes them to its output ring, as frames or as NDJSON lines.
+# Frames are only copied between shared memory buffers, they are never
+# pickled.
+#
+#   with VscpPipeline(workers=4, filters=[flt]) as pipe:
+#       pipe.startReceiver()
+#       for frame in pipe:
+#           ev = decode_packet0(frame, 0, False)
+#
+
+import os
+import time
+import select
+import socket
+import binascii
+import multiprocessing
+from multiprocessing import shared_memory
+from collections import deque
+
+from vscp import *
+from vscp_packet import decode_packet0, packet0_size
+from vscp_crc import check_packet0
+from vscp_filter import FilterSet
+from vscp_serialize import writer
+
+# Default size in bytes of the data area of each ring
+DEFAULT_RING_SIZE = 4 * 1024 * 1024
+
+# Largest frame (packet type, header, max data, CRC)
+MAX_FRAME_SIZE = packet0_size(VSCP_LEVEL2_MAXDATA)
+
+# Frames read from the socket before they are made visible to the workers
+RECEIVE_BURST = 256
+
+# Seconds between checks for stop in the receiver process
+RECEIVE_POLL = 0.1
+
+# Records a worker handles before it gives their space back
+WORKER_CHUNK = 1024
+
+# Seconds release() waits for a process before it is terminated
+RELEASE_TIMEOUT = 5
+
+# Ring header, 64 bit words. The write and read positions are on separate
+# cache lines as they are written by different processes.
+RING_HEADER_SIZE = 256
+_WRITE = 0          # Producer, bytes written
+_READ = 8           # Consumer, bytes read
+_CLOSED = 16        # Producer, set when no more records will be written
+_SIZE = 17          # Size of the data area
+_COUNTERS = 24      # Eight counters owned by the producer
+
+# Record length marking a skip to the start of the ring
+_WRAP = 0xFFFFFFFF
+
+# Counters of the input rings, written by the receiver
+CNT_IN_FRAMES = 0
+CNT_IN_DATA = 1
+CNT_IN_OVERRUNS = 2
+
+# Counters of the output rings, written by the workers
+CNT_OUT_RECORDS = 0
+CNT_OUT_DATA = 1
+CNT_OUT_BAD = 2
+CNT_OUT_FILTERED = 3
+
+_GUID_POS = VSCP_MULTICAST_PACKET0_POS_VSCP_GUID
+_FRAME_OVERHEAD = packet0_size(0)
+
+# Wait a little longer each time there was nothing to do
+def _idle(spins):
+    if spins < 16:
+        time.sleep(0)
+    else:
+        time.sleep(min(0.001, 0.00005 * (spins - 15)))
+
+# Index of the worker handling the frame
+def _route(frame, n):
+    if 1 == n or len(frame) < _GUID_POS + 16:
+        return 0
+    return binascii.crc32(frame[_GUID_POS:_GUID_POS + 16]) % n
+
+
+################################################################################
+# Single producer, single consumer ring of variable size records in
+# shared memory
+#
+# A record is a 32 bit length followed by the record bytes padded to four
+# bytes. The producer stages records with put() and makes them visible with
+# commit(). The consumer gets all visible records as memoryviews into the
+# ring with records() and gives their space back with release(), so the
+# views must not be used after that. Only the positions are shared and
+# each has one writer, so no locks are needed as long as each side is used
+# by one process.
+#
+#   ring = FrameRing(1 << 20)               # Creating process
+#   ring = FrameRing(name=name)             # Other process
+#
+
+class FrameRing:
+
+    def __init__(self, size=DEFAULT_RING_SIZE, name=None):
+        if name is None:
+            if size % 8 or size < 2 * (MAX_FRAME_SIZE + 8):
+                raise ValueError("Ring size must be a multiple of 8 and "
+                                    "at least {0}".format(2 * (MAX_FRAME_SIZE + 8)))
+            self._shm = shared_memory.SharedMemory(create=True, size=RING_HEADER_SIZE + size)
+            self._owner = True
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+        self.name = self._shm.name
+        self._hdr = self._shm.buf[:RING_HEADER_SIZE].cast('Q')
+        if self._owner:
+            self._hdr[_SIZE] = size
+        self.size = self._hdr[_SIZE]
+        self._data = self._shm.buf[RING_HEADER_SIZE:RING_HEADER_SIZE + self.size]
+        self._lens = self._data.cast('I')
+        self.counters = self._hdr[_COUNTERS:_COUNTERS + 8]
+        self._wpos = self._hdr[_WRITE]
+        self._rcache = self._hdr[_READ]
+        self._next = self._hdr[_READ]
+
+    # Stage one record. When the ring is full staged records are committed
+    # and put() waits for the consumer, or returns False if block is false
+    # or timeout seconds have passed.
+    def put(self, record, block=True, timeout=None):
+        n = len(record)
+        need = 4 + ((n + 3) & ~3)
+        if need > self.size // 2:
+            raise ValueError("Record too large for ring")
+        w = self._wpos
+        p = w % self.size
+        skip = self.size - p if p + need > self.size else 0
+        if w + skip + need - self._rcache > self.size:
+            self._rcache = self._hdr[_READ]
+            if w + skip + need - self._rcache > self.size:
+                if not block or not self._waitSpace(skip + need, timeout):
+                    return False
+        if skip:
+            self._lens[p >> 2] = _WRAP
+            w += skip
+            p = 0
+        self._lens[p >> 2] = n
+        self._data[p + 4:p + 4 + n] = record
+        self._wpos = w + need
+        return True
+
+    def _waitSpace(self, need, timeout):
+        self.commit()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        spins = 0
+        while self._wpos + need - self._hdr[_READ] > self.size:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            _idle(spins)
+            spins += 1
+        self._rcache = self._hdr[_READ]
+        return True
+
+    # Make staged records visible to the consumer
+    def commit(self):
+        self._hdr[_WRITE] = self._wpos
+
+    # Tell the consumer no more records will be written. Records must be
+    # committed before.
+    def finish(self):
+        self._hdr[_CLOSED] = 1
+
+    def isFinished(self):
+        return 0 != self._hdr[_CLOSED]
+
+    # Committed records not yet returned, as memoryviews into the ring
+    def records(self, maxcount=None):
+        w = self._hdr[_WRITE]
+        r = self._next
+        size = self.size
+        lens = self._lens
+        data = self._data
+        out = []
+        while r < w:
+            if maxcount is not None and len(out) >= maxcount:
+                break
+            p = r % size
+            n = lens[p >> 2]
+            if _WRAP == n:
+                r += size - p
+                continue
+            out.append(data[p + 4:p + 4 + n])
+            r += 4 + ((n + 3) & ~3)
+        self._next = r
+        return out
+
+    # Give the space of all records returned by records() back to the
+    # producer
+    def release(self):
+        self._hdr[_READ] = self._next
+
+    # Bytes committed and not yet released
+    def pending(self):
+        return self._hdr[_WRITE] - self._hdr[_READ]
+
+    # Detach from the shared memory. Views into the ring that are still
+    # alive keep it mapped until they are gone.
+    def close(self):
+        if self._shm is None:
+            return
+        for mv in (self.counters, self._lens, self._data, self._hdr):
+            mv.release()
+        try:
+            self._shm.close()
+        except BufferError:
+            pass
+
+    # Free the shared memory (creating process only)
+    def unlink(self):
+        if self._owner:
+            self._shm.unlink()
+            self._owner = False
+
+
+# Worker output goes through a serializer writer into the ring
+class _RingFile:
+
+    def __init__(self, ring):
+        self.write = ring.put
+
+def _process(views, outring, fs, w, verify, counts):
+    for mv in views:
+        try:
+            ev = decode_packet0(mv, 0, False)
+        except ValueError:
+            counts[CNT_OUT_BAD] += 1
+            continue
+        if fs is not None and not fs.match(ev):
+            counts[CNT_OUT_FILTERED] += 1
+            continue
+        if verify and not check_packet0(mv):
+            counts[CNT_OUT_BAD] += 1
+            continue
+        if w is None:
+            outring.put(mv[:packet0_size(ev.sizedata)])
+        else:
+            w.write(ev)
+        counts[CNT_OUT_RECORDS] += 1
+        counts[CNT_OUT_DATA] += ev.sizedata
+
+def _work(inring, outring, filters, fmt, verify):
+    fs = None
+    if filters is not None:
+        fs = FilterSet()
+        for i, b in enumerate(filters):
+            fs.add(i, vscpEventFilter.from_buffer_copy(b))
+    w = None if fmt is None else writer(_RingFile(outring), fmt, chunk_size=1)
+    counts = [0, 0, 0, 0]
+    spins = 0
+    while True:
+        finished = inring.isFinished()
+        views = inring.records(WORKER_CHUNK)
+        if not views:
+            if finished:
+                break
+            _idle(spins)
+            spins += 1
+            continue
+        spins = 0
+        _process(views, outring, fs, w, verify, counts)
+        del views
+        inring.release()
+        outring.commit()
+        for i in range(4):
+            outring.counters[i] = counts[i]
+
+# Worker process
+def _worker_main(inname, outname, filters, fmt, verify):
+    inring = FrameRing(name=inname)
+    outring = FrameRing(name=outname)
+    try:
+        _work(inring, outring, filters, fmt, verify)
+        outring.commit()
+        outring.finish()
+    finally:
+        inring.close()
+        outring.close()
+
+# Receiver process. Frames are read in bursts and committed to the rings
+# once per burst. A full ring drops the frame and counts an overrun.
+def _receiver_main(names, sock, stop):
+    rings = [FrameRing(name=name) for name in names]
+    n = len(rings)
+    counts = [[0, 0, 0] for _ in rings]
+    buf = bytearray(MAX_FRAME_SIZE)
+    mv = memoryview(buf)
+    sock.setblocking(False)
+    try:
+        while not stop.is_set():
+            if not select.select([sock], [], [], RECEIVE_POLL)[0]:
+                continue
+            for _ in range(RECEIVE_BURST):
+                try:
+                    k = sock.recv_into(buf)
+                except (BlockingIOError, InterruptedError):
+                    break
+                i = _route(mv[:k], n)
+                if rings[i].put(mv[:k], False):
+                    counts[i][CNT_IN_FRAMES] += 1
+                    counts[i][CNT_IN_DATA] += max(0, k - _FRAME_OVERHEAD)
+                else:
+                    counts[i][CNT_IN_OVERRUNS] += 1
+            for ring, c in zip(rings, counts):
+                ring.commit()
+                ring.counters[CNT_IN_FRAMES] = c[CNT_IN_FRAMES]
+                ring.counters[CNT_IN_DATA] = c[CNT_IN_DATA]
+                ring.counters[CNT_IN_OVERRUNS] = c[CNT_IN_OVERRUNS]
+    finally:
+        sock.close()
+        for ring in rings:
+            ring.commit()
+            ring.finish()
+            ring.close()
+
+
+################################################################################
+# Pool of worker processes decoding and filtering packet type 0 frames
+#
+# filters is a vscpEventFilter or a list of them, a frame goes through if
+# any of them lets it through (all frames if None). Frames with a bad CRC
+# (when verify is true), that can not be decoded or are encrypted are
+# counted and dropped. Output records are the frames (fmt None) or NDJSON
+# lines (fmt "ndjson") as bytes.
+#
+# Frames are written either by the creating process with put()/putMany()
+# or by a receiver process started with startReceiver(), not both. close()
+# ends the input, read() and iteration then return the remaining records
+# and stop when all of them are read. While put()/putMany() wait for room
+# in an input ring they read the output rings into a buffer that read()
+# returns first, so the workers never stall on output that nobody reads.
+#
+#   pipe = VscpPipeline(workers=4, filters=flt)
+#   pipe.start()
+#   pipe.putMany(frames)
+#   pipe.close()
+#   records = list(pipe)
+#   pipe.release()
+#
+
+class VscpPipeline:
+
+    def __init__(self, workers=None, filters=None, fmt=None, verify=True,
+                    ring_size=DEFAULT_RING_SIZE, context=None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("At least one worker is needed")
+        if fmt not in (None, "ndjson", "json"):
+            raise ValueError("Output format must be None or 'ndjson'")
+        if isinstance(filters, vscpEventFilter):
+            filters = [filters]
+        if filters is not None:
+            for flt in filters:
+                if not isinstance(flt, vscpEventFilter):
+                    raise TypeError("Filter must be a vscpEventFilter")
+            filters = [bytes(flt) for flt in filters]
+        self.workers = workers
+        self.fmt = fmt
+        self.verify = verify
+        self.ring_size = ring_size
+        self._filters = filters
+        self._ctx = multiprocessing.get_context(context)
+        self._inrings = []
+        self._outrings = []
+        self._procs = []
+        self._receiver = None
+        self._stop = None
+        self._closed = False
+        self._done = False
+        self._first = 0
+        self._counts = None
+        self._buffered = deque()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    # Create the rings and start the workers
+    def start(self):
+        if self._procs:
+            return
+        for i in range(self.workers):
+            inring = FrameRing(self.ring_size)
+            outring = FrameRing(self.ring_size)
+            self._inrings.append(inring)
+            self._outrings.append(outring)
+            p = self._ctx.Process(target=_worker_main, name="vscp-pipeline-{0}".format(i),
+                                    args=(inring.name, outring.name, self._filters,
+                                            self.fmt, self.verify),
+                                    daemon=True)
+            p.start()
+            self._procs.append(p)
+
+    # Start a receiver process reading frames from sock, by default a socket
+    # joined to the VSCP multicast group (multicast) or bound to the VSCP
+    # UDP port. Encrypted frames are counted as bad frames.
+    def startReceiver(self, sock=None, multicast=True,
+                        group=VSCP_MULTICAST_IPV4_ADDRESS_STR,
+                        port=None, interface="0.0.0.0"):
+        if self._receiver is not None:
+            raise VscpError(VSCP_ERROR_ALREADY_DEFINED, "Receiver already started")
+        self.start()
+        if sock is None:
+            if multicast:
+                from vscp_udp import make_multicast_socket
+                sock = make_multicast_socket(group, port or VSCP_DEFAULT_MULTICAST_PORT,
+                                                interface)
+            else:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.bind((interface, port or VSCP_DEFAULT_UDP_PORT))
+        self._stop = self._ctx.Event()
+        self._receiver = self._ctx.Process(target=_receiver_main, name="vscp-pipeline-receiver",
+                                            args=([r.name for r in self._inrings],
+                                                    sock, self._stop),
+                                            daemon=True)
+        self._receiver.start()
+        sock.close()
+
+    def _check(self):
+        if self._receiver is not None:
+            raise VscpError(VSCP_ERROR_NOT_SUPPORTED, "Frames come from the receiver process")
+        if self._closed:
+            raise VscpError(VSCP_ERROR_NOT_OPEN, "Pipeline input is closed")
+
+    # Put a frame into a full ring. Commits the staged frames and reads
+    # the output rings into the buffer until there is room, or returns
+    # False when the deadline has passed.
+    def _putWait(self, ring, frame, deadline):
+        spins = 0
+        while True:
+            for r in self._inrings:
+                r.commit()
+            records = self._collect(None)
+            if records:
+                self._buffered.extend(records)
+                spins = 0
+            if ring.put(frame, False):
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._checkWorkers()
+            _idle(spins)
+            spins += 1
+
+    # Put one frame. Waits while the ring of its worker is full unless
+    # block is false, or for at most timeout seconds. Returns False if the
+    # frame was dropped.
+    def put(self, frame, block=True, timeout=None):
+        return 1 == self.putMany((frame,), block, timeout)
+
+    # Put many frames and make them visible to the workers together.
+    # Waits while a ring is full unless block is false, timeout is for the
+    # whole call. Returns the number of frames put.
+    def putMany(self, frames, block=True, timeout=None):
+        self._check()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        rings = self._inrings
+        n = self.workers
+        cnt = 0
+        for frame in frames:
+            ring = rings[_route(frame, n)]
+            ok = ring.put(frame, False) or (block and self._putWait(ring, frame, deadline))
+            _count_in(ring, frame, ok)
+            cnt += ok
+        for ring in rings:
+            ring.commit()
+        return cnt
+
+    # End the input. The workers finish the frames already put.
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._receiver is not None:
+            self._stop.set()
+            self._receiver.join()
+        for ring in self._inrings:
+            ring.finish()
+
+    def _checkWorkers(self):
+        for i, (p, ring) in enumerate(zip(self._procs, self._outrings)):
+            if p.exitcode is not None and not ring.isFinished():
+                raise VscpError(VSCP_ERROR_INTERNAL,
+                                "Pipeline worker {0} exited with code {1}".format(i, p.exitcode))
+
+    def _collect(self, maxcount):
+        rings = self._outrings
+        n = len(rings)
+        out = []
+        for k in range(n):
+            ring = rings[(self._first + k) % n]
+            views = ring.records(None if maxcount is None else maxcount - len(out))
+            if views:
+                out.extend([bytes(v) for v in views])
+                del views
+                ring.release()
+            if maxcount is not None and len(out) >= maxcount:
+                break
+        self._first = (self._first + 1) % n
+        return out
+
+    # Get up to maxcount output records. Waits up to timeout seconds (for
+    # ever if None) for at least one. Records of one GUID come in the
+    # order their frames were put. Returns an empty list when the input is
+    # closed and all records have been read.
+    def read(self, maxcount=None, timeout=None):
+        if self._buffered:
+            buffered = self._buffered
+            k = len(buffered) if maxcount is None else min(maxcount, len(buffered))
+            return [buffered.popleft() for _ in range(k)]
+        if self._done or not self._outrings:
+            return []
+        deadline = None if timeout is None else time.monotonic() + timeout
+        spins = 0
+        while True:
+            finished = all(ring.isFinished() for ring in self._outrings)
+            out = self._collect(maxcount)
+            if out:
+                return out
+            if finished:
+                self._done = True
+                return out
+            if deadline is not None and time.monotonic() >= deadline:
+                return out
+            self._checkWorkers()
+            _idle(spins)
+            spins += 1
+
+    def __iter__(self):
+        while True:
+            records = self.read()
+            if not records:
+                return
+            for rec in records:
+                yield rec
+
+    # Wait for the workers to finish (after close())
+    def join(self, timeout=None):
+        for p in self._procs:
+            p.join(timeout)
+
+    def _sums(self):
+        if self._counts is not None:
+            return self._counts
+        cin = [sum(r.counters[i] for r in self._inrings) for i in range(3)]
+        cout = [sum(r.counters[i] for r in self._outrings) for i in range(4)]
+        return cin, cout
+
+    # Frames in and records out as VSCPStatistics. Frames dropped because
+    # a ring was full are counted as overruns.
+    def getStatistics(self):
+        cin, cout = self._sums()
+        stats = VSCPStatistics()
+        stats.cntReceiveFrames = cin[CNT_IN_FRAMES]
+        stats.cntReceiveData = cin[CNT_IN_DATA]
+        stats.cntOverruns = cin[CNT_IN_OVERRUNS]
+        stats.cntTransmitFrames = cout[CNT_OUT_RECORDS]
+        stats.cntTransmitData = cout[CNT_OUT_DATA]
+        return stats
+
+    # Frames dropped as they could not be decoded or had a bad CRC
+    def getBadFrameCount(self):
+        return self._sums()[1][CNT_OUT_BAD]
+
+    # Frames dropped by the filters
+    def getFilteredCount(self):
+        return self._sums()[1][CNT_OUT_FILTERED]
+
+    # Stop all processes and free the shared memory. Counters can still
+    # be read afterwards.
+    def release(self):
+        if not self._procs:
+            return
+        self.close()
+        for p in self._procs:
+            p.join(RELEASE_TIMEOUT)
+            if p.is_alive():
+                p.terminate()
+                p.join()
+        self._counts = self._sums()
+        for ring in self._inrings + self._outrings:
+            ring.close()
+            ring.unlink()
+        self._procs = []
+        self._inrings = []
+        self._outrings = []
+        self._done = True
+
+def _count_in(ring, frame, ok):
+    if ok:
+        ring.counters[CNT_IN_FRAMES] += 1
+        ring.counters[CNT_IN_DATA] += max(0, len(frame) - _FRAME_OVERHEAD)
+    else:
+        ring.counters[CNT_IN_OVERRUNS] += 1
@@ -0,0 +1,439 @@
+# FILE: vscp_register.py
+#
+# Node register cache and pipelined register read/write
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# A Level I node has 256 registers. Registers 0x00-0x7F are user registers
+# and are paged, registers 0x80-0xFF are the standard registers
+# (VSCP_STD_REGISTER_*) and are the same on all pages.
+#
+# RegisterCache keeps the registers of one node. Reads are served from the
+# cache while values are fresh and missing registers are fetched in as few
+# block reads as possible. How long a value stays fresh is set per register.
+# Registers that can't change while the node runs (GUID, versions, MDF URL)
+# are kept until the node reboots and the alarm register, which is cleared
+# when read, is never cached.
+#
+# Registers are read and written through a transport with the coroutines
+#
+#   readRegisters(guid, page, offset, count) -> bytes
+#   writeRegisters(guid, page, offset, data) -> bytes read back
+#
+# and the attribute maxBlock (most registers read with one request).
+# EventRegisterTransport implements this with the extended page read/write
+# events of CLASS1.PROTOCOL over any event connection.
+
+import time
+import asyncio
+import inspect
+
+from vscp import *
+
+VSCP_STD_REGISTER_START                     =   0x80
+VSCP_REGISTER_COUNT                         =   0x100
+
+# Default time a register value is fresh (seconds)
+DEFAULT_TTL = 60.0
+
+# Never expires until the node reboots or the cache is invalidated
+TTL_FOREVER = float("inf")
+
+# Fresh registers in a gap between stale ones shorter than this are read
+# again rather than splitting the block read in two
+COALESCE_GAP = 8
+
+# Default time to wait for a response and number of retries
+DEFAULT_TIMEOUT = 1.0
+DEFAULT_RETRIES = 2
+
+# Most registers in one extended page read
+DEFAULT_MAX_BLOCK = 128
+
+# Register value bytes in one extended page write or response
+_FRAME_VALUES = 4
+
+# Rules for the standard registers as (first, count, ttl)
+STD_REGISTER_TTL = ( (VSCP_STD_REGISTER_ALARM_STATUS, 1, 0),
+                     (VSCP_STD_REGISTER_MAJOR_VERSION, 3, TTL_FOREVER),
+                     (VSCP_STD_REGISTER_USER_MANDEV_ID, 8, TTL_FOREVER),
+                     (VSCP_STD_REGISTER_FIRMWARE_MAJOR, 6, TTL_FOREVER),
+                     (VSCP_STD_REGISTER_GUID, 16, TTL_FOREVER),
+                     (VSCP_STD_REGISTER_DEVICE_URL, 32, TTL_FOREVER) )
+
+def _spans(offset, count, page):
+    # Split a register range into (page, first, count) for each register space
+    if offset < 0 or count < 0 or offset + count > VSCP_REGISTER_COUNT:
+        raise ValueError("Register range outside 0x00-0xFF")
+    out = []
+    end = offset + count
+    if offset < VSCP_STD_REGISTER_START:
+        n = min(end, VSCP_STD_REGISTER_START) - offset
+        if n:
+            out.append((page, offset, n))
+    if end > VSCP_STD_REGISTER_START:
+        first = max(offset, VSCP_STD_REGISTER_START)
+        out.append((None, first, end - first))
+    return out
+
+# Split the registers in regs (sorted) into (first, count) blocks. Runs
+# closer than gap are joined. No block is longer than maxblock.
+def coalesce(regs, maxblock, gap=COALESCE_GAP):
+    blocks = []
+    for r in regs:
+        if blocks:
+            first, n = blocks[-1]
+            if r - (first + n) < gap and r - first < maxblock:
+                blocks[-1] = (first, r - first + 1)
+                continue
+        blocks.append((r, 1))
+    return blocks
+
+
+################################################################################
+# Register values of one node
+#
+#   cache = RegisterCache(guid, transport)
+#   values = await cache.read(0x10, 16, page=1)
+#   guid = await cache.getGuid()
+#   await cache.write(0x12, b'\x01', page=1)
+#
+
+class RegisterCache:
+
+    def __init__(self, guid, transport, ttl=DEFAULT_TTL, std_ttl=STD_REGISTER_TTL,
+                    gap=COALESCE_GAP):
+        self.guid = guid if isinstance(guid, vscpGuid) else vscpGuid(guid)
+        self.transport = transport
+        self.gap = gap
+        self.cntReads = 0           # Block reads issued
+        self.cntHits = 0            # Registers served from cache
+        # Page (None for standard registers) -> bytearray of values and a
+        # list with the time each value expires
+        self._values = {}
+        self._expires = {}
+        self._pending = {}
+        self._ttl = [ttl] * VSCP_REGISTER_COUNT
+        for first, count, t in std_ttl:
+            self.setTTL(first, count, t)
+
+    # Set how long values of registers are fresh. 0 disables caching and
+    # TTL_FOREVER keeps values until the node reboots.
+    def setTTL(self, offset, count, ttl):
+        for r in range(offset, offset + count):
+            self._ttl[r] = ttl
+
+    def _page(self, page):
+        vals = self._values.get(page)
+        if vals is None:
+            vals = self._values[page] = bytearray(VSCP_REGISTER_COUNT)
+            self._expires[page] = [0.0] * VSCP_REGISTER_COUNT
+        return vals, self._expires[page]
+
+    # Mark registers as stale on page (all pages if None). Registers kept
+    # until reboot are not touched, use nodeRestarted() for those.
+    def invalidate(self, offset=0, count=VSCP_REGISTER_COUNT, page=None):
+        for p, first, n in _spans(offset, count, page):
+            pages = [p] if p is not None or first >= VSCP_STD_REGISTER_START else \
+                    [q for q in self._expires if q is not None]
+            for q in pages:
+                exp = self._expires.get(q)
+                if exp is None:
+                    continue
+                for r in range(first, first + n):
+                    if self._ttl[r] != TTL_FOREVER:
+                        exp[r] = 0.0
+
+    # Forget everything. Use when the node has rebooted or was replaced.
+    def nodeRestarted(self):
+        self._values.clear()
+        self._expires.clear()
+
+    # Value of register from the cache, None if not fresh
+    def getCached(self, reg, page=0):
+        p = None if reg >= VSCP_STD_REGISTER_START else page
+        if p not in self._values or self._expires[p][reg] <= time.monotonic():
+            return None
+        return self._values[p][reg]
+
+    async def _fetch(self, page, first, count):
+        self.cntReads += 1
+        data = await self.transport.readRegisters(self.guid, 0 if page is None else page,
+                                                    first, count)
+        self._store(page, first, data)
+
+    def _store(self, page, first, data):
+        vals, exp = self._page(page)
+        now = time.monotonic()
+        vals[first:first + len(data)] = data
+        ttl = self._ttl
+        for r in range(first, first + len(data)):
+            exp[r] = now + ttl[r]
+
+    async def _read(self, page, first, count):
+        vals, exp = self._page(page)
+        now = time.monotonic()
+        pending = self._pending
+        waits = set()
+        stale = []
+        for r in range(first, first + count):
+            if exp[r] > now:
+                self.cntHits += 1
+                continue
+            fut = pending.get((page, r))
+            if fut is not None:
+                waits.add(fut)
+            else:
+                stale.append(r)
+        if stale:
+            maxblock = getattr(self.transport, "maxBlock", DEFAULT_MAX_BLOCK)
+            for bfirst, bcount in coalesce(stale, maxblock, self.gap):
+                fut = asyncio.ensure_future(self._fetch(page, bfirst, bcount))
+                for r in range(bfirst, bfirst + bcount):
+                    pending[(page, r)] = fut
+                fut.add_done_callback(lambda f, p=page, a=bfirst, n=bcount: self._done(f, p, a, n))
+                waits.add(fut)
+        if waits:
+            await asyncio.gather(*waits)
+        return bytes(vals[first:first + count])
+
+    def _done(self, fut, page, first, count):
+        for r in range(first, first + count):
+            if self._pending.get((page, r)) is fut:
+                del self._pending[(page, r)]
+
+    # Read count registers from offset. Fresh values come from the cache,
+    # the rest is read from the node. Concurrent reads of the same
+    # registers share one request.
+    async def read(self, offset, count=1, page=0):
+        parts = [await self._read(p, first, n) for p, first, n in _spans(offset, count, page)]
+        return b"".join(parts)
+
+    # Write registers and update the cache with the values read back
+    async def write(self, offset, data, page=0):
+        data = bytes(data)
+        out = []
+        for p, first, n in _spans(offset, len(data), page):
+            pos = first - offset
+            back = await self.transport.writeRegisters(self.guid, 0 if p is None else p,
+                                                        first, data[pos:pos + n])
+            self._store(p, first, back)
+            out.append(back)
+        return b"".join(out)
+
+    # Standard register helpers
+
+    async def getGuid(self):
+        return vscpGuid(await self.read(VSCP_STD_REGISTER_GUID, 16))
+
+    async def getFirmwareVersion(self):
+        return tuple(await self.read(VSCP_STD_REGISTER_FIRMWARE_MAJOR, 3))
+
+    async def getPagesCount(self):
+        return (await self.read(VSCP_STD_REGISTER_PAGES_COUNT))[0]
+
+    async def getMdfUrl(self):
+        return (await self.read(VSCP_STD_REGISTER_DEVICE_URL, 32)).split(b'\x00')[0].decode("latin-1")
+
+
+################################################################################
+# Register caches for many nodes sharing one transport
+#
+#   caches = RegisterCaches(transport)
+#   values = await caches.readMany(guids, 0x80, 128)      # guid -> bytes
+#
+
+class RegisterCaches:
+
+    def __init__(self, transport, **kwargs):
+        self.transport = transport
+        self._kwargs = kwargs
+        self._caches = {}
+
+    def __len__(self):
+        return len(self._caches)
+
+    def __contains__(self, guid):
+        return vscpGuid(guid) in self._caches
+
+    # Cache for node with guid
+    def get(self, guid):
+        g = vscpGuid(guid)
+        c = self._caches.get(g)
+        if c is None:
+            c = self._caches[g] = RegisterCache(g, self.transport, **self._kwargs)
+        return c
+
+    def remove(self, guid):
+        self._caches.pop(vscpGuid(guid), None)
+
+    # Read the same registers from many nodes at the same time. Returns a
+    # dict guid -> bytes. Nodes that failed map to the exception.
+    async def readMany(self, guids, offset, count=1, page=0):
+        caches = [self.get(g) for g in guids]
+        res = await asyncio.gather(*[c.read(offset, count, page) for c in caches],
+                                    return_exceptions=True)
+        return dict((c.guid, r) for c, r in zip(caches, res))
+
+
+################################################################################
+# Register transport using CLASS1.PROTOCOL extended page read/write events
+#
+# send(ev) is called to send an event (it may return an awaitable) and all
+# received events must be given to feed(). Requests to different nodes run
+# at the same time, at most max_inflight at a time for each node.
+#
+#   transport = EventRegisterTransport(client.send)
+#   async for ev in client.receiveLoop():
+#       transport.feed(ev)
+#
+# With level2=True events are sent as CLASS2.LEVEL1.PROTOCOL with the
+# destination GUID first in data, as needed when a Level I node is
+# reached through a VSCP server.
+#
+
+class _Request:
+
+    __slots__ = ("nickname", "page", "first", "count", "data", "received", "future")
+
+    def __init__(self, nickname, page, first, count, future):
+        self.nickname = nickname
+        self.page = page
+        self.first = first
+        self.count = count
+        self.data = bytearray(count)
+        self.received = 0
+        self.future = future
+
+class EventRegisterTransport:
+
+    def __init__(self, send, guid=None, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                    maxblock=DEFAULT_MAX_BLOCK, max_inflight=1, level2=False):
+        self._send = send
+        self.guid = bytes(16) if guid is None else bytes(vscpGuid(guid))
+        self.timeout = timeout
+        self.retries = retries
+        self.maxBlock = maxblock
+        self.max_inflight = max_inflight
+        self.level2 = level2
+        self.cntTimeouts = 0
+        self._requests = {}         # (nickname, page) -> [_Request]
+        self._limits = {}
+
+    def _event(self, guid, vscptype, data):
+        if self.level2:
+            return vscpEventEx.new(VSCP_CLASS2_LEVEL1_PROTOCOL, vscptype, self.guid,
+                                    bytes(guid) + data)
+        return vscpEventEx.new(VSCP_CLASS1_PROTOCOL, vscptype, self.guid, data)
+
+    # Give a received event to the transport. Returns True if it was a
+    # response to a request.
+    def feed(self, ev):
+        vscpclass = ev.vscpclass
+        data = bytes(ev.data[:ev.sizedata])
+        if vscpclass == VSCP_CLASS2_LEVEL1_PROTOCOL:
+            data = data[16:]
+        elif vscpclass != VSCP_CLASS1_PROTOCOL:
+            return False
+        if ev.vscptype != VSCP_TYPE_PROTOCOL_EXTENDED_PAGE_RESPONSE or len(data) < 5:
+            return False
+        page = (data[1] << 8) | data[2]
+        reg = data[3]
+        values = data[4:]
+        for req in self._requests.get((ev.guid[15], page), ()):
+            if req.first <= reg < req.first + req.count:
+                n = min(len(values), req.first + req.count - reg)
+                pos = reg - req.first
+                req.data[pos:pos + n] = values[:n]
+                req.received += n
+                if req.received >= req.count and not req.future.done():
+                    req.future.set_result(bytes(req.data))
+                return True
+        return False
+
+    def _limit(self, nickname):
+        sem = self._limits.get(nickname)
+        if sem is None:
+            sem = self._limits[nickname] = asyncio.Semaphore(self.max_inflight)
+        return sem
+
+    async def _request(self, guid, page, first, count, events):
+        nickname = bytes(guid)[15]
+        async with self._limit(nickname):
+            loop = asyncio.get_running_loop()
+            for attempt in range(self.retries + 1):
+                req = _Request(nickname, page, first, count, loop.create_future())
+                key = (nickname, page)
+                self._requests.setdefault(key, []).append(req)
+                try:
+                    for ev in events:
+                        r = self._send(ev)
+                        if inspect.isawaitable(r):
+                            await r
+                    return await asyncio.wait_for(asyncio.shield(req.future), self.timeout)
+                except asyncio.TimeoutError:
+                    self.cntTimeouts += 1
+                finally:
+                    self._requests[key].remove(req)
+                    if not self._requests[key]:
+                        del self._requests[key]
+        raise VscpError(VSCP_ERROR_TIMEOUT,
+                        "No register response from node {0}".format(nickname))
+
+    async def readRegisters(self, guid, page, offset, count):
+        if not 0 < count <= 255:
+            raise ValueError("Can read 1-255 registers at a time")
+        ev = self._event(guid, VSCP_TYPE_PROTOCOL_EXTENDED_PAGE_READ,
+                            bytes((bytes(guid)[15], (page >> 8) & 0xFF, page & 0xFF,
+                                    offset, count)))
+        return await self._request(guid, page, offset, count, [ev])
+
+    async def writeRegisters(self, guid, page, offset, data):
+        nickname = bytes(guid)[15]
+        events = []
+        for pos in range(0, len(data), _FRAME_VALUES):
+            events.append(self._event(guid, VSCP_TYPE_PROTOCOL_EXTENDED_PAGE_WRITE,
+                                        bytes((nickname, (page >> 8) & 0xFF, page & 0xFF,
+                                                offset + pos)) +
+                                        bytes(data[pos:pos + _FRAME_VALUES])))
+        return await self._request(guid, page, offset, len(data), events)
+
+
+# Response events a node sends for an extended page read or write of
+# count registers from offset. values are the register values.
+def make_page_responses(guid, page, offset, values, level2=False):
+    out = []
+    for i, pos in enumerate(range(0, len(values), _FRAME_VALUES)):
+        data = bytes((i & 0xFF, (page >> 8) & 0xFF, page & 0xFF, (offset + pos) & 0xFF)) + \
+                bytes(values[pos:pos + _FRAME_VALUES])
+        if level2:
+            out.append(vscpEventEx.new(VSCP_CLASS2_LEVEL1_PROTOCOL,
+                                        VSCP_TYPE_PROTOCOL_EXTENDED_PAGE_RESPONSE,
+                                        guid, bytes(16) + data))
+        else:
+            out.append(vscpEventEx.new(VSCP_CLASS1_PROTOCOL,
+                                        VSCP_TYPE_PROTOCOL_EXTENDED_PAGE_RESPONSE,
+                                        guid, data))
+    return out
@@ -0,0 +1,319 @@
+# FILE: vscp_rollup.py
+#
+# Streaming min/max/avg rollups of measurement events
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Measurements are aggregated per series, a series being one sensor
+# (GUID, class, type, sensor index). Windows are window seconds long and
+# start every slide seconds (slide == window gives tumbling windows).
+# Time is the event timestamp, in milliseconds like everywhere else in
+# the library unless units_per_second says otherwise. The 32-bit timestamp
+# wraps after about 49.7 days (in ms), so it is unwrapped per series.
+#
+# Each series keeps count/sum/min/max for the slide long panes that are
+# still open, never the values themselves, so the memory used by a
+# series is bounded by (window + lateness) / slide panes however many
+# events it gets.
+#
+# A window is emitted when the newest timestamp of its series, minus
+# lateness, has passed the end of the window. Events older than the end
+# of the last emitted window of their series are late, they are dropped
+# and counted in cntLate.
+#
+#   r = RollupEngine(window=60, slide=10, lateness=5)
+#   for ev in events:
+#       for rec in r.update(ev):
+#           print(rec.guid, rec.index, rec.start, rec.count, rec.avg)
+#   closed = r.flush()
+
+import struct
+from array import array
+from collections import namedtuple
+
+from vscp import *
+from vscp_measurement import decode_batch, decode_measurement, is_measurement, \
+                                VSCP_CLASS2_MEASUREMENT_FLOAT
+
+try:
+    import numpy as np
+except ImportError:     # pragma: no cover
+    np = None
+
+# Series with fewer values in a batch are added value by value, NumPy
+# only pays off for longer ones
+VECTOR_MIN_ROWS = 64
+
+# Event timestamps are milliseconds (see vscpEventEx.setTimestamp)
+TIMESTAMP_UNITS_PER_SECOND = 1000
+
+_WRAP = 1 << 32
+_HALF = 1 << 31
+
+# Rollup of one window of one series. start and end are unwrapped
+# timestamps.
+Rollup = namedtuple("Rollup",
+                    "guid vscpclass vscptype index unit zone subzone start end count min max avg")
+
+_DOUBLE = struct.Struct(">d")
+
+
+class _Series:
+
+    __slots__ = ("key", "unit", "zone", "subzone", "panes", "last", "offset",
+                    "newest", "nextStart")
+
+    def __init__(self, key):
+        self.key = key
+        self.unit = 0
+        self.zone = 0
+        self.subzone = 0
+        self.panes = {}             # pane -> [count, sum, min, max]
+        self.last = None            # Last raw timestamp
+        self.offset = 0
+        self.newest = None
+        self.nextStart = None       # Start of the next window to emit
+
+    # Unwrapped time of raw 32-bit timestamp ts
+    def unwrap(self, ts):
+        last = self.last
+        if last is not None:
+            if ts < last - _HALF:
+                self.offset += _WRAP
+            elif ts > last + _HALF:
+                self.offset -= _WRAP
+        self.last = ts
+        return ts + self.offset
+
+
+################################################################################
+# Rollup engine
+#
+
+class RollupEngine:
+
+    def __init__(self, window=60.0, slide=None, lateness=0.0,
+                    units_per_second=TIMESTAMP_UNITS_PER_SECOND):
+        self.window = int(round(window * units_per_second))
+        self.slide = self.window if slide is None else int(round(slide * units_per_second))
+        self.lateness = int(round(lateness * units_per_second))
+        if self.slide <= 0 or self.window % self.slide:
+            raise ValueError("Window must be a multiple of slide")
+        if self.lateness < 0:
+            raise ValueError("Lateness can not be negative")
+        self.cntLate = 0
+        self._series = {}
+
+    # Number of series
+    def __len__(self):
+        return len(self._series)
+
+    def _get(self, key):
+        s = self._series.get(key)
+        if s is None:
+            s = self._series[key] = _Series(key)
+        return s
+
+    # Add count values with sum, min and max to the pane holding time t
+    def _add(self, s, t, count, total, lo, hi, newest, out):
+        if s.nextStart is not None and t < s.nextStart + self.window - self.slide:
+            self.cntLate += count
+            return
+        p = t // self.slide
+        agg = s.panes.get(p)
+        if agg is None:
+            s.panes[p] = [count, total, lo, hi]
+        else:
+            agg[0] += count
+            agg[1] += total
+            if lo < agg[2]:
+                agg[2] = lo
+            if hi > agg[3]:
+                agg[3] = hi
+        if s.newest is None or newest > s.newest:
+            s.newest = newest
+            self._emit(s, newest - self.lateness, out)
+
+    # Emit the windows of s that end at or before watermark
+    def _emit(self, s, watermark, out):
+        panes = s.panes
+        if not panes:
+            return
+        slide = self.slide
+        n = self.window // slide
+        start = (min(panes) - n + 1) * slide
+        if s.nextStart is not None and start < s.nextStart:
+            start = s.nextStart
+        while start + self.window <= watermark:
+            first = start // slide
+            count = 0
+            total = 0.0
+            lo = hi = None
+            for p in range(first, first + n):
+                agg = panes.get(p)
+                if agg is None:
+                    continue
+                count += agg[0]
+                total += agg[1]
+                if lo is None or agg[2] < lo:
+                    lo = agg[2]
+                if hi is None or agg[3] > hi:
+                    hi = agg[3]
+            if count:
+                c, t, g, i = s.key
+                out.append(Rollup(g, c, t, i, s.unit, s.zone, s.subzone,
+                                    start, start + self.window, count, lo, hi, total / count))
+            s.nextStart = start + slide
+            panes.pop(first, None)
+            if not panes:
+                return
+            start = (min(panes) - n + 1) * slide
+            if start < s.nextStart:
+                start = s.nextStart
+
+    # Add one measurement event. t is the time in timestamp units (default
+    # the event timestamp). Returns a list of the windows closed by the event.
+    # Events that are not measurements, or have no numeric value, are
+    # ignored.
+    def update(self, ev, t=None):
+        out = []
+        if not is_measurement(ev.vscpclass):
+            return out
+        try:
+            m = decode_measurement(ev)
+            value = float(m.value)
+        except (ValueError, TypeError):
+            return out
+        s = self._get((ev.vscpclass, ev.vscptype, vscpGuid(bytes(ev.guid)), m.index))
+        s.unit = m.unit
+        s.zone = m.zone or 0
+        s.subzone = m.subzone or 0
+        t = s.unwrap(ev.timestamp) if t is None else t
+        self._add(s, t, 1, value, value, value, t, out)
+        return out
+
+    # Add all measurement events of a VscpEventBatch. times is an optional
+    # sequence of times (timestamp units) for the rows. Returns a list of the
+    # windows closed.
+    def updateBatch(self, batch, times=None, use_numpy=True):
+        out = []
+        for key, ser in decode_batch(batch, use_numpy).items():
+            s = self._get(key)
+            s.unit = int(ser.unit[-1])
+            s.zone = int(ser.zone[-1])
+            s.subzone = int(ser.subzone[-1])
+            vector = np is not None and isinstance(ser.value, np.ndarray) and \
+                        len(ser.value) >= VECTOR_MIN_ROWS
+            if times is not None:
+                t = [times[int(r)] for r in ser.rows]
+            elif vector:
+                t = self._unwrapArray(s, ser.timestamp)
+            else:
+                t = [s.unwrap(int(ts)) for ts in ser.timestamp]
+            if vector and self._addArray(s, np.asarray(t, dtype=np.int64), ser.value, out):
+                continue
+            values = ser.value.tolist()
+            add = self._add
+            for ti, v in zip(t, values):
+                ti = int(ti)
+                add(s, ti, 1, v, v, v, ti, out)
+        return out
+
+    # Unwrapped times of a series of raw timestamps
+    def _unwrapArray(self, s, ts):
+        raw = ts.astype(np.int64)
+        prev = np.empty_like(raw)
+        prev[0] = raw[0] if s.last is None else s.last
+        prev[1:] = raw[:-1]
+        step = raw - prev
+        adj = np.cumsum(np.where(step < -_HALF, _WRAP, 0) - np.where(step > _HALF, _WRAP, 0))
+        t = raw + s.offset + adj
+        s.offset += int(adj[-1])
+        s.last = int(raw[-1])
+        return t
+
+    # Add values in time order a pane at a time. Returns False, with
+    # nothing added, if times are not in order.
+    def _addArray(self, s, t, values, out):
+        if len(t) > 1 and (np.diff(t) < 0).any():
+            return False
+        panes = t // self.slide
+        bounds = np.flatnonzero(np.diff(panes)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(t)]))
+        counts = ends - starts
+        sums = np.add.reduceat(values, starts)
+        mins = np.minimum.reduceat(values, starts)
+        maxs = np.maximum.reduceat(values, starts)
+        add = self._add
+        for a, b, c, total, lo, hi in zip(starts.tolist(), ends.tolist(), counts.tolist(),
+                                        sums.tolist(), mins.tolist(), maxs.tolist()):
+            first = int(t[a])
+            late = s.nextStart is not None and first < s.nextStart + self.window - self.slide
+            if late:
+                # Part of the pane may be late, take it value by value
+                for i in range(a, b):
+                    ti = int(t[i])
+                    v = float(values[i])
+                    add(s, ti, 1, v, v, v, ti, out)
+            else:
+                add(s, first, c, total, lo, hi, int(t[b - 1]), out)
+        return True
+
+    # Emit all open windows and forget all series
+    def flush(self):
+        out = []
+        for s in self._series.values():
+            self._emit(s, float("inf"), out)
+        self._series.clear()
+        return out
+
+
+################################################################################
+# Output
+#
+
+# Rollup as a CLASS2.MEASUREMENT_FLOAT event with the value of field stat
+# ("avg", "min", "max" or "count"). The event is sent from guid (default
+# the GUID of the series).
+def rollup_event(r, stat="avg", guid=None):
+    if stat not in ("avg", "min", "max", "count"):
+        raise ValueError("Unknown statistic " + str(stat))
+    data = bytes((r.index, r.zone, r.subzone, r.unit)) + _DOUBLE.pack(float(getattr(r, stat)))
+    return vscpEventEx.new(VSCP_CLASS2_MEASUREMENT_FLOAT, r.vscptype,
+                            r.guid if guid is None else guid, data, r.end & 0xFFFFFFFF)
+
+# Rollups as columns. Returns a dict field -> NumPy array (array.array
+# without NumPy or with use_numpy=False) for all fields except guid,
+# which is a list.
+def rollup_arrays(records, use_numpy=True):
+    cols = {"guid": [r.guid for r in records]}
+    for i, (name, code) in enumerate(zip(Rollup._fields, "-HHBBBBqqQddd")):
+        if name == "guid":
+            continue
+        col = array(code, [r[i] for r in records])
+        cols[name] = np.frombuffer(col, dtype=col.typecode).copy() \
+                        if np is not None and use_numpy else col
+    return cols
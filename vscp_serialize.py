@@ -0,0 +1,375 @@
+# FILE: vscp_serialize.py
+#
+# Streaming JSON/XML/HTML writers and readers for VSCP events
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# Formats
+#
+#   ndjson  One VSCP_JSON_EVENT_TEMPLATE object per line
+#   xml     VSCP_XML_EVENT_TEMPLATE elements inside an <events> element
+#   html    VSCP_HTML_EVENT_TEMPLATE blocks
+#
+
+import io
+import re
+import json
+import html
+from ctypes import addressof, string_at
+from xml.etree.ElementTree import XMLPullParser
+from xml.sax.saxutils import escape as xml_escape
+
+from vscp import *
+from vscp_batch import VscpEventBatch
+
+# Bytes collected before they are written to the file or socket
+DEFAULT_CHUNK_SIZE = 65536
+
+_EX_DATA_OFFSET = vscpEventEx.data.offset
+
+_DEC = [str(i) for i in range(256)]
+_HEX = ["0x%02X" % i for i in range(256)]
+
+# (year,month,day,hour,minute,second) from "2017-01-13T10:16:02[Z]"
+def _parse_dt(s):
+    s = s.strip()
+    if len(s) < 19:
+        return False
+    return (int(s[0:4]), int(s[5:7]), int(s[8:10]),
+            int(s[11:13]), int(s[14:16]), int(s[17:19]))
+
+
+################################################################################
+# Base for the writers
+#
+# Events are formatted into a list of strings that is encoded and written
+# when it holds chunk_size characters. fp can be a binary file, a text
+# file or a socket.
+#
+
+class _Writer:
+
+    header = ""
+    footer = ""
+
+    def __init__(self, fp, chunk_size=DEFAULT_CHUNK_SIZE, note=""):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.note = note
+        self.count = 0
+        self._parts = []
+        self._size = 0
+        self._lastdt = None
+        self._lastdtstr = ""
+        if hasattr(fp, "sendall"):
+            self._out = lambda s: fp.sendall(s.encode("utf-8"))
+        elif isinstance(fp, io.TextIOBase):
+            self._out = fp.write
+        else:
+            self._out = lambda s: fp.write(s.encode("utf-8"))
+        if self.header:
+            self._add(self.header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _add(self, s):
+        self._parts.append(s)
+        self._size += len(s)
+        if self._size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._parts:
+            self._out("".join(self._parts))
+            self._parts = []
+            self._size = 0
+
+    def close(self):
+        if self.footer:
+            self._add(self.footer)
+        self.flush()
+
+    # Date/time string. Consecutive events usually share the same second
+    # so the last one is reused.
+    def _dt(self, dt):
+        if dt != self._lastdt:
+            self._lastdt = dt
+            self._lastdtstr = "%04d-%02d-%02dT%02d:%02d:%02dZ" % dt
+        return self._lastdtstr
+
+    # Write one event (vscpEventEx, vscpEvent or Packet0View)
+    def write(self, ev):
+        if isinstance(ev, vscpEventEx):
+            data = string_at(addressof(ev) + _EX_DATA_OFFSET, ev.sizedata)
+        elif isinstance(ev, vscpEvent):
+            data = string_at(ev.pdata, ev.sizedata) if ev.sizedata else b''
+        else:
+            data = ev.data
+        self._add(self._format(ev.head, ev.obid,
+                                self._dt((ev.year, ev.month, ev.day,
+                                            ev.hour, ev.minute, ev.second)),
+                                ev.timestamp, ev.vscpclass, ev.vscptype,
+                                vscpGuid(bytes(ev.guid)).getAsString(), data))
+        self.count += 1
+
+    def writeMany(self, events):
+        if isinstance(events, VscpEventBatch):
+            self.writeBatch(events)
+            return
+        for ev in events:
+            self.write(ev)
+
+    # Write all rows of a VscpEventBatch without creating event objects
+    def writeBatch(self, batch):
+        fmt = self._format
+        add = self._add
+        dtf = self._dt
+        guids = batch.guid
+        data = memoryview(batch.data)
+        offsets = batch.offsets
+        for i in range(len(batch)):
+            add(fmt(batch.head[i], batch.obid[i],
+                    dtf((batch.year[i], batch.month[i], batch.day[i],
+                            batch.hour[i], batch.minute[i], batch.second[i])),
+                    batch.timestamp[i], batch.vscpclass[i], batch.vscptype[i],
+                    vscpGuid(bytes(guids[i*16:i*16+16])).getAsString(),
+                    data[offsets[i]:offsets[i+1]]))
+        self.count += len(batch)
+
+
+# Keys of the JSON template in order
+_JSON_KEYS = list(VSCP_JSON_EVENT_TEMPLATE.keys())
+assert _JSON_KEYS == ["vscpHead", "vscpObId", "vscpDateTime", "vscpTimeStamp", "vscpClass",
+                        "vscpType", "vscpGuid", "vscpData", "vscpNote"]
+
+_JSON_LINE = ('{"vscpHead":%d,"vscpObId":%d,"vscpDateTime":"%s","vscpTimeStamp":%d,'
+                '"vscpClass":%d,"vscpType":%d,"vscpGuid":"%s","vscpData":[%s],"vscpNote":%s}\n')
+
+################################################################################
+# Newline delimited JSON, one VSCP_JSON_EVENT_TEMPLATE object per line
+#
+
+class NdjsonWriter(_Writer):
+
+    def __init__(self, fp, chunk_size=DEFAULT_CHUNK_SIZE, note=""):
+        super().__init__(fp, chunk_size, note)
+        self._note = json.dumps(note)
+
+    def _format(self, head, obid, dt, timestamp, vscpclass, vscptype, g, data):
+        return _JSON_LINE % (head, obid, dt, timestamp, vscpclass, vscptype, g,
+                                ",".join([_DEC[b] for b in data]), self._note)
+
+
+################################################################################
+# XML, VSCP_XML_EVENT_TEMPLATE elements inside an <events> root element
+#
+
+class XmlWriter(_Writer):
+
+    header = "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<events>\n"
+    footer = "\n</events>\n"
+
+    def __init__(self, fp, chunk_size=DEFAULT_CHUNK_SIZE, note=""):
+        super().__init__(fp, chunk_size, note)
+        self._note = xml_escape(note, {'"': "&quot;"})
+
+    def _format(self, head, obid, dt, timestamp, vscpclass, vscptype, g, data):
+        return VSCP_XML_EVENT_TEMPLATE % (head, obid, dt, timestamp, vscpclass, vscptype, g,
+                                            len(data), ",".join([_HEX[b] for b in data]),
+                                            self._note) + "\n"
+
+
+################################################################################
+# HTML, one VSCP_HTML_EVENT_TEMPLATE block per event
+#
+
+class HtmlWriter(_Writer):
+
+    def __init__(self, fp, chunk_size=DEFAULT_CHUNK_SIZE, note=""):
+        super().__init__(fp, chunk_size, note)
+        self._note = html.escape(note)
+
+    def _format(self, head, obid, dt, timestamp, vscpclass, vscptype, g, data):
+        return VSCP_HTML_EVENT_TEMPLATE % (vscpclass, vscptype, len(data),
+                                            ",".join([_DEC[b] for b in data]),
+                                            g, head, dt, timestamp, obid,
+                                            self._note) + "\n"
+
+
+################################################################################
+# Base for the readers
+#
+# Feed the reader chunks of text or bytes as they arrive. feed() returns
+# the events completed by the chunk as vscpEventEx, feedBatch() appends
+# them to a VscpEventBatch instead.
+#
+
+class _Reader:
+
+    def __init__(self):
+        self._pending = ""
+        self._decoder = None
+
+    def _text(self, chunk):
+        if isinstance(chunk, str):
+            return chunk
+        if self._decoder is None:
+            import codecs
+            self._decoder = codecs.getincrementaldecoder("utf-8")()
+        return self._decoder.decode(bytes(chunk))
+
+    def feed(self, chunk):
+        return [vscpEventEx.new(c, t, g, d, ts, h, o, dt)
+                    for h, o, dt, ts, c, t, g, d in self._rows(self._text(chunk))]
+
+    def feedBatch(self, chunk, batch):
+        n = 0
+        for h, o, dt, ts, c, t, g, d in self._rows(self._text(chunk)):
+            batch.appendRow(c, t, g, d, h, ts, o, dt or (0, 0, 0, 0, 0, 0))
+            n += 1
+        return n
+
+
+def _guid_bytes(s):
+    s = s.strip()
+    return bytes.fromhex(s.replace(":", "")) if s else bytes(16)
+
+def _data_bytes(s):
+    s = s.strip()
+    if not s:
+        return b''
+    return bytes([int(v, 16) if v.strip()[:2] in ("0x", "0X") else int(v)
+                    for v in s.split(",")])
+
+class NdjsonReader(_Reader):
+
+    def _rows(self, text):
+        text = self._pending + text
+        lines = text.split("\n")
+        self._pending = lines.pop()
+        loads = json.loads
+        for line in lines:
+            if not line.strip():
+                continue
+            o = loads(line)
+            yield (o.get("vscpHead", 0), o.get("vscpObId", 0),
+                    _parse_dt(o.get("vscpDateTime", "")), o.get("vscpTimeStamp", 0),
+                    o.get("vscpClass", 0), o.get("vscpType", 0),
+                    _guid_bytes(o.get("vscpGuid", "")), bytes(o.get("vscpData", [])))
+
+
+class XmlReader(_Reader):
+
+    def __init__(self):
+        super().__init__()
+        self._parser = XMLPullParser(events=("start", "end"))
+        self._root = None
+
+    def _rows(self, text):
+        self._parser.feed(text)
+        for kind, elem in self._parser.read_events():
+            if kind == "start":
+                if self._root is None:
+                    self._root = elem
+                continue
+            if elem.tag != "event":
+                continue
+            a = elem.attrib
+            yield (int(a.get("vscpHead", 0)), int(a.get("vscpObId", 0)),
+                    _parse_dt(a.get("vscpDateTime", "")), int(a.get("vscpTimeStamp", 0)),
+                    int(a.get("vscpClass", 0)), int(a.get("vscpType", 0)),
+                    _guid_bytes(a.get("vscpGuid", "")), _data_bytes(a.get("vscpData", "")))
+            # Drop parsed elements so memory use stays flat
+            self._root.clear()
+
+
+# Regular expression matching one filled in printf style template
+def _template_regex(template):
+    parts = re.split(r"%l?[dus]", template)
+    kinds = re.findall(r"%l?([dus])", template)
+    rx = re.escape(parts[0])
+    for kind, part in zip(kinds, parts[1:]):
+        rx += r"(.*?)" if kind == "s" else r"(\d+)"
+        rx += re.escape(part)
+    return re.compile(rx, re.S)
+
+_HTML_RE = _template_regex(VSCP_HTML_EVENT_TEMPLATE)
+
+class HtmlReader(_Reader):
+
+    def _rows(self, text):
+        text = self._pending + text
+        end = 0
+        for m in _HTML_RE.finditer(text):
+            vscpclass, vscptype, _, data, g, head, dt, ts, obid, _ = m.groups()
+            end = m.end()
+            yield (int(head), int(obid), _parse_dt(dt), int(ts),
+                    int(vscpclass), int(vscptype), _guid_bytes(g), _data_bytes(data))
+        self._pending = text[end:]
+
+
+_WRITERS = { "ndjson": NdjsonWriter, "json": NdjsonWriter, "xml": XmlWriter, "html": HtmlWriter }
+_READERS = { "ndjson": NdjsonReader, "json": NdjsonReader, "xml": XmlReader, "html": HtmlReader }
+
+# Writer for format fmt ("ndjson", "xml" or "html")
+def writer(fp, fmt="ndjson", chunk_size=DEFAULT_CHUNK_SIZE, note=""):
+    return _WRITERS[fmt](fp, chunk_size, note)
+
+def reader(fmt="ndjson"):
+    return _READERS[fmt]()
+
+# Write events (iterable or VscpEventBatch) to fp. Returns the count.
+def write_events(fp, events, fmt="ndjson", chunk_size=DEFAULT_CHUNK_SIZE, note=""):
+    with writer(fp, fmt, chunk_size, note) as w:
+        w.writeMany(events)
+    return w.count
+
+# Read events from fp, yielding vscpEventEx
+def read_events(fp, fmt="ndjson", chunk_size=DEFAULT_CHUNK_SIZE):
+    r = reader(fmt)
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            break
+        for ex in r.feed(chunk):
+            yield ex
+    for ex in r.feed("\n"):
+        yield ex
+
+# Read all events from fp into a VscpEventBatch
+def read_batch(fp, fmt="ndjson", chunk_size=DEFAULT_CHUNK_SIZE):
+    r = reader(fmt)
+    batch = VscpEventBatch()
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            break
+        r.feedBatch(chunk, batch)
+    r.feedBatch("\n", batch)
+    return batch
@@ -0,0 +1,392 @@
+# FILE: vscp_state.py
+#
+# Sharded last value state store
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+# The store keeps the latest event of each (GUID, class, type, sensor
+# index). The sensor index is the one of measurement events (see
+# vscp_measurement), other events use index 0. Nodes are spread over
+# shards on the hash of their GUID and each shard has its own lock, so
+# threads updating different nodes seldom wait for each other.
+#
+# Every update gets a version from one counter for the whole store.
+# changes(since) returns the entries updated and the keys removed after
+# version since, so a dashboard that remembers the version of its last
+# refresh only handles what changed since. Versions always increase but
+# can skip numbers.
+#
+# A shard keeps its entries in slot arrays with the columns of a
+# VscpEventBatch plus the decoded value, the data of each slot as bytes.
+# Slots of removed entries are reused. With max_nodes the least recently
+# updated nodes are evicted when there are more, expire() evicts nodes not
+# heard from for some time.
+#
+#   store = StateStore(max_nodes=10000)
+#   store.update(ev)
+#   diff = store.snapshot()
+#   ...
+#   diff = store.changes(diff.version)
+#   for key in diff.removed:
+#       ...
+#   for st in diff.changed:
+#       ...
+#
+
+import time
+import struct
+import itertools
+import threading
+from array import array
+from ctypes import addressof, string_at
+from collections import OrderedDict, deque, namedtuple
+
+from vscp import *
+from vscp_measurement import is_measurement, decode_measurement_data
+
+# Default number of shards
+DEFAULT_SHARDS = 16
+
+# Removed keys each shard remembers for changes(). Asking for changes
+# since an older version gives a full snapshot.
+TOMBSTONE_LIMIT = 65536
+
+_NAN = float("nan")
+
+# vscpEventEx up to the data, read with one copy
+_EX_HEADER = struct.Struct("@HIHBBBBBIHHH16sH")
+_EX_DATA_OFFSET = vscpEventEx.data.offset
+assert _EX_HEADER.size == _EX_DATA_OFFSET
+
+# Slot columns
+_COLUMNS = ( ("head", 'H'),
+             ("timestamp", 'I'),
+             ("year", 'H'),
+             ("month", 'B'),
+             ("day", 'B'),
+             ("hour", 'B'),
+             ("minute", 'B'),
+             ("second", 'B'),
+             ("unit", 'B'),
+             ("value", 'd'),
+             ("updated", 'd') )
+
+_StateFields = namedtuple("State",
+                    "guid vscpclass vscptype index version updated head timestamp "
+                    "year month day hour minute second data value unit")
+
+################################################################################
+# Latest event of one key
+#
+# Event fields are named as in vscpEventEx, so a State can be given to the
+# vscp_serialize writers and to FilterSet.match. value is the decoded
+# measurement value (nan if there is none) and updated the store clock
+# time of the update.
+#
+
+class State(_StateFields):
+
+    __slots__ = ()
+
+    obid = 0
+
+    @property
+    def sizedata(self):
+        return len(self.data)
+
+    # (guid, vscpclass, vscptype, index)
+    def getKey(self):
+        return (self.guid, self.vscpclass, self.vscptype, self.index)
+
+    def toEventEx(self):
+        return vscpEventEx.new(self.vscpclass, self.vscptype, self.guid, self.data,
+                                self.timestamp, self.head, 0,
+                                (self.year, self.month, self.day,
+                                    self.hour, self.minute, self.second))
+
+# Result of changes(). With full true changed holds all entries and
+# removed is empty, the old state should be dropped. Otherwise remove
+# the removed keys first and then apply changed (ordered by version).
+StateDiff = namedtuple("StateDiff", "version full changed removed")
+
+# Sensor index, value and unit of an event
+def _measure(vscpclass, data):
+    if not is_measurement(vscpclass):
+        return 0, _NAN, 0
+    try:
+        m = decode_measurement_data(vscpclass, data)
+    except ValueError:
+        return 0, _NAN, 0
+    try:
+        value = float(m.value)
+    except (ValueError, TypeError):
+        value = _NAN
+    return m.index, value, m.unit
+
+
+class _Shard:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots = {}             # key -> slot
+        self.keys = []              # slot -> key, None for a free slot
+        self.free = []
+        self.data = []
+        for name, code in _COLUMNS:
+            setattr(self, name, array(code))
+        self.nodes = OrderedDict()  # guid -> time of last update, least recent first
+        self.nodeSlots = {}         # guid -> slots of the node
+        self.log = OrderedDict()    # slot -> version of last update, oldest first
+        self.removed = deque()      # (version, key) of removed entries, oldest first
+        self.horizon = 0            # Removals up to this version are forgotten
+
+    def newSlot(self, key):
+        if self.free:
+            s = self.free.pop()
+            self.keys[s] = key
+        else:
+            s = len(self.keys)
+            self.keys.append(key)
+            self.data.append(b'')
+            for name, _ in _COLUMNS:
+                getattr(self, name).append(0)
+        self.slots[key] = s
+        self.nodeSlots.setdefault(key[0], []).append(s)
+        return s
+
+    def state(self, s):
+        g, vscpclass, vscptype, index = self.keys[s]
+        return State(g, vscpclass, vscptype, index, self.log[s], self.updated[s],
+                        self.head[s], self.timestamp[s],
+                        self.year[s], self.month[s], self.day[s],
+                        self.hour[s], self.minute[s], self.second[s],
+                        self.data[s], self.value[s], self.unit[s])
+
+    def evict(self, g, versions):
+        del self.nodes[g]
+        removed = self.removed
+        for s in self.nodeSlots.pop(g, ()):
+            key = self.keys[s]
+            del self.slots[key]
+            del self.log[s]
+            self.keys[s] = None
+            self.data[s] = b''
+            self.free.append(s)
+            removed.append((next(versions), key))
+            if len(removed) > TOMBSTONE_LIMIT:
+                self.horizon = removed.popleft()[0]
+
+
+################################################################################
+# Sharded store of the latest event of each (GUID, class, type, index)
+#
+# All methods can be called from any thread. Events are vscpEventEx,
+# Packet0View or anything else with the vscpEventEx fields.
+#
+
+class StateStore:
+
+    def __init__(self, shards=DEFAULT_SHARDS, max_nodes=None, clock=time.monotonic):
+        if shards < 1:
+            raise ValueError("At least one shard is needed")
+        self.max_nodes = max_nodes
+        self.clock = clock
+        self._shards = [_Shard() for _ in range(shards)]
+        self._versions = itertools.count(1)
+        # Nodes kept in each shard, in total at most max_nodes + shards - 1
+        self._nodeLimit = None if max_nodes is None else -(-max_nodes // shards)
+
+    def __len__(self):
+        return sum(len(shard.slots) for shard in self._shards)
+
+    # Number of nodes with at least one entry
+    def nodeCount(self):
+        return sum(len(shard.nodes) for shard in self._shards)
+
+    def _shard(self, g):
+        return self._shards[hash(g) % len(self._shards)]
+
+    def _put(self, shard, g, vscpclass, vscptype, index, head, timestamp, dt,
+                data, value, unit, t):
+        key = (g, vscpclass, vscptype, index)
+        s = shard.slots.get(key)
+        if s is None:
+            nodes = shard.nodes
+            if g not in nodes and self._nodeLimit is not None and len(nodes) >= self._nodeLimit:
+                shard.evict(next(iter(nodes)), self._versions)
+            s = shard.newSlot(key)
+        v = next(self._versions)
+        shard.head[s] = head
+        shard.timestamp[s] = timestamp
+        shard.year[s], shard.month[s], shard.day[s], \
+            shard.hour[s], shard.minute[s], shard.second[s] = dt
+        shard.unit[s] = unit
+        shard.value[s] = value
+        shard.updated[s] = t
+        shard.data[s] = data
+        log = shard.log
+        log.pop(s, None)
+        log[s] = v
+        nodes = shard.nodes
+        if g in nodes:
+            nodes.move_to_end(g)
+        nodes[g] = t
+        return v
+
+    # Store an event as the latest of its key. t is the time of the update
+    # (default now from clock). Returns the version of the update.
+    def update(self, ev, t=None):
+        if isinstance(ev, vscpEventEx):
+            raw = string_at(addressof(ev), _EX_DATA_OFFSET + ev.sizedata)
+            _, _, year, month, day, hour, minute, second, timestamp, head, \
+                vscpclass, vscptype, g, _ = _EX_HEADER.unpack_from(raw)
+            data = raw[_EX_DATA_OFFSET:]
+            dt = (year, month, day, hour, minute, second)
+        else:
+            timestamp, head, vscpclass, vscptype, g = \
+                ev.timestamp, ev.head, ev.vscpclass, ev.vscptype, bytes(ev.guid)
+            data = bytes(memoryview(ev.data)[:ev.sizedata])
+            dt = (ev.year, ev.month, ev.day, ev.hour, ev.minute, ev.second)
+        g = vscpGuid(g)
+        index, value, unit = _measure(vscpclass, data)
+        t = self.clock() if t is None else t
+        shard = self._shard(g)
+        with shard.lock:
+            return self._put(shard, g, vscpclass, vscptype, index, head, timestamp, dt,
+                                data, value, unit, t)
+
+    # Store all rows of a VscpEventBatch, later rows win. Each shard is
+    # locked once. Returns the number of rows stored.
+    def updateBatch(self, batch, t=None):
+        t = self.clock() if t is None else t
+        n = len(self._shards)
+        groups = {}
+        guids = batch.guid
+        for row in range(len(batch)):
+            g = vscpGuid(bytes(guids[row*16:row*16+16]))
+            data = bytes(batch.getData(row))
+            groups.setdefault(hash(g) % n, []).append(
+                (row, g, data, _measure(batch.vscpclass[row], data)))
+        for i, rows in groups.items():
+            shard = self._shards[i]
+            with shard.lock:
+                for row, g, data, (index, value, unit) in rows:
+                    self._put(shard, g, batch.vscpclass[row], batch.vscptype[row], index,
+                                batch.head[row], batch.timestamp[row],
+                                (batch.year[row], batch.month[row], batch.day[row],
+                                    batch.hour[row], batch.minute[row], batch.second[row]),
+                                data, value, unit, t)
+        return len(batch)
+
+    # Latest State of a key or None
+    def get(self, guid, vscpclass, vscptype, index=0):
+        g = vscpGuid(guid)
+        shard = self._shard(g)
+        with shard.lock:
+            s = shard.slots.get((g, vscpclass, vscptype, index))
+            return None if s is None else shard.state(s)
+
+    # All States of a node, oldest update first
+    def getNode(self, guid):
+        g = vscpGuid(guid)
+        shard = self._shard(g)
+        with shard.lock:
+            states = [shard.state(s) for s in shard.nodeSlots.get(g, ())]
+        states.sort(key=lambda st: st.version)
+        return states
+
+    # Remove all entries of a node. Returns False if it had none.
+    def remove(self, guid):
+        g = vscpGuid(guid)
+        shard = self._shard(g)
+        with shard.lock:
+            if g not in shard.nodes:
+                return False
+            shard.evict(g, self._versions)
+            return True
+
+    # Remove the nodes not updated for max_age. Returns their GUIDs.
+    def expire(self, max_age, now=None):
+        limit = (self.clock() if now is None else now) - max_age
+        out = []
+        for shard in self._shards:
+            with shard.lock:
+                nodes = shard.nodes
+                while nodes:
+                    g, t = next(iter(nodes.items()))
+                    if t > limit:
+                        break
+                    shard.evict(g, self._versions)
+                    out.append(g)
+        return out
+
+    def _lockAll(self):
+        for shard in self._shards:
+            shard.lock.acquire()
+
+    def _unlockAll(self):
+        for shard in reversed(self._shards):
+            shard.lock.release()
+
+    # Current version, to be given to changes() later. All updates made
+    # before the call have this version or a lower one.
+    def getVersion(self):
+        self._lockAll()
+        try:
+            return next(self._versions) - 1
+        finally:
+            self._unlockAll()
+
+    # Entries updated and keys removed after version since. Work is
+    # proportional to the number of changes. Gives a full snapshot if
+    # since is 0 or so old that removals have been forgotten.
+    def changes(self, since=0):
+        changed = []
+        removed = []
+        self._lockAll()
+        try:
+            version = next(self._versions) - 1
+            full = since <= 0 or any(shard.horizon > since for shard in self._shards)
+            for shard in self._shards:
+                if full:
+                    changed.extend([shard.state(s) for s in shard.log])
+                    continue
+                for s, v in reversed(shard.log.items()):
+                    if v <= since:
+                        break
+                    changed.append(shard.state(s))
+                for v, key in reversed(shard.removed):
+                    if v <= since:
+                        break
+                    removed.append(key)
+        finally:
+            self._unlockAll()
+        changed.sort(key=lambda st: st.version)
+        return StateDiff(version, full, changed, removed)
+
+    # All entries
+    def snapshot(self):
+        return self.changes(0)
@@ -0,0 +1,410 @@
+# FILE: vscp_stats.py
+#
+# Channel statistics and latency histograms for the hot paths
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# An Instrumentation object collects
+#
+#   - counters for each channel (frames and bytes received and sent,
+#     overruns and errors) read as VSCPStatistics and VSCPStatus
+#   - latency histograms for each stage (encode, decode, filter, dispatch)
+#
+# Updates go to a shard owned by the calling thread, so no locks are
+# taken on the hot path. Reading sums the shards of all threads.
+#
+# Components that already keep a VSCPStatistics attach it to their
+# channel instead of counting twice, it is read with the shards.
+#
+# Stage latency is sampled, only one call in sample_every is timed, which
+# keeps the cost of timing well below the cost of the work timed. Hooks
+# added with addHook() are called with each sample.
+#
+#   instr = Instrumentation()
+#   ep = await VscpUdpEndpoint.openMulticast(instrumentation=instr)
+#   bus = EventBus(instrumentation=instr)
+#   ...
+#   print(export_prometheus(instr))
+
+import asyncio
+import itertools
+import threading
+from time import perf_counter_ns
+
+from vscp import *
+
+# Default number of stage calls for each timed one
+DEFAULT_SAMPLE_EVERY = 64
+
+STAGE_ENCODE = "encode"
+STAGE_DECODE = "decode"
+STAGE_FILTER = "filter"
+STAGE_DISPATCH = "dispatch"
+
+# Histogram buckets are powers of two nanoseconds, bucket i holds samples
+# shorter than 2**i ns. The last bucket (about 18 minutes) takes the rest.
+HISTOGRAM_BUCKETS = 41
+
+# Counter positions
+_RX_FRAMES = 0
+_TX_FRAMES = 1
+_RX_DATA = 2
+_TX_DATA = 3
+_OVERRUNS = 4
+_ERRORS = 5
+_NCOUNTERS = 6
+
+# Histogram positions, buckets follow
+_COUNT = 0
+_SUM = 1
+
+
+class _Shard:
+
+    __slots__ = ("counters", "status", "hist")
+
+    def __init__(self):
+        self.counters = {}          # channel -> counters
+        self.status = {}            # channel -> (seq, code, subcode, text)
+        self.hist = {}              # stage -> [count, sum, buckets...]
+
+
+################################################################################
+# Counters of one channel
+#
+
+class Channel:
+
+    def __init__(self, instr, name):
+        self.instr = instr
+        self.name = name
+        self._local = threading.local()
+        self._sources = []
+
+    # Add the counters of a VSCPStatistics (and the last error of a
+    # VSCPStatus) kept by a component to the channel. They are read when
+    # the channel is read, so the component pays nothing for it.
+    def attach(self, stats, status=None):
+        self._sources.append((stats, status))
+
+    def detach(self, stats):
+        self._sources = [s for s in self._sources if s[0] is not stats]
+
+    def _counters(self):
+        try:
+            return self._local.c
+        except AttributeError:
+            c = self._local.c = [0] * _NCOUNTERS
+            self.instr._shard().counters[self.name] = c
+            return c
+
+    def received(self, frames=1, nbytes=0):
+        c = self._counters()
+        c[_RX_FRAMES] += frames
+        c[_RX_DATA] += nbytes
+
+    def transmitted(self, frames=1, nbytes=0):
+        c = self._counters()
+        c[_TX_FRAMES] += frames
+        c[_TX_DATA] += nbytes
+
+    def overrun(self, count=1):
+        self._counters()[_OVERRUNS] += count
+
+    # Count an error and make it the last error of the channel
+    def error(self, code, subcode=0, text=""):
+        self._counters()[_ERRORS] += 1
+        self.instr._shard().status[self.name] = (next(self.instr._seq), code, subcode, text)
+
+
+################################################################################
+# Latency of one stage
+#
+#   t0 = stage.begin()
+#   ... work ...
+#   if t0:
+#       stage.end(t0)
+#
+
+class Stage:
+
+    def __init__(self, instr, name):
+        self.instr = instr
+        self.name = name
+        self._left = instr.sample_every
+        self._local = threading.local()
+
+    # Start time if this call is sampled, else 0. The countdown is shared
+    # by all threads without a lock, a lost update only moves a sample.
+    def begin(self):
+        self._left -= 1
+        if self._left > 0:
+            return 0
+        self._left = self.instr.sample_every
+        return perf_counter_ns()
+
+    # End a sampled call. count is the number of items handled by the call,
+    # the sample is the time per item.
+    def end(self, t0, count=1):
+        self.observe((perf_counter_ns() - t0) // count)
+
+    # Add one sample of ns nanoseconds
+    def observe(self, ns):
+        try:
+            h = self._local.h
+        except AttributeError:
+            h = self._local.h = [0] * (2 + HISTOGRAM_BUCKETS)
+            self.instr._shard().hist[self.name] = h
+        h[_COUNT] += 1
+        h[_SUM] += ns
+        h[2 + min(ns.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        hooks = self.instr._hooks
+        if hooks:
+            for hook in hooks:
+                hook(self.name, ns)
+
+
+################################################################################
+# Instrumentation
+#
+
+class Instrumentation:
+
+    def __init__(self, sample_every=DEFAULT_SAMPLE_EVERY):
+        if sample_every < 1:
+            raise ValueError("sample_every must be at least 1")
+        self.sample_every = sample_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._channels = {}
+        self._stages = {}
+        self._hooks = []
+        self._seq = itertools.count(1)
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    # The counters of channel name
+    def channel(self, name):
+        ch = self._channels.get(name)
+        if ch is None:
+            with self._lock:
+                ch = self._channels.setdefault(name, Channel(self, name))
+        return ch
+
+    # The histogram of stage name
+    def stage(self, name):
+        st = self._stages.get(name)
+        if st is None:
+            with self._lock:
+                st = self._stages.setdefault(name, Stage(self, name))
+        return st
+
+    # Call hook(stage, ns) for each sample
+    def addHook(self, hook):
+        self._hooks.append(hook)
+
+    def removeHook(self, hook):
+        self._hooks.remove(hook)
+
+    def getChannels(self):
+        return sorted(self._channels)
+
+    def getStages(self):
+        return sorted(self._stages)
+
+    def _sum(self, name):
+        total = [0] * _NCOUNTERS
+        for shard in list(self._shards):
+            c = shard.counters.get(name)
+            if c is not None:
+                for i in range(_NCOUNTERS):
+                    total[i] += c[i]
+        ch = self._channels.get(name)
+        if ch is not None:
+            for st, _ in ch._sources:
+                total[_RX_FRAMES] += st.cntReceiveFrames
+                total[_TX_FRAMES] += st.cntTransmitFrames
+                total[_RX_DATA] += st.cntReceiveData
+                total[_TX_DATA] += st.cntTransmitData
+                total[_OVERRUNS] += st.cntOverruns
+        return total
+
+    # Counters of a channel summed over all threads
+    def getStatistics(self, name):
+        c = self._sum(name)
+        st = VSCPStatistics()
+        st.cntReceiveFrames = c[_RX_FRAMES]
+        st.cntTransmitFrames = c[_TX_FRAMES]
+        st.cntReceiveData = c[_RX_DATA]
+        st.cntTransmitData = c[_TX_DATA]
+        st.cntOverruns = c[_OVERRUNS]
+        return st
+
+    # Number of errors counted for a channel
+    def getErrorCount(self, name):
+        return self._sum(name)[_ERRORS]
+
+    # Status with the last error of a channel
+    def getStatus(self, name):
+        last = None
+        for shard in list(self._shards):
+            s = shard.status.get(name)
+            if s is not None and (last is None or s[0] > last[0]):
+                last = s
+        st = VSCPStatus()
+        if last is not None:
+            _, code, subcode, text = last
+            st.lasterrorcode = code & 0xFFFFFFFF
+            st.lasterrorsubcode = subcode
+            b = text.encode("utf-8")[:VSCP_STATUS_ERROR_STRING_SIZE - 1]
+            for i, v in enumerate(b):
+                st.lasterrorstr[i] = v
+            return st
+        # Fall back on the status kept by an attached component
+        ch = self._channels.get(name)
+        for _, status in (ch._sources if ch is not None else ()):
+            if status is not None and status.lasterrorcode:
+                st.lasterrorcode = status.lasterrorcode
+                st.lasterrorsubcode = status.lasterrorsubcode
+                st.lasterrorstr[:] = status.lasterrorstr[:]
+        return st
+
+    # (count, sum in ns, bucket counts) of the samples of a stage
+    def getHistogram(self, name):
+        total = [0] * (2 + HISTOGRAM_BUCKETS)
+        for shard in list(self._shards):
+            h = shard.hist.get(name)
+            if h is not None:
+                for i in range(len(total)):
+                    total[i] += h[i]
+        return total[_COUNT], total[_SUM], total[2:]
+
+    # Upper bound (ns) of the bucket holding quantile q (0-1) of a stage,
+    # None if there are no samples
+    def getQuantile(self, name, q):
+        count, _, buckets = self.getHistogram(name)
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(buckets):
+            seen += n
+            if seen >= rank and n:
+                return 1 << i
+        return 1 << (HISTOGRAM_BUCKETS - 1)
+
+    # Clear all counters and histograms
+    def reset(self):
+        for shard in list(self._shards):
+            for c in shard.counters.values():
+                c[:] = [0] * len(c)
+            for h in shard.hist.values():
+                h[:] = [0] * len(h)
+            shard.status.clear()
+
+
+################################################################################
+# Prometheus / OpenMetrics text exposition
+#
+
+_COUNTERS = ( ("receive_frames", _RX_FRAMES, "Frames received"),
+              ("transmit_frames", _TX_FRAMES, "Frames sent"),
+              ("receive_bytes", _RX_DATA, "Event data bytes received"),
+              ("transmit_bytes", _TX_DATA, "Event data bytes sent"),
+              ("overruns", _OVERRUNS, "Events dropped because a queue was full"),
+              ("errors", _ERRORS, "Errors") )
+
+def _label(s):
+    return str(s).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+# Metrics of instr in the Prometheus text format, or OpenMetrics with
+# openmetrics=True
+def export_prometheus(instr, prefix="vscp", openmetrics=False):
+    lines = []
+    channels = instr.getChannels()
+    sums = dict((ch, instr._sum(ch)) for ch in channels)
+    for name, pos, text in _COUNTERS:
+        family = "{0}_{1}".format(prefix, name)
+        meta = family if openmetrics else family + "_total"
+        lines.append("# HELP {0} {1}".format(meta, text))
+        lines.append("# TYPE {0} counter".format(meta))
+        for ch in channels:
+            lines.append("{0}_total{{channel=\"{1}\"}} {2}".format(family, _label(ch), sums[ch][pos]))
+    family = prefix + "_last_error_code"
+    lines.append("# HELP {0} Last error code (VSCP_ERROR_*)".format(family))
+    lines.append("# TYPE {0} gauge".format(family))
+    for ch in channels:
+        lines.append("{0}{{channel=\"{1}\"}} {2}".format(family, _label(ch),
+                                                            instr.getStatus(ch).lasterrorcode))
+    family = prefix + "_stage_latency_seconds"
+    lines.append("# HELP {0} Latency of sampled stage calls".format(family))
+    lines.append("# TYPE {0} histogram".format(family))
+    for stage in instr.getStages():
+        count, total, buckets = instr.getHistogram(stage)
+        label = _label(stage)
+        seen = 0
+        for i, n in enumerate(buckets[:-1]):
+            seen += n
+            lines.append("{0}_bucket{{stage=\"{1}\",le=\"{2!r}\"}} {3}".format(
+                            family, label, (1 << i) / 1e9, seen))
+        lines.append("{0}_bucket{{stage=\"{1}\",le=\"+Inf\"}} {2}".format(family, label, count))
+        lines.append("{0}_sum{{stage=\"{1}\"}} {2!r}".format(family, label, total / 1e9))
+        lines.append("{0}_count{{stage=\"{1}\"}} {2}".format(family, label, count))
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+# Serve the metrics of instr over HTTP (any path). Returns the
+# asyncio server.
+async def start_exporter(instr, host="0.0.0.0", port=9090, prefix="vscp"):
+    async def handle(reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            if request.split(b' ')[0] == b'GET':
+                body = export_prometheus(instr, prefix).encode()
+                head = ("HTTP/1.1 200 OK\r\n"
+                        "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                        "Content-Length: {0}\r\nConnection: close\r\n\r\n").format(len(body))
+                writer.write(head.encode() + body)
+            else:
+                writer.write(b'HTTP/1.1 405 Method Not Allowed\r\nContent-Length: 0\r\n'
+                                b'Connection: close\r\n\r\n')
+            await writer.drain()
+        except (OSError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,390 @@
+# FILE: vscp_tcp.py
+#
+# asyncio client for the VSCP TCP/IP link protocol
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+from collections import deque
+
+from vscp import *
+
+# Default time to wait for connect and login
+DEFAULT_TIMEOUT = 10
+
+# Map text in negative replies to VSCP error codes. First match is used.
+_ERROR_TEXT = ( ("password", VSCP_ERROR_PASSWORD),
+                ("user", VSCP_ERROR_USER),
+                ("log in", VSCP_ERROR_INVALID_PERMISSION),
+                ("logged in", VSCP_ERROR_INVALID_PERMISSION),
+                ("privilege", VSCP_ERROR_INVALID_PERMISSION),
+                ("permission", VSCP_ERROR_INVALID_PERMISSION),
+                ("unknown command", VSCP_ERROR_NOT_SUPPORTED),
+                ("no event", VSCP_ERROR_FIFO_EMPTY),
+                ("buffer is full", VSCP_ERROR_TRM_FULL),
+                ("full", VSCP_ERROR_FIFO_FULL),
+                ("parameter", VSCP_ERROR_PARAMETER),
+                ("invalid", VSCP_ERROR_PARAMETER) )
+
+# VSCP error code for a negative reply line
+def reply_error_code(line):
+    text = line.lower()
+    for s, code in _ERROR_TEXT:
+        if s in text:
+            return code
+    return VSCP_ERROR_ERROR
+
+# Event to the link protocol format
+#   head,class,type,obid,datetime,timestamp,GUID,data0,data1,...
+def make_event_string(ev):
+    if ev.year:
+        dt = "{0:04}-{1:02}-{2:02}T{3:02}:{4:02}:{5:02}Z".format(ev.year, ev.month, ev.day,
+                                                                    ev.hour, ev.minute, ev.second)
+    else:
+        dt = ""
+    data = bytes(ev.data[:ev.sizedata]) if ev.sizedata else b''
+    s = "{0},{1},{2},{3},{4},{5},{6}".format(ev.head, ev.vscpclass, ev.vscptype, ev.obid,
+                                                dt, ev.timestamp,
+                                                vscpGuid(bytes(ev.guid)).getAsString())
+    if data:
+        s += "," + ",".join(["0x%02X" % b for b in data])
+    return s
+
+def _int(s):
+    s = s.strip()
+    if s[:2] in ("0x", "0X"):
+        return int(s, 16)
+    return int(s) if s else 0
+
+# Link protocol event string to vscpEventEx
+def parse_event_string(line):
+    parts = line.strip().split(",")
+    if len(parts) < 7:
+        raise VscpError(VSCP_ERROR_PARAMETER, "Invalid event: " + line)
+    dt = parts[4].strip()
+    if dt:
+        dt = (int(dt[0:4]), int(dt[5:7]), int(dt[8:10]),
+                int(dt[11:13]), int(dt[14:16]), int(dt[17:19]))
+    else:
+        dt = False
+    g = parts[6].strip()
+    if g and g != "-":
+        g = bytes.fromhex(g.replace(":", ""))
+    else:
+        g = None
+    data = bytes(_int(b) for b in parts[7:])
+    if len(data) > VSCP_LEVEL2_MAXDATA:
+        raise VscpError(VSCP_ERROR_PARAMETER, "To much event data")
+    return vscpEventEx.new(_int(parts[1]), _int(parts[2]), g, data,
+                            _int(parts[5]), _int(parts[0]), _int(parts[3]), dt)
+
+
+def _lines(lines):
+    return lines
+
+def _nothing(lines):
+    return None
+
+def _events(lines):
+    return [parse_event_string(l) for l in lines]
+
+def _count(lines):
+    return int(lines[0]) if lines else 0
+
+
+################################################################################
+# Pipelined client for the VSCP TCP/IP link protocol
+#
+# Commands are written as soon as they are issued and replies are matched
+# to commands in order, so any number of commands can be in flight. All
+# command methods return an awaitable right away.
+#
+#   c = await VscpTcpClient.open("localhost", user="admin", password="secret")
+#   pending = [c.send(ev) for ev in events]
+#   n = await c.chkdata()
+#   await asyncio.gather(*pending)
+#
+# In receive loop mode (receiveLoop()) the server streams events as they
+# arrive instead of being polled with RETR.
+#
+
+class VscpTcpClient:
+
+    def __init__(self):
+        self._reader = None
+        self._writer = None
+        self._pending = deque()
+        self._lines = []
+        self._task = None
+        self._loopq = None
+        self._looping = False
+        self._loopEnded = False
+        self.stats = VSCPStatistics()
+        self.connected = False
+
+    # Connect and (if user is given) log in
+    @classmethod
+    async def open(cls, host="localhost", port=VSCP_DEFAULT_TCP_PORT,
+                    user=None, password=None, timeout=DEFAULT_TIMEOUT):
+        c = cls()
+        try:
+            await asyncio.wait_for(c.connect(host, port, user, password), timeout)
+        except BaseException:
+            await c.close()
+            raise
+        return c
+
+    async def connect(self, host="localhost", port=VSCP_DEFAULT_TCP_PORT,
+                        user=None, password=None):
+        try:
+            self._reader, self._writer = await asyncio.open_connection(host, port)
+        except OSError as e:
+            raise VscpError(VSCP_ERROR_CONNECTION, str(e))
+        self.connected = True
+        greeting = asyncio.get_running_loop().create_future()
+        self._pending.append((greeting, _lines))
+        self._task = asyncio.ensure_future(self._readLoop())
+        await greeting
+        if user is not None:
+            try:
+                await self.command("user " + user)
+            except VscpError as e:
+                raise VscpError(VSCP_ERROR_USER, e.msg)
+            try:
+                await self.command("pass " + (password or ""))
+            except VscpError as e:
+                raise VscpError(VSCP_ERROR_PASSWORD, e.msg)
+
+    # Number of commands waiting for a reply
+    def inFlight(self):
+        return len(self._pending)
+
+    async def _readLoop(self):
+        err = VscpError(VSCP_ERROR_CONNECTION, "Connection closed")
+        try:
+            while True:
+                raw = await self._reader.readline()
+                if not raw:
+                    break
+                self._line(raw.decode("utf-8", "replace").rstrip("\r\n"))
+        except (OSError, asyncio.IncompleteReadError) as e:
+            err = VscpError(VSCP_ERROR_COMMUNICATION, str(e))
+        finally:
+            self.connected = False
+            while self._pending:
+                fut, _ = self._pending.popleft()
+                if not fut.done():
+                    fut.set_exception(err)
+            if self._loopq is not None:
+                self._endLoop(self._loopq)
+
+    def _line(self, line):
+        if line.startswith("+OK"):
+            if self._looping and line.strip() == "+OK":
+                return      # Receive loop keep alive
+            self._complete(None)
+        elif line.startswith("-OK"):
+            self._complete(VscpError(reply_error_code(line), line))
+        elif self._looping:
+            try:
+                ev = parse_event_string(line)
+            except (VscpError, ValueError):
+                return
+            try:
+                self._loopq.put_nowait(ev)
+            except asyncio.QueueFull:
+                self.stats.cntOverruns += 1
+                return
+            self.stats.cntReceiveFrames += 1
+            self.stats.cntReceiveData += ev.sizedata
+        else:
+            self._lines.append(line)
+
+    def _complete(self, err):
+        lines = self._lines
+        self._lines = []
+        if not self._pending:
+            return
+        fut, parse = self._pending.popleft()
+        if fut.done():
+            return
+        if err is not None:
+            if err.code == VSCP_ERROR_FIFO_EMPTY and parse is _events:
+                fut.set_result([])
+            else:
+                fut.set_exception(err)
+            return
+        try:
+            fut.set_result(parse(lines))
+        except Exception as e:
+            fut.set_exception(e)
+
+    def _issue(self, cmds, parse):
+        if not self.connected:
+            raise VscpError(VSCP_ERROR_NOT_CONNECTED, "Not connected")
+        loop = asyncio.get_running_loop()
+        futs = []
+        for _ in cmds:
+            fut = loop.create_future()
+            self._pending.append((fut, parse))
+            futs.append(fut)
+        self._writer.write("".join(c + "\r\n" for c in cmds).encode())
+        return futs
+
+    # Send a raw command. The result is the list of lines before the
+    # positive reply.
+    def command(self, cmd):
+        return self._issue([cmd], _lines)[0]
+
+    def noop(self):
+        return self._issue(["noop"], _nothing)[0]
+
+    # Send one event
+    def send(self, ev):
+        return self._issue(["send " + make_event_string(ev)], _nothing)[0]
+
+    # Send many events with one write
+    def sendMany(self, events):
+        futs = self._issue(["send " + make_event_string(ev) for ev in events], _nothing)
+        return asyncio.gather(*futs)
+
+    # Fetch up to count events. The result is a list of vscpEventEx.
+    def retr(self, count=1):
+        return self._issue(["retr {0}".format(count)], _events)[0]
+
+    # Number of events waiting on the server
+    def chkdata(self):
+        return self._issue(["chkdata"], _count)[0]
+
+    # Remove all events waiting on the server
+    def clearAll(self):
+        return self._issue(["clra"], _nothing)[0]
+
+    # Fast receive. Enters the server receive loop and yields events as
+    # the server sends them until quitLoop() is called or the connection
+    # is lost. No other commands can be used while in the loop. With
+    # maxqueue events that arrive while maxqueue events are waiting are
+    # dropped and counted as overruns in stats.
+    async def receiveLoop(self, maxqueue=0):
+        q = asyncio.Queue(maxqueue)
+        self._loopq = q
+        self._looping = True
+        self._loopEnded = False
+        try:
+            await self._issue(["rcvloop"], _nothing)[0]
+            while True:
+                if self._loopEnded and q.empty():
+                    break
+                ev = await q.get()
+                if ev is None:
+                    break
+                yield ev
+        finally:
+            self._looping = False
+            self._loopq = None
+
+    # Leave the receive loop
+    async def quitLoop(self):
+        q = self._loopq
+        await self._issue(["quitloop"], _nothing)[0]
+        self._looping = False
+        if q is not None:
+            self._endLoop(q)
+
+    # End the receive loop once the queued events are read. If the queue
+    # is full receiveLoop() sees the flag when it has emptied it.
+    def _endLoop(self, q):
+        self._loopEnded = True
+        try:
+            q.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def close(self):
+        if self._writer is None:
+            return
+        if self.connected:
+            try:
+                await asyncio.wait_for(self._issue(["quit"], _nothing)[0], DEFAULT_TIMEOUT)
+            except (VscpError, asyncio.TimeoutError):
+                pass
+        self._writer.close()
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception:
+                pass
+        self._writer = None
+
+
+################################################################################
+# A pool of client connections to one server shared by many tasks
+#
+# get() returns the connected client with the fewest commands in flight,
+# opening a new connection while the pool is below its size.
+#
+#   pool = VscpTcpPool("localhost", user="admin", password="secret", size=4)
+#   c = await pool.get()
+#   n = await c.chkdata()
+#
+
+class VscpTcpPool:
+
+    def __init__(self, host="localhost", port=VSCP_DEFAULT_TCP_PORT,
+                    user=None, password=None, size=4, timeout=DEFAULT_TIMEOUT):
+        if size < 1:
+            raise ValueError("Pool size must be at least one")
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self._clients = []
+        self._lock = None
+
+    def __len__(self):
+        return len(self._clients)
+
+    async def get(self):
+        self._clients = [c for c in self._clients if c.connected]
+        idle = [c for c in self._clients if 0 == c.inFlight()]
+        if idle:
+            return idle[0]
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if len(self._clients) < self.size:
+                c = await VscpTcpClient.open(self.host, self.port, self.user,
+                                                self.password, self.timeout)
+                self._clients.append(c)
+                return c
+        return min(self._clients, key=lambda c: c.inFlight())
+
+    async def close(self):
+        clients = self._clients
+        self._clients = []
+        for c in clients:
+            await c.close()
@@ -0,0 +1,398 @@
+# FILE: vscp_traffic.py
+#
+# Deterministic traffic generator and replay driver for load testing
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Load tests need event streams that look like real traffic and that are
+# the same on every run. A TrafficGenerator synthesizes a schedule of
+# (time, event) pairs from a seed:
+#
+#   - class/type pairs drawn from a weighted mix
+#   - GUID's from a population of clients and nodes, made from a base GUID
+#     with guid.setClientID() and guid.setNicknameID()
+#   - data sizes from 0 to VSCP_LEVEL2_MAXDATA, fixed, uniform or weighted
+#   - arrival times at a mean rate, evenly spaced, Poisson or in bursts
+#
+# A Replayer sends a schedule, generated or recorded (from_log(),
+# from_timestamps()), to a sink at its own pace (speed 1), N times faster
+# (speed N) or as fast as possible (MAX_SPEED). It sleeps until just
+# before an event is due and spins for the rest, so events go out within
+# microseconds of their time. How late they went out is reported.
+#
+# A sink is a callable or anything with send(ev): a MemorySink, a UdpSink
+# for unicast or multicast UDP, or for instance EventBus.publish.
+#
+#   gen = TrafficGenerator(nodes=200, rate=5000, arrival=ARRIVAL_POISSON, seed=1)
+#   with UdpSink(("127.0.0.1", VSCP_DEFAULT_UDP_PORT)) as sink:
+#       result = Replayer(sink).run(gen.events(), duration=60)
+#   print(result.count, result.lag_max)
+#
+
+import time
+import random
+import socket
+from collections import namedtuple
+from itertools import accumulate
+
+from vscp import *
+from vscp_packet import encode_packet0, packet0_size
+from vscp_aes import encrypt_frame, make_key
+
+# Arrival distributions. Events evenly spaced at the rate, Poisson
+# arrivals with the rate as mean, or bursts of events sent at the same
+# time with the rate as mean.
+ARRIVAL_CONSTANT = "constant"
+ARRIVAL_POISSON = "poisson"
+ARRIVAL_BURST = "burst"
+
+# Replay speed for sending events as fast as possible
+MAX_SPEED = 0
+
+# Time before an event is due when the replayer stops sleeping and starts
+# spinning (seconds). Sleeping wakes up too late by up to about this much.
+DEFAULT_SPIN = 0.001
+
+# Events sent more than this late (seconds) are counted as late
+DEFAULT_LATE = 0.001
+
+# Default GUID population base, clients and nodes are set in bytes 12-15
+DEFAULT_BASE_GUID = "FF:FF:FF:FF:FF:FF:FF:FE:00:00:00:00:00:00:00:00"
+
+# Default class/type mix
+#
+#   CLASS1.MEASUREMENT, temperature (10, 6) and humidity (10, 35)
+#   CLASS1.INFORMATION, on (20, 3), off (20, 4) and node heartbeat (20, 9)
+#
+DEFAULT_MIX = { (10, 6): 40,
+                (10, 35): 20,
+                (20, 3): 10,
+                (20, 4): 10,
+                (20, 9): 20 }
+
+# Time the generated events are dated from (seconds since epoch)
+DEFAULT_EPOCH = 1600000000.0
+
+# Result of a replay. count events were sent in elapsed seconds. lag_max
+# and lag_mean are how late (seconds) events were sent compared to their
+# time, late the number sent more than the late limit after it.
+ReplayResult = namedtuple("ReplayResult", "count elapsed lag_max lag_mean late")
+
+_WRAP = 1 << 32
+_HALF = 1 << 31
+
+# Weighted choice tables (population, cumulative weights)
+def _table(weights):
+    if not weights:
+        raise ValueError("No choices")
+    keys = list(weights)
+    cum = list(accumulate(weights[k] for k in keys))
+    if cum[-1] <= 0:
+        raise ValueError("Weights must add up to more than zero")
+    return keys, cum
+
+def _check_size(size):
+    if not 0 <= size <= VSCP_LEVEL2_MAXDATA:
+        raise ValueError("Data size must be 0-{0}".format(VSCP_LEVEL2_MAXDATA))
+
+
+################################################################################
+# Deterministic event stream generator
+#
+# mix maps (class, type) to a weight. A class alone as key means any type
+# (0-255) of that class. sizes is a data size, a (min, max) tuple for
+# sizes drawn evenly from min to max or a dict mapping sizes to weights.
+# Priorities are drawn evenly from 0-7.
+#
+# Each call of events() starts over from the seed, so it returns the same
+# events with the same times every time.
+#
+#   gen = TrafficGenerator(mix={10: 1}, clients=4, nodes=64, sizes={1: 3, 8: 1})
+#   for t, ev in gen.events(1000):
+#       ...
+#
+
+class TrafficGenerator:
+
+    def __init__(self, mix=None, nodes=16, clients=1, base_guid=DEFAULT_BASE_GUID,
+                    sizes=(0, VSCP_LEVEL1_MAXDATA), rate=1000.0, arrival=ARRIVAL_CONSTANT,
+                    burst=10, seed=0, epoch=DEFAULT_EPOCH):
+        if rate <= 0:
+            raise ValueError("Rate must be above zero")
+        if arrival not in (ARRIVAL_CONSTANT, ARRIVAL_POISSON, ARRIVAL_BURST):
+            raise ValueError("Unknown arrival distribution: {0}".format(arrival))
+        if burst < 1:
+            raise ValueError("Burst must be at least one event")
+        if not 1 <= nodes <= 0x10000 or not 1 <= clients <= 0x10000:
+            raise ValueError("Number of nodes and clients must be 1-65536")
+        self._mix = _table(DEFAULT_MIX if mix is None else mix)
+        if isinstance(sizes, int):
+            _check_size(sizes)
+            self._sizes = ((sizes,), None)
+        elif isinstance(sizes, tuple):
+            lo, hi = sizes
+            _check_size(lo)
+            _check_size(hi)
+            if lo > hi:
+                raise ValueError("Smallest data size above largest")
+            self._sizes = (range(lo, hi + 1), None)
+        else:
+            for size in sizes:
+                _check_size(size)
+            self._sizes = _table(sizes)
+        g = guid(bytes(base_guid) if isinstance(base_guid, bytearray) else base_guid)
+        self.guids = []
+        for c in range(clients):
+            g.setClientID(c)
+            for n in range(nodes):
+                g.setNicknameID(n)
+                self.guids.append(bytes(g.guid))
+        self.rate = float(rate)
+        self.arrival = arrival
+        self.burst = burst
+        self.seed = seed
+        self.epoch = epoch
+
+    # Times (seconds from the start) of count events, or without end
+    def _times(self, rnd, count):
+        n = 0
+        t = 0.0
+        while count is None or n < count:
+            if self.arrival == ARRIVAL_CONSTANT:
+                yield n / self.rate
+            elif self.arrival == ARRIVAL_POISSON:
+                yield t
+                t += rnd.expovariate(self.rate)
+            else:
+                yield (n // self.burst) * self.burst / self.rate
+            n += 1
+
+    # Generate count events, or events without end if count is None. Yields
+    # (time, vscpEventEx) where time is seconds from the first event. The
+    # event timestamp (ms) and date are set from epoch + time.
+    def events(self, count=None):
+        rnd = random.Random(self.seed)
+        choices = rnd.choices
+        mixkeys, mixcum = self._mix
+        sizes, sizecum = self._sizes
+        guids = self.guids
+        epoch = self.epoch
+        sec = None
+        for t in self._times(rnd, count):
+            key = choices(mixkeys, cum_weights=mixcum)[0]
+            if isinstance(key, tuple):
+                vscpclass, vscptype = key
+            else:
+                vscpclass, vscptype = key, rnd.randrange(256)
+            size = choices(sizes, cum_weights=sizecum)[0]
+            data = rnd.getrandbits(size * 8).to_bytes(size, "big") if size else b''
+            ts = epoch + t
+            if int(ts) != sec:
+                sec = int(ts)
+                dt = time.gmtime(sec)
+            yield t, vscpEventEx.new(vscpclass, vscptype, choices(guids)[0], data,
+                                        int(ts * 1000) & 0xFFFFFFFF, rnd.randrange(8) << 5,
+                                        0, dt)
+
+
+# Schedule from an EventLogReader (vscp_log) query. Yields (time, event)
+# with the time each record was logged.
+def from_log(reader, vscpclass=None, vscptype=None, start=None, end=None):
+    for rec in reader.query(vscpclass, vscptype, start, end):
+        yield rec.time, rec.event
+
+# Schedule from events with the VSCP timestamp (ms) as time, for captures
+# saved with vscp_serialize. Timestamps that wrap around at 32 bits are
+# taken as going on. Only a jump of more than half the range counts as a
+# wrap, smaller steps back are events out of order (nodes have their own
+# clocks) and are sent as soon as they are reached.
+def from_timestamps(events):
+    base = 0
+    last = None
+    for ev in events:
+        ts = ev.timestamp
+        if last is not None:
+            if ts < last - _HALF:
+                base += _WRAP
+            elif ts > last + _HALF:
+                base -= _WRAP
+        last = ts
+        yield (base + ts) / 1000.0, ev
+
+
+################################################################################
+# Sink keeping sent events in memory
+#
+# events holds the events and times the perf_counter() time each was sent.
+#
+
+class MemorySink:
+
+    def __init__(self):
+        self.events = []
+        self.times = []
+
+    def __len__(self):
+        return len(self.events)
+
+    def send(self, ev):
+        self.times.append(time.perf_counter())
+        self.events.append(ev)
+
+    def clear(self):
+        self.events = []
+        self.times = []
+
+
+################################################################################
+# Sink sending events as packet type 0 frames over UDP
+#
+# Uses a blocking socket, so a replay slows down instead of losing frames
+# when the socket buffer is full. With a key frames are sent AES encrypted
+# (see vscp_aes).
+#
+#   with UdpSink.multicast() as sink:
+#       Replayer(sink, speed=10).run(schedule)
+#
+
+class UdpSink:
+
+    def __init__(self, addr=("127.0.0.1", VSCP_DEFAULT_UDP_PORT), key=None, sock=None):
+        self.addr = addr
+        self._key = None if key is None else make_key(key)
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.sock = sock
+        self.stats = VSCPStatistics()
+        self._buf = bytearray(packet0_size(VSCP_LEVEL2_MAXDATA))
+        self._view = memoryview(self._buf)
+
+    # Sink sending to a multicast group
+    @classmethod
+    def multicast(cls, group=VSCP_MULTICAST_IPV4_ADDRESS_STR,
+                    port=VSCP_DEFAULT_MULTICAST_PORT,
+                    interface="0.0.0.0",
+                    ttl=VSCP_DEFAULT_MULTICAST_TTL,
+                    loopback=True, key=None):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        try:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1 if loopback else 0)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+        except Exception:
+            sock.close()
+            raise
+        return cls((group, port), key, sock)
+
+    def send(self, ev):
+        n = encode_packet0(ev, self._buf)
+        frame = self._view[:n]
+        if self._key is not None:
+            frame = encrypt_frame(frame, self._key)
+        self.sock.sendto(frame, self.addr)
+        self.stats.cntTransmitFrames += 1
+        self.stats.cntTransmitData += ev.sizedata
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+################################################################################
+# Paced replay of a schedule to a sink
+#
+# Times in the schedule are taken relative to the first one and divided
+# by speed. An event that is due is sent at once, so a sink that can not
+# keep up makes the following events late (see the result) but none are
+# skipped. spin=0 never spins, which leaves the CPU to a receiver on the
+# same host at the cost of precision.
+#
+#   r = Replayer(bus.publish, speed=2)
+#   result = r.run(from_log(vscp_log.EventLogReader("/var/log/vscp")))
+#
+
+class Replayer:
+
+    def __init__(self, sink, speed=1.0, spin=DEFAULT_SPIN, late=DEFAULT_LATE):
+        if speed is None:
+            speed = MAX_SPEED
+        if speed < 0:
+            raise ValueError("Speed can not be negative")
+        self.send = sink if callable(sink) else sink.send
+        self.speed = speed
+        self.spin = spin
+        self.late = late
+        self._stopped = False
+
+    # Stop a running replay (from another thread or from the sink)
+    def stop(self):
+        self._stopped = True
+
+    # Send the events of a schedule of (time, event) pairs. Stops after
+    # count events or duration seconds (at replay speed) if given.
+    def run(self, schedule, count=None, duration=None):
+        send = self.send
+        clock = time.perf_counter
+        sleep = time.sleep
+        spin = self.spin
+        scale = 1.0 / self.speed if self.speed else 0.0
+        self._stopped = False
+        n = 0
+        late = 0
+        lag_sum = 0.0
+        lag_max = 0.0
+        first = None
+        start = clock()
+        end = None if duration is None else start + duration
+        for t, ev in schedule:
+            if self._stopped or n == count:
+                break
+            if first is None:
+                first = t
+            if scale:
+                due = start + (t - first) * scale
+                if end is not None and due >= end:
+                    break
+                wait = due - clock()
+                if wait > spin:
+                    sleep(wait - spin)
+                while clock() < due:
+                    pass
+                lag = clock() - due
+                lag_sum += lag
+                if lag > lag_max:
+                    lag_max = lag
+                if lag > self.late:
+                    late += 1
+            elif end is not None and clock() >= end:
+                break
+            send(ev)
+            n += 1
+        return ReplayResult(n, clock() - start, lag_max, lag_sum / n if n else 0.0, late)
@@ -0,0 +1,343 @@
+# FILE: vscp_udp.py
+#
+# asyncio VSCP multicast and UDP endpoint
+#
+# This file is part of the VSCP (http://www.vscp.org)
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2000-2020 Ake Hedman, Grodans Paradis AB <info@grodansparadis.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import socket
+import struct
+import asyncio
+from collections import deque
+from time import perf_counter_ns
+
+from vscp import *
+from vscp_packet import decode_packet0, encode_packet0, encode_packet0_row, packet0_size
+from vscp_aes import decode_packet0_encrypted, encrypt_frame, make_key
+from vscp_stats import STAGE_DECODE, STAGE_ENCODE
+
+# Default number of received events buffered before reading is paused
+DEFAULT_QUEUE_SIZE = 4096
+
+# Largest frame (packet type, header, max data, CRC)
+MAX_FRAME_SIZE = packet0_size(VSCP_LEVEL2_MAXDATA)
+
+# Create a UDP socket bound to the VSCP multicast group
+def make_multicast_socket(group=VSCP_MULTICAST_IPV4_ADDRESS_STR,
+                            port=VSCP_DEFAULT_MULTICAST_PORT,
+                            interface="0.0.0.0",
+                            ttl=VSCP_DEFAULT_MULTICAST_TTL,
+                            loopback=True):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            except OSError:
+                pass
+        sock.bind(("", port))
+        mreq = struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton(interface))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1 if loopback else 0)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+        sock.setblocking(False)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+################################################################################
+# Datagram protocol feeding decoded packet type 0 frames to a VscpUdpEndpoint
+#
+
+class VscpDatagramProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+    def connection_made(self, transport):
+        self.endpoint._transport = transport
+
+    def datagram_received(self, data, addr):
+        self.endpoint._received(data, addr)
+
+    def error_received(self, exc):
+        self.endpoint.status.lasterrorcode = VSCP_ERROR_COMMUNICATION
+
+    def connection_lost(self, exc):
+        self.endpoint._lost(exc)
+
+    def pause_writing(self):
+        self.endpoint._can_write.clear()
+
+    def resume_writing(self):
+        self.endpoint._can_write.set()
+
+
+################################################################################
+# VSCP multicast/UDP endpoint
+#
+# Received frames are decoded into Packet0View events and delivered through
+# an async iterator. At most maxqueue events are buffered. When the buffer
+# is full reading from the socket is paused (the kernel buffer then takes
+# the load) and it is resumed when the consumer has emptied half of it. If
+# the transport can not pause the oldest event is dropped and counted as an
+# overrun.
+#
+# If a key is given frames are sent AES encrypted and encrypted frames
+# are decrypted on receive. key can also be a dict with a key for each
+# encryption code (the first one is used for sending).
+#
+# With an Instrumentation object (vscp_stats) the statistics of the
+# endpoint are attached to the channel named channel and decode/encode
+# latency is sampled.
+#
+#   ep = await VscpUdpEndpoint.openMulticast()
+#   async for ev in ep:
+#       print(ev.vscpclass, ev.vscptype)
+#
+
+class VscpUdpEndpoint:
+
+    def __init__(self, maxqueue=DEFAULT_QUEUE_SIZE, remote_addr=None, verify=True, key=None,
+                    instrumentation=None, channel="udp"):
+        self.maxqueue = maxqueue
+        self.remote_addr = remote_addr
+        self.verify = verify
+        self.key = key
+        if key is None:
+            self._sendkey = None
+        elif isinstance(key, dict):
+            self._sendkey = make_key(next(iter(key.values())))
+        else:
+            self._sendkey = make_key(key)
+        self.stats = VSCPStatistics()
+        self.status = VSCPStatus()
+        self.cntBadFrames = 0
+        self._channel = None
+        self._decodeStage = None
+        self._encodeStage = None
+        if instrumentation is not None:
+            self._channel = instrumentation.channel(channel)
+            self._channel.attach(self.stats, self.status)
+            self._decodeStage = instrumentation.stage(STAGE_DECODE)
+            self._encodeStage = instrumentation.stage(STAGE_ENCODE)
+            self._every = instrumentation.sample_every
+            self._left = self._every
+        self._queue = deque()
+        self._waiter = None
+        self._paused = False
+        self._closed = False
+        self._transport = None
+        self._can_write = asyncio.Event()
+        self._can_write.set()
+
+    # Open an endpoint joined to the VSCP multicast group. Frames are sent
+    # to the group unless another address is given to send().
+    @classmethod
+    async def openMulticast(cls, group=VSCP_MULTICAST_IPV4_ADDRESS_STR,
+                                port=VSCP_DEFAULT_MULTICAST_PORT,
+                                interface="0.0.0.0",
+                                ttl=VSCP_DEFAULT_MULTICAST_TTL,
+                                loopback=True, **kwargs):
+        sock = make_multicast_socket(group, port, interface, ttl, loopback)
+        ep = cls(remote_addr=(group, port), **kwargs)
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: VscpDatagramProtocol(ep), sock=sock)
+        return ep
+
+    # Open a unicast UDP endpoint
+    @classmethod
+    async def openUdp(cls, local_addr=("0.0.0.0", VSCP_DEFAULT_UDP_PORT),
+                        remote_addr=None, **kwargs):
+        ep = cls(remote_addr=remote_addr, **kwargs)
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: VscpDatagramProtocol(ep),
+                                            local_addr=local_addr)
+        return ep
+
+    # Local (host, port) of the socket
+    def getLocalAddr(self):
+        return self._transport.get_extra_info("sockname")
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+
+    def _lost(self, exc):
+        self._closed = True
+        self._wakeup()
+
+    def _wakeup(self):
+        w = self._waiter
+        if w is not None and not w.done():
+            w.set_result(None)
+
+    # True if this call is to be timed (instrumented endpoints only)
+    def _sample(self):
+        self._left -= 1
+        if self._left:
+            return False
+        self._left = self._every
+        return True
+
+    def _received(self, data, addr):
+        t0 = perf_counter_ns() if self._channel is not None and self._sample() else 0
+        try:
+            if self.key is None:
+                ev = decode_packet0(memoryview(data), 0, self.verify)
+            else:
+                ev = decode_packet0_encrypted(memoryview(data), self.key, self.verify)
+        except ValueError as e:
+            self.cntBadFrames += 1
+            if self._channel is not None:
+                self._channel.error(VSCP_ERROR_COMMUNICATION, 0, str(e))
+            return
+        if t0:
+            self._decodeStage.end(t0)
+        self.stats.cntReceiveFrames += 1
+        self.stats.cntReceiveData += ev.sizedata
+        q = self._queue
+        q.append(ev)
+        if len(q) >= self.maxqueue:
+            if not self._paused:
+                try:
+                    self._transport.pause_reading()
+                    self._paused = True
+                except (AttributeError, NotImplementedError):
+                    pass
+            if len(q) > self.maxqueue:
+                q.popleft()
+                self.stats.cntOverruns += 1
+        self._wakeup()
+
+    # Number of events waiting
+    def pending(self):
+        return len(self._queue)
+
+    # Get next event. Returns None when the endpoint is closed.
+    async def recv(self):
+        q = self._queue
+        while not q:
+            if self._closed:
+                return None
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        ev = q.popleft()
+        if self._paused and len(q) <= self.maxqueue // 2:
+            self._paused = False
+            self._transport.resume_reading()
+        return ev
+
+    # Get all waiting events (at least one) as a list
+    async def recvMany(self, maxcount=None):
+        first = await self.recv()
+        if first is None:
+            return []
+        out = [first]
+        q = self._queue
+        n = len(q) if maxcount is None else min(len(q), maxcount - 1)
+        for _ in range(n):
+            out.append(q.popleft())
+        if self._paused and len(q) <= self.maxqueue // 2:
+            self._paused = False
+            self._transport.resume_reading()
+        return out
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        ev = await self.recv()
+        if ev is None:
+            raise StopAsyncIteration
+        return ev
+
+    def _addr(self, addr):
+        addr = addr or self.remote_addr
+        if addr is None:
+            raise ValueError("No destination address")
+        return addr
+
+    # Send one event (vscpEventEx or Packet0View)
+    def send(self, event, addr=None):
+        t0 = perf_counter_ns() if self._channel is not None and self._sample() else 0
+        buf = bytearray(packet0_size(event.sizedata))
+        encode_packet0(event, buf)
+        if self._sendkey is not None:
+            buf = encrypt_frame(buf, self._sendkey)
+        if t0:
+            self._encodeStage.end(t0)
+        self._transport.sendto(buf, self._addr(addr))
+        self.stats.cntTransmitFrames += 1
+        self.stats.cntTransmitData += event.sizedata
+
+    # Send many events (an iterable of events or a VscpEventBatch). All
+    # frames are encoded into one buffer and handed to the transport as
+    # slices of it. Waits while the transport asks for writing to pause.
+    async def sendBatch(self, events, addr=None):
+        addr = self._addr(addr)
+        t0 = perf_counter_ns() if self._encodeStage is not None else 0
+        if hasattr(events, "offsets"):
+            n = len(events)
+            size = packet0_size(0) * n + len(events.data)
+            buf = bytearray(size)
+            spans = []
+            pos = 0
+            for i in range(n):
+                k = encode_packet0_row(events, i, buf, pos)
+                spans.append((pos, k))
+                pos += k
+            datasize = len(events.data)
+        else:
+            events = list(events)
+            buf = bytearray(sum(packet0_size(ev.sizedata) for ev in events))
+            spans = []
+            pos = 0
+            datasize = 0
+            for ev in events:
+                k = encode_packet0(ev, buf, pos)
+                spans.append((pos, k))
+                pos += k
+                datasize += ev.sizedata
+        if t0 and spans:
+            self._encodeStage.end(t0, len(spans))
+        mv = memoryview(buf)
+        sendto = self._transport.sendto
+        key = self._sendkey
+        for pos, k in spans:
+            if not self._can_write.is_set():
+                await self._can_write.wait()
+            if key is None:
+                sendto(mv[pos:pos+k], addr)
+            else:
+                sendto(encrypt_frame(mv[pos:pos+k], key), addr)
+        self.stats.cntTransmitFrames += len(spans)
+        self.stats.cntTransmitData += datasize